@@ -1,14 +1,24 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 import io # For CSV file handling
+import json # For NDJSON streaming of batch forecasts
 import pandas as pd # Needed for batch CSV processing in routes
 import datetime # Needed for timestamp handling if CSV parsing happens here
-import joblib # For saving/loading models
-import os # For pathing to ML models
+import hmac # Constant-time admin token check
+import os # For environment-based configuration
+import time # Request latency metrics
 
 # Import MongoDB client functions
-from db_client import get_db, connect_to_mongodb
+from db_client import get_db, connect_to_mongodb, close_mongodb_connection, get_pool_stats, start_request_db_stats, log_request_db_stats, PROFILE_ANALYTICAL
+import metrics
+from metrics import stage_timer, count_batch_rows, count_batch_results
+from profiling import start_request_profile
+from services.forecast_cache import FORECAST_CACHE
+from services.model_registry import MODEL_REGISTRY, MODEL_LOAD_MODE
+from services.indexes import ensure_indexes
+from services.catalog_cache import get_catalog, warm_catalog
+from services.ingest_jobs import create_ingest_job, get_ingest_job, resume_ingest_jobs
 
 # Import inventory service functions
 from services.inventory_service import (
@@ -18,46 +28,79 @@ from services.inventory_service import (
     record_receipt_transaction,
     process_sales_batch_csv,
     process_receipts_batch_csv,
-    get_low_stock_alerts_data,
+    get_low_stock_alerts_page,
+    LOW_STOCK_ALERT_CATEGORIES,
     get_overstocked_products_data,
     get_demand_forecast_data_ml, # Re-import the updated ML-driven forecast function
-    get_reorder_recommendation # NEW: Import reorder recommendation function
+    prepare_forecast_batch,
+    iter_demand_forecast_batch_ml,
+    get_reorder_recommendation, # NEW: Import reorder recommendation function
+    get_reorder_plan
 )
 
 app = Flask(__name__)
-CORS(app) # Enable CORS for all routes
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Model-Version', 'X-DB-Round-Trips', 'X-DB-Time-Ms']) # Enable CORS for all routes
 
-# --- Load ML Model and Preprocessor at App Startup ---
-MODELS_DIR = 'ml_models'
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Batch forecasts with more series than this are streamed back as NDJSON
+FORECAST_BATCH_STREAM_THRESHOLD = int(os.getenv('FORECAST_BATCH_STREAM_THRESHOLD', '1000'))
 
-best_model_filename = None
-for f in os.listdir(os.path.join(CURRENT_DIR, MODELS_DIR)):
-    if f.startswith('best_demand_forecast_model_') and f.endswith('.joblib'):
-        best_model_filename = f
-        break
+# --- ML Model ---
+# The model bundle is loaded by MODEL_REGISTRY (in the background, or before serving in
+# gunicorn preload mode) and can be hot-swapped; see services/model_registry.py.
+# Shared secret for the admin endpoints (X-Admin-Token header); unset disables them
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
 
-GLOBAL_ML_MODEL = None
-GLOBAL_PREPROCESSOR = None
-GLOBAL_NUMERICAL_FEATURES = []
-GLOBAL_CATEGORICAL_FEATURES = []
 
-if best_model_filename:
-    MODEL_PATH = os.path.join(CURRENT_DIR, MODELS_DIR, best_model_filename)
-    PREPROCESSOR_PATH = os.path.join(CURRENT_DIR, MODELS_DIR, 'feature_preprocessor.joblib')
-    NUM_FEATURES_PATH = os.path.join(CURRENT_DIR, MODELS_DIR, 'numerical_features.joblib')
-    CAT_FEATURES_PATH = os.path.join(CURRENT_DIR, MODELS_DIR, 'categorical_features.joblib')
+# --- Request Parsing Helpers ---
 
-    try:
-        GLOBAL_ML_MODEL = joblib.load(MODEL_PATH)
-        GLOBAL_PREPROCESSOR = joblib.load(PREPROCESSOR_PATH)
-        GLOBAL_NUMERICAL_FEATURES = joblib.load(NUM_FEATURES_PATH)
-        GLOBAL_CATEGORICAL_FEATURES = joblib.load(CAT_FEATURES_PATH)
-        print(f"ML Model ({best_model_filename}), Preprocessor, and Feature lists loaded successfully.")
-    except Exception as e:
-        print(f"Error loading ML model components: {e}. Forecasting and Reorder APIs might not function.")
-else:
-    print("No best model file found in ml_models directory. Forecasting and Reorder APIs will not function.")
+WHAT_IF_NUMERIC_PARAMS = ['future_discount', 'future_price', 'future_competitor_pricing']
+
+def parse_what_if_params(source):
+    """
+    Collects the optional 'what-if' forecast overrides from a query-string or JSON mapping.
+    Returns (params, error_message); only the provided overrides are included in params.
+    """
+    what_if_params = {
+        'future_discount': source.get('future_discount'),
+        'future_holiday': source.get('future_holiday'),
+        'future_weather': source.get('future_weather'),
+        'future_price': source.get('future_price'),
+        'future_competitor_pricing': source.get('future_competitor_pricing')
+    }
+    # Convert numerical what-if params to float if they exist
+    for param in WHAT_IF_NUMERIC_PARAMS:
+        if what_if_params[param] is not None:
+            try:
+                what_if_params[param] = float(what_if_params[param])
+            except (TypeError, ValueError):
+                return None, f"Invalid '{param}' value."
+
+    # Filter out None values from what_if_params to pass only provided overrides
+    return {k: v for k, v in what_if_params.items() if v is not None}, None
+
+def model_unavailable_response(action):
+    """
+    Response for ML endpoints called before a model version is being served:
+    503 while the bundle is still loading (retry later), 500 if there is no usable model.
+    """
+    status = MODEL_REGISTRY.status()
+    if status['state'] in ('not_loaded', 'loading'):
+        return jsonify({"error": f"ML model is still loading. Cannot generate {action} yet.", "model_status": status}), 503
+    return jsonify({"error": f"ML model or preprocessor not loaded. Cannot generate {action}.", "model_status": status}), 500
+
+def with_model_version(response, model_version):
+    """
+    Tags a response with the version of the model that produced it.
+    """
+    response.headers['X-Model-Version'] = model_version
+    return response
+
+def wants_async_job():
+    """
+    True when a batch upload asks to be processed as a background job (`?async=1` or form field `async`).
+    """
+    value = request.args.get('async', request.form.get('async', ''))
+    return str(value).lower() in ('1', 'true', 'yes')
 
 
 # --- API Endpoints ---
@@ -67,7 +110,111 @@ def home():
     """
     A simple home route to confirm the backend is running.
     """
-    return "Walmart Inventory Management Backend is running! Access /inventory, /inventory/sale, /inventory/receipt, /inventory/low_stock_alerts, /inventory/overstocked_alerts, /inventory/forecast, /inventory/reorder_recommendation."
+    return "Walmart Inventory Management Backend is running! Access /ready, /inventory, /inventory/sale, /inventory/receipt, /inventory/low_stock_alerts, /inventory/overstocked_alerts, /inventory/forecast, /inventory/forecast_batch, /inventory/reorder_recommendation, /inventory/jobs/<job_id>."
+
+@app.before_request
+def start_model_loading():
+    # Also covers servers that never call start_background_services (e.g. `flask run`)
+    MODEL_REGISTRY.ensure_loading()
+
+@app.before_request
+def start_request_metrics():
+    # Label by URL rule (not path) to keep one series per route
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_token = metrics.set_route(g.metrics_route)
+    g.request_started = time.perf_counter()
+    g.db_stats = start_request_db_stats()
+
+@app.before_request
+def start_profiling():
+    # Opt-in: X-Profile header with PROFILE_TOKEN, PROFILE_ROUTES, or 1-in-PROFILE_SAMPLE_EVERY requests
+    g.profile = start_request_profile(g.metrics_route, request.headers)
+
+def finish_profiling(status):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return None
+    params = dict(request.view_args or {}, **request.args.to_dict())
+    try:
+        return profile.finish(g.metrics_route, request.method, params, status)
+    except Exception as e:
+        print(f"Could not write request profile: {e}")
+        return None
+
+@app.after_request
+def record_request_profile(response):
+    # Streamed responses are profiled up to the start of the stream
+    profile_path = finish_profiling(response.status_code)
+    if profile_path:
+        response.headers['X-Profile-File'] = os.path.basename(profile_path)
+    return response
+
+@app.after_request
+def add_db_stats_headers(response):
+    # MongoDB commands issued by this request (for streamed responses: until the stream starts)
+    stats = g.get('db_stats')
+    if stats is not None:
+        response.headers['X-DB-Round-Trips'] = str(stats.round_trips)
+        response.headers['X-DB-Time-Ms'] = f"{stats.db_time_ms:.2f}"
+        log_request_db_stats(g.metrics_route, request.method, stats)
+    return response
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.observe_request(g.metrics_route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.teardown_request
+def stop_unfinished_profile(exc):
+    # after_request is skipped when the view raised
+    finish_profiling(500)
+
+@app.teardown_request
+def reset_request_metrics(exc):
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        metrics.reset_route(token)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus text exposition: request latency per route/method/status, service stage timers
+    and batch row counters.
+    """
+    body, content_type = metrics.render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe: 200 once a model version is served, 503 while it is loading (or missing).
+    Inventory reads and writes do not need the model and are served before that.
+    """
+    status = MODEL_REGISTRY.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/admin/model/reload', methods=['POST'])
+def reload_model():
+    """
+    Loads the model bundle currently in ml_models/ next to the served one, validates it on a
+    smoke batch and swaps it in; in-flight forecasts finish on the previous version. A bundle
+    that fails to load or validate is rejected and the current version keeps serving.
+    Only reaches the process that handles the request: with several gunicorn workers, set
+    MODEL_WATCH_INTERVAL_SECONDS so every worker picks up a retrained model.
+    Requires the X-Admin-Token header to match ADMIN_TOKEN; answers 403 when ADMIN_TOKEN is unset.
+
+    Query Parameters:
+    - `force` (optional): Reload even if the files have not changed.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Model reload is disabled: set ADMIN_TOKEN to enable it."}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({"error": "Invalid or missing X-Admin-Token header."}), 403
+    force = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+    status = MODEL_REGISTRY.load(force=force)
+    return jsonify(status), 200 if status['ready'] and status['last_error'] is None else 500
 
 @app.route('/inventory/<string:store_id>/<string:product_id>', methods=['GET'])
 def get_inventory(store_id, product_id):
@@ -140,9 +287,26 @@ def record_sale_batch():
     
     if file and file.filename.endswith('.csv'):
         try:
+            if wants_async_job():
+                # Spooled to disk and processed by the job worker pool; poll /inventory/jobs/<job_id>
+                job_id = create_ingest_job(db, 'sale', file)
+                return jsonify({
+                    "message": "Batch sale job queued",
+                    "job_id": job_id,
+                    "status_url": f"/inventory/jobs/{job_id}"
+                }), 202
             # Pass the file stream directly to the service function
-            results = process_sales_batch_csv(db, io.StringIO(file.stream.read().decode("UTF8")))
-            return jsonify({"message": "Batch sale processing complete", "results": results}), 200
+            batch = process_sales_batch_csv(db, io.StringIO(file.stream.read().decode("UTF8")))
+            count_batch_rows('in', batch["stats"]["rows"])
+            count_batch_results(batch["results"])
+            with stage_timer('serialize'):
+                response = jsonify({
+                    "message": "Batch sale processing complete",
+                    "results": batch["results"],
+                    "rows_per_second": batch["stats"]["rows_per_second"],
+                    "stats": batch["stats"]
+                })
+            return response, 200
         except ValueError as ve:
             return jsonify({"error": str(ve)}), 400
         except Exception as e:
@@ -204,9 +368,26 @@ def record_receipt_batch():
     
     if file and file.filename.endswith('.csv'):
         try:
+            if wants_async_job():
+                # Spooled to disk and processed by the job worker pool; poll /inventory/jobs/<job_id>
+                job_id = create_ingest_job(db, 'receipt', file)
+                return jsonify({
+                    "message": "Batch receipt job queued",
+                    "job_id": job_id,
+                    "status_url": f"/inventory/jobs/{job_id}"
+                }), 202
             # Pass the file stream directly to the service function
-            results = process_receipts_batch_csv(db, io.StringIO(file.stream.read().decode("UTF8")))
-            return jsonify({"message": "Batch receipt processing complete", "results": results}), 200
+            batch = process_receipts_batch_csv(db, io.StringIO(file.stream.read().decode("UTF8")))
+            count_batch_rows('in', batch["stats"]["rows"])
+            count_batch_results(batch["results"])
+            with stage_timer('serialize'):
+                response = jsonify({
+                    "message": "Batch receipt processing complete",
+                    "results": batch["results"],
+                    "rows_per_second": batch["stats"]["rows_per_second"],
+                    "stats": batch["stats"]
+                })
+            return response, 200
         except ValueError as ve:
             return jsonify({"error": str(ve)}), 400
         except Exception as e:
@@ -215,15 +396,42 @@ def record_receipt_batch():
         return jsonify({"error": "Invalid file format. Please upload a CSV file."}), 400
 
 
+@app.route('/inventory/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """
+    Reports the progress of a background batch job (rows parsed/applied/failed, rows/s, ETA)
+    and its failed rows once it has finished.
+    """
+    try:
+        db = get_db()
+        job = get_ingest_job(db, job_id)
+        if job is None:
+            return jsonify({"message": f"Job {job_id} not found."}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        print(f"Error fetching job {job_id}: {e}")
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+
 @app.route('/inventory/low_stock_alerts', methods=['GET'])
 def get_low_stock_alerts():
     """
     Identifies and returns products across all stores that are projected to run out
     within a specified number of `days_left`, based on their current stock and
     simulated daily sales.
+
+    Query Parameters:
+    - `days_left`: Integer (default: 7).
+    - `store_id` (optional): Filter alerts for a specific store.
+    - `category` (optional): One of out_of_stock, below_lead_time, approaching_threshold.
+    - `limit` (optional): Page size. The cursor of the next page is returned in the `X-Next-Cursor` header.
+    - `cursor` (optional): Cursor of the page to fetch.
     """
     days_left_str = request.args.get('days_left', '7')
     store_filter_id = request.args.get('store_id')
+    category = request.args.get('category')
+    limit_str = request.args.get('limit')
+    cursor = request.args.get('cursor')
 
     try:
         days_left_threshold = int(days_left_str)
@@ -232,10 +440,29 @@ def get_low_stock_alerts():
     except ValueError:
         return jsonify({"error": "Invalid 'days_left' value. Must be an integer."}), 400
 
+    limit = None
+    if limit_str is not None:
+        try:
+            limit = int(limit_str)
+            if limit <= 0:
+                return jsonify({"error": "limit must be a positive integer."}), 400
+        except ValueError:
+            return jsonify({"error": "Invalid 'limit' value. Must be an integer."}), 400
+
+    if category and category not in LOW_STOCK_ALERT_CATEGORIES:
+        return jsonify({"error": f"Invalid 'category' value. Must be one of: {', '.join(LOW_STOCK_ALERT_CATEGORIES)}."}), 400
+
     try:
-        db = get_db()
-        critical_stock_items = get_low_stock_alerts_data(db, days_left_threshold, store_filter_id)
-        return jsonify(critical_stock_items), 200
+        db = get_db(PROFILE_ANALYTICAL)
+        critical_stock_items, next_cursor = get_low_stock_alerts_page(
+            db, days_left_threshold, store_filter_id, category=category, limit=limit, cursor=cursor
+        )
+        response = jsonify(critical_stock_items)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         print(f"Error fetching low stock alerts based on days: {e}")
         return jsonify({"error": f"An error occurred while fetching alerts: {str(e)}"}), 500
@@ -263,7 +490,7 @@ def get_overstocked_alerts():
         return jsonify({"error": "Invalid 'threshold_multiplier' or 'days_for_demand' value."}), 400
 
     try:
-        db = get_db()
+        db = get_db(PROFILE_ANALYTICAL)
         overstocked_items = get_overstocked_products_data(db, threshold_multiplier, days_for_demand, store_filter_id)
         return jsonify(overstocked_items), 200
     except Exception as e:
@@ -285,34 +512,9 @@ def get_demand_forecast():
     product_id = request.args.get('product_id')
     num_days_str = request.args.get('num_days', '30')
 
-    # Collect optional 'what-if' parameters
-    what_if_params = {
-        'future_discount': request.args.get('future_discount'),
-        'future_holiday': request.args.get('future_holiday'),
-        'future_weather': request.args.get('future_weather'),
-        'future_price': request.args.get('future_price'),
-        'future_competitor_pricing': request.args.get('future_competitor_pricing')
-    }
-    # Convert numerical what-if params to float if they exist
-    if what_if_params['future_discount'] is not None:
-        try:
-            what_if_params['future_discount'] = float(what_if_params['future_discount'])
-        except ValueError:
-            return jsonify({"error": "Invalid 'future_discount' value."}), 400
-    if what_if_params['future_price'] is not None:
-        try:
-            what_if_params['future_price'] = float(what_if_params['future_price'])
-        except ValueError:
-            return jsonify({"error": "Invalid 'future_price' value."}), 400
-    if what_if_params['future_competitor_pricing'] is not None:
-        try:
-            what_if_params['future_competitor_pricing'] = float(what_if_params['future_competitor_pricing'])
-        except ValueError:
-            return jsonify({"error": "Invalid 'future_competitor_pricing' value."}), 400
-    
-    # Filter out None values from what_if_params to pass only provided overrides
-    what_if_params_filtered = {k: v for k, v in what_if_params.items() if v is not None}
-
+    what_if_params_filtered, what_if_error = parse_what_if_params(request.args)
+    if what_if_error:
+        return jsonify({"error": what_if_error}), 400
 
     if not store_id or not product_id:
         return jsonify({"error": "Missing 'store_id' or 'product_id' for forecast."}), 400
@@ -324,23 +526,26 @@ def get_demand_forecast():
     except ValueError:
         return jsonify({"error": "Invalid 'num_days' value. Must be an integer."}), 400
 
-    if GLOBAL_ML_MODEL is None or GLOBAL_PREPROCESSOR is None:
-        return jsonify({"error": "ML model or preprocessor not loaded. Cannot generate forecast."}), 500
+    # The whole request runs on this version, even if a new one is swapped in meanwhile
+    model = MODEL_REGISTRY.current()
+    if model is None:
+        return model_unavailable_response("forecast")
 
     try:
         db = get_db()
         forecast_data = get_demand_forecast_data_ml(
             db, 
-            GLOBAL_ML_MODEL, 
-            GLOBAL_PREPROCESSOR, 
-            GLOBAL_NUMERICAL_FEATURES, 
-            GLOBAL_CATEGORICAL_FEATURES, 
+            *model.forecast_args(),
             store_id, 
             product_id, 
             num_days,
+            model_version=model.version,
             **what_if_params_filtered # Pass filtered what-if parameters
         )
-        return jsonify(forecast_data), 200
+        # The rows are a list (exported as CSV by the frontend); the version travels in the header
+        with stage_timer('serialize'):
+            response = jsonify(forecast_data)
+        return with_model_version(response, model.version), 200
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 404
     except Exception as e:
@@ -348,11 +553,131 @@ def get_demand_forecast():
         return jsonify({"error": f"An unexpected error occurred during forecasting: {str(e)}"}), 500
 
 
+@app.route('/inventory/forecast/cache_stats', methods=['GET'])
+def get_forecast_cache_stats():
+    """
+    Returns hit/miss/eviction counters of the in-process forecast cache.
+    """
+    return jsonify(FORECAST_CACHE.stats()), 200
+
+
+@app.route('/catalog/cache_stats', methods=['GET'])
+def get_catalog_cache_stats():
+    """
+    Returns the size, invalidation mode (change stream or polling) and hit/miss counters of
+    this process's product/store catalog cache.
+    """
+    return jsonify(get_catalog(get_db()).stats()), 200
+
+
+@app.route('/db/pool_stats', methods=['GET'])
+def get_db_pool_stats():
+    """
+    Returns the MongoDB connection pool statistics of the worker process serving the request.
+    """
+    return jsonify(get_pool_stats()), 200
+
+@app.route('/inventory/forecast_batch', methods=['POST'])
+def get_demand_forecast_batch():
+    """
+    Generates demand forecasts for many (store, product) series in a single request.
+
+    JSON Body:
+    - `pairs`: List of {"store_id", "product_id"} objects, or
+    - `store_id` / `region`: Forecast every inventory item of a store or region.
+    - `num_days`: Integer, number of days to forecast (default: 30).
+    - `what_if` (optional): Overrides shared by all series, same keys as /inventory/forecast.
+    - `stream` (optional): Force an NDJSON response (one forecast per line).
+
+    Large selections are always streamed as NDJSON.
+    """
+    data = request.get_json(silent=True) or {}
+    pairs = data.get('pairs')
+    store_id = data.get('store_id')
+    region = data.get('region')
+
+    if pairs is not None:
+        if not isinstance(pairs, list) or not all(isinstance(p, dict) and p.get('store_id') and p.get('product_id') for p in pairs):
+            return jsonify({"error": "'pairs' must be a list of objects with 'store_id' and 'product_id'."}), 400
+    if not pairs and not store_id and not region:
+        return jsonify({"error": "Provide 'pairs', 'store_id' or 'region' to select the series to forecast."}), 400
+
+    try:
+        num_days = int(data.get('num_days', 30))
+        if num_days <= 0:
+            return jsonify({"error": "num_days must be a positive integer."}), 400
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid 'num_days' value. Must be an integer."}), 400
+
+    what_if_source = data.get('what_if') or {}
+    if not isinstance(what_if_source, dict):
+        return jsonify({"error": "'what_if' must be an object."}), 400
+    what_if_params_filtered, what_if_error = parse_what_if_params(what_if_source)
+    if what_if_error:
+        return jsonify({"error": what_if_error}), 400
+
+    model = MODEL_REGISTRY.current()
+    if model is None:
+        return model_unavailable_response("forecast")
+
+    try:
+        db = get_db(PROFILE_ANALYTICAL)
+        with stage_timer('db_fetch'):
+            entries, errors = prepare_forecast_batch(db, pairs=pairs, store_id=store_id, region=region)
+        count_batch_rows('in', len(entries) + len(errors))
+        count_batch_rows('out', len(errors), 'failed')
+    except Exception as e:
+        print(f"Error preparing batch forecast: {e}")
+        return jsonify({"error": f"An unexpected error occurred during forecasting: {str(e)}"}), 500
+
+    forecasts = iter_demand_forecast_batch_ml(
+        *model.forecast_args(),
+        entries,
+        num_days,
+        **what_if_params_filtered
+    )
+
+    wants_ndjson = request.accept_mimetypes.best == 'application/x-ndjson'
+    if data.get('stream') or wants_ndjson or len(entries) > FORECAST_BATCH_STREAM_THRESHOLD:
+        route = g.metrics_route
+
+        def generate_ndjson():
+            # Runs after the request returned; label the stage timers and rows with the route explicitly
+            metrics.set_route(route)
+            streamed = 0
+            for error in errors:
+                yield json.dumps(error) + '\n'
+            try:
+                for forecast in forecasts:
+                    streamed += 1
+                    yield json.dumps(forecast) + '\n'
+            except Exception as e:
+                print(f"Error streaming batch forecast: {e}")
+                yield json.dumps({"error": f"An unexpected error occurred during forecasting: {str(e)}"}) + '\n'
+            finally:
+                count_batch_rows('out', streamed, 'success')
+                metrics.set_route('none')
+
+        return with_model_version(Response(generate_ndjson(), mimetype='application/x-ndjson'), model.version)
+
+    try:
+        forecasts = list(forecasts)
+        count_batch_rows('out', len(forecasts), 'success')
+        with stage_timer('serialize'):
+            response = jsonify({"forecasts": forecasts, "errors": errors, "model_version": model.version})
+        return with_model_version(response, model.version), 200
+    except Exception as e:
+        print(f"Error generating batch forecast: {e}")
+        return jsonify({"error": f"An unexpected error occurred during forecasting: {str(e)}"}), 500
+
+
 @app.route('/inventory/reorder_recommendation', methods=['GET']) # NEW ENDPOINT
 def get_reorder_recommendations_api():
     """
     Provides reorder recommendations (suggested quantity, order date, delivery date)
     for a specific product at a given store.
+    Serves the plan precomputed by `python manage.py plan-reorders` when it is fresh (same day,
+    same model version and unchanged inventory), and falls back to computing the recommendation live otherwise.
     
     Query Parameters:
     - `store_id`: Required.
@@ -363,22 +688,35 @@ def get_reorder_recommendations_api():
 
     if not store_id or not product_id:
         return jsonify({"error": "Missing 'store_id' or 'product_id' for reorder recommendation."}), 400
+
+    model = MODEL_REGISTRY.current()
+    try:
+        # While no model is loaded, a plan of any version beats a 503
+        planned_recommendation = get_reorder_plan(get_db(), store_id, product_id, model_version=model.version if model else None)
+        if planned_recommendation:
+            response = jsonify(planned_recommendation)
+            if planned_recommendation.get('model_version'):
+                with_model_version(response, planned_recommendation['model_version'])
+            return response, 200
+    except Exception as e:
+        print(f"Error reading precomputed reorder plan, computing live: {e}")
     
-    if GLOBAL_ML_MODEL is None or GLOBAL_PREPROCESSOR is None:
-        return jsonify({"error": "ML model or preprocessor not loaded. Cannot generate reorder recommendation."}), 500
+    if model is None:
+        return model_unavailable_response("reorder recommendation")
 
     try:
         db = get_db()
         recommendation = get_reorder_recommendation(
             db,
-            GLOBAL_ML_MODEL,
-            GLOBAL_PREPROCESSOR,
-            GLOBAL_NUMERICAL_FEATURES,
-            GLOBAL_CATEGORICAL_FEATURES,
+            *model.forecast_args(),
             store_id,
-            product_id
+            product_id,
+            model_version=model.version
         )
-        return jsonify(recommendation), 200
+        recommendation['model_version'] = model.version
+        with stage_timer('serialize'):
+            response = jsonify(recommendation)
+        return with_model_version(response, model.version), 200
     except ValueError as ve:
         return jsonify({"error": str(ve)}), 404
     except Exception as e:
@@ -387,12 +725,58 @@ def get_reorder_recommendations_api():
 
 
 # --- Running the Flask Application ---
+# --- Application Startup ---
+
+def create_app():
+    """
+    Production app factory (see wsgi.py and gunicorn.conf.py).
+    Runs the one-off startup tasks and returns the Flask app. With gunicorn's preload_app this
+    runs once in the master before the workers are forked: MODEL_LOAD_MODE is 'sync' there, so the
+    ML model is loaded here and shared copy-on-write; the master's MongoDB client is closed and
+    every worker opens its own lazily after fork.
+    """
+    if MODEL_LOAD_MODE == 'sync':
+        MODEL_REGISTRY.load()
+    try:
+        # Index bootstrap: unique SKU/product/store keys and the alert range-scan indexes
+        ensure_indexes(get_db())
+    except Exception as e:
+        print(f"Index bootstrap skipped: {e}")
+    finally:
+        close_mongodb_connection()
+    return app
+
+def start_background_services():
+    """
+    Starts the per-process background work: loading the ML model if it was not loaded
+    before the fork, the model file watcher, warming the catalog cache and resuming
+    unfinished ingest jobs. Called in each serving process; job leases keep a job on a single worker.
+    """
+    MODEL_REGISTRY.ensure_loading()
+    MODEL_REGISTRY.start_watcher()
+    try:
+        warm_catalog(get_db())
+    except Exception as e:
+        print(f"Could not warm the catalog cache: {e}")
+    try:
+        resume_ingest_jobs(get_db())
+    except Exception as e:
+        print(f"Could not resume ingest jobs: {e}")
+
+
 if __name__ == '__main__':
     try:
         connect_to_mongodb()
     except Exception as e:
         print(f"Application startup aborted due to MongoDB connection error: {e}")
         exit(1)
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
 
+    # Index bootstrap: unique SKU/product/store keys and the alert range-scan indexes
+    ensure_indexes(get_db())
+
+    # With the debug reloader, only the serving child process resumes jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+
+    # Development server only; use `gunicorn -c gunicorn.conf.py wsgi:app` in production
+    app.run(debug=True, host='0.0.0.0', port=5000)
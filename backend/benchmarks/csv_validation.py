@@ -0,0 +1,90 @@
+# backend/benchmarks/csv_validation.py
+import argparse
+import datetime
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.batch_validation import read_batch_csv, validate_batch_frame
+
+def make_batch_csv(num_rows, seed=0):
+    """
+    Synthetic sales/receipts CSV with Kaggle-style IDs and ~2% invalid quantities.
+    """
+    rng = np.random.default_rng(seed)
+    quantities = rng.integers(1, 20, num_rows).astype(object)
+    bad_rows = rng.random(num_rows) < 0.02
+    quantities[bad_rows] = rng.choice(['abc', '0', '-3', ''], bad_rows.sum())
+    df = pd.DataFrame({
+        'store_id': [f"S{i:03d}" for i in rng.integers(1, 6, num_rows)],
+        'product_id': [f"P{i:04d}" for i in rng.integers(1, 21, num_rows)],
+        'quantity': quantities
+    })
+    return df.to_csv(index=False)
+
+def legacy_validate(csv_text):
+    """
+    The per-row validation the batch processors used before the columnar stage.
+    """
+    df = pd.read_csv(io.StringIO(csv_text))
+    df.columns = df.columns.str.strip()
+    results = []
+    operations = []
+    for index, row in df.iterrows():
+        store_id = str(row['store_id'])
+        product_id = str(row['product_id'])
+        try:
+            quantity = int(row['quantity'])
+            if quantity <= 0:
+                results.append({"row": index + 1, "status": "failed", "error": "Quantity must be positive.", "store_id": store_id, "product_id": product_id})
+                continue
+        except ValueError:
+            results.append({"row": index + 1, "status": "failed", "error": "Invalid quantity format.", "store_id": store_id, "product_id": product_id})
+            continue
+        operations.append((index + 1, store_id, product_id, quantity, datetime.datetime.now()))
+    return results, operations
+
+def columnar_validate(csv_text):
+    """
+    The columnar validation stage, up to the same (row, store, product, quantity, timestamp) tuples.
+    """
+    valid, results = validate_batch_frame(read_batch_csv(io.StringIO(csv_text)))
+    timestamp = datetime.datetime.now()
+    operations = [
+        (row_number, store_id, product_id, quantity, timestamp)
+        for row_number, store_id, product_id, quantity in zip(
+            valid['row'].tolist(), valid['store_id'].tolist(), valid['product_id'].tolist(), valid['quantity'].tolist()
+        )
+    ]
+    return results, operations
+
+def time_rows_per_second(validate, csv_text, num_rows):
+    started = time.perf_counter()
+    validate(csv_text)
+    return num_rows / (time.perf_counter() - started)
+
+def main():
+    """
+    Compares the old iterrows validation with the columnar stage used by the batch processors.
+    Run from the backend/ directory: `python -m benchmarks.csv_validation`.
+    """
+    parser = argparse.ArgumentParser(description="Rows/s of batch CSV validation, iterrows vs columnar.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'iterrows rows/s':>16} {'columnar rows/s':>16} {'speedup':>8}")
+    for num_rows in args.rows:
+        csv_text = make_batch_csv(num_rows)
+        legacy_errors, legacy_ops = legacy_validate(csv_text)
+        errors, ops = columnar_validate(csv_text)
+        if [e['row'] for e in legacy_errors] != [e['row'] for e in errors] or len(legacy_ops) != len(ops):
+            print(f"{num_rows:>9} validation results differ between the two stages")
+            continue
+        legacy_rate = time_rows_per_second(legacy_validate, csv_text, num_rows)
+        columnar_rate = time_rows_per_second(columnar_validate, csv_text, num_rows)
+        print(f"{num_rows:>9} {legacy_rate:>16,.0f} {columnar_rate:>16,.0f} {columnar_rate / legacy_rate:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
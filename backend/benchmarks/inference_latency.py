@@ -0,0 +1,57 @@
+# backend/benchmarks/inference_latency.py
+import argparse
+import time
+
+import numpy as np
+from scipy import sparse
+
+from model_loader import load_model_bundle
+from services.tree_inference import CompiledTreeModel, SmallBatchTreeModel, verify_compiled_model
+
+BATCH_SIZES = [1, 10, 30, 100, 1000]
+
+def time_predict(predict, X, repeats):
+    """
+    Returns the median latency of `predict(X)` in milliseconds.
+    """
+    predict(X) # Warm-up
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict(X)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+def main():
+    """
+    Compares native LightGBM predict() with the compiled NumPy tree backend on the
+    served model, at the batch sizes used by single forecasts, 30-day horizons and fleet runs.
+    The routed column is what backend 'compiled' serves (SmallBatchTreeModel).
+    Run from the backend/ directory: `python -m benchmarks.inference_latency`.
+    """
+    parser = argparse.ArgumentParser(description="Latency of native vs compiled tree inference.")
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args()
+
+    bundle = load_model_bundle()
+    if bundle is None:
+        print("No best model file found in ml_models directory.")
+        return
+    model = bundle['model']
+    compiled_model = CompiledTreeModel.from_lightgbm(model)
+    print(f"Model: {bundle['model_filename']} ({compiled_model.num_trees} trees, max depth {compiled_model.max_depth})")
+    print(f"Parity with model.predict: {'OK' if verify_compiled_model(compiled_model, model) else 'MISMATCH'}")
+
+    # Served rows are sparse one-hot matrices with a handful of dense numerical columns
+    smoke = np.nan_to_num(compiled_model.smoke_batch(max(BATCH_SIZES), seed=1))
+    routed_model = SmallBatchTreeModel(model, compiled_model)
+    print(f"{'batch':>6} {'native ms':>10} {'compiled ms':>12} {'speedup':>8} {'routed ms':>10}")
+    for batch_size in BATCH_SIZES:
+        X = sparse.csr_matrix(smoke[:batch_size])
+        native_ms = time_predict(model.predict, X, args.repeats)
+        compiled_ms = time_predict(compiled_model.predict, X, args.repeats)
+        routed_ms = time_predict(routed_model.predict, X, args.repeats)
+        print(f"{batch_size:>6} {native_ms:>10.3f} {compiled_ms:>12.3f} {native_ms / compiled_ms:>7.1f}x {routed_ms:>10.3f}")
+
+if __name__ == '__main__':
+    main()
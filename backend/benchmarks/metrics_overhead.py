@@ -0,0 +1,49 @@
+# backend/benchmarks/metrics_overhead.py
+import argparse
+import json
+import time
+
+import metrics
+
+def instrumentation_cost_us(iterations):
+    """
+    Per-request cost in microseconds of what the metrics layer adds to a single sale:
+    the route context, one stage timer and the request histogram observation.
+    """
+    started = time.perf_counter()
+    for _ in range(iterations):
+        token = metrics.set_route('/inventory/sale')
+        request_started = time.perf_counter()
+        with metrics.stage_timer('db_write'):
+            pass
+        metrics.observe_request('/inventory/sale', 'POST', 200, time.perf_counter() - request_started)
+        metrics.reset_route(token)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def main():
+    """
+    Compares the instrumentation cost with the single-sale latency (the budget is 1%).
+    The sale latency is taken from a service_layer result file, or given directly.
+    Run from the backend/ directory: `python -m benchmarks.metrics_overhead --results <file>.json`.
+    """
+    parser = argparse.ArgumentParser(description="Overhead of the metrics layer on the single-sale path.")
+    parser.add_argument('--iterations', type=int, default=100_000)
+    parser.add_argument('--results', help="benchmarks.service_layer result file providing the sale latency.")
+    parser.add_argument('--sale-ms', type=float, help="Single-sale latency in milliseconds.")
+    args = parser.parse_args()
+
+    cost_us = instrumentation_cost_us(args.iterations)
+    print(f"Instrumentation cost: {cost_us:.2f} us per request")
+
+    sale_ms = args.sale_ms
+    if args.results:
+        with open(args.results) as f:
+            results = json.load(f)['results']
+        sales = [v['median_ms'] for k, v in results.items() if k.startswith('record_sale_transaction@') and 'median_ms' in v]
+        sale_ms = min(sales) if sales else None
+    if sale_ms:
+        overhead = cost_us / (sale_ms * 1000)
+        print(f"Single sale median: {sale_ms:.3f} ms -> overhead {overhead:.3%} ({'within' if overhead < 0.01 else 'OVER'} the 1% budget)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+# backend/benchmarks/service_layer.py
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_db import build_synthetic_db, make_batch_csv
+from services.forecast_cache import FORECAST_CACHE
+from services.inventory_service import (
+    get_demand_forecast_data_ml,
+    get_low_stock_alerts_page,
+    get_overstocked_products_data,
+    get_reorder_recommendation,
+    process_receipts_batch_csv,
+    process_sales_batch_csv,
+    record_receipt_transaction,
+    record_sale_transaction
+)
+from services.model_registry import ModelRegistry
+
+BENCHMARK_DB_NAME = os.getenv('BENCHMARK_DB_NAME', 'inventory_benchmark')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_SIZES = ['5x20', '50x200', '200x1000'] # stores x products
+DEFAULT_BATCH_ROWS = [100, 10_000]
+FORECAST_HORIZONS = [7, 30, 90]
+DEFAULT_REPEATS = 20
+DEFAULT_THRESHOLD = 0.10 # Relative slowdown of the median reported as a regression
+
+def open_benchmark_db(mongo_uri, use_mongomock=False):
+    """
+    Returns (client, db) for the benchmark database: a dedicated database on a real mongod,
+    or an in-memory mongomock database for CI-only runs (timings are not comparable with mongod).
+    """
+    if use_mongomock:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed. Run `pip install mongomock` or benchmark against a mongod.")
+        client = mongomock.MongoClient()
+    else:
+        import pymongo
+        client = pymongo.MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+    return client, client[BENCHMARK_DB_NAME]
+
+def time_call(fn, repeats, setup=None):
+    """
+    Runs `fn` `repeats` times (after one untimed warm-up) and returns latency statistics in
+    milliseconds. `setup` runs untimed before every call.
+    """
+    if setup:
+        setup()
+    fn()
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings = np.asarray(timings)
+    return {
+        'repeats': repeats,
+        'median_ms': round(float(np.median(timings)), 3),
+        'p95_ms': round(float(np.percentile(timings, 95)), 3),
+        'min_ms': round(float(timings.min()), 3),
+        'mean_ms': round(float(timings.mean()), 3)
+    }
+
+def checked_batch(process_batch, db, csv_bytes):
+    """
+    Runs a CSV batch processor and raises if any row was not applied, so a run where the
+    writes fail is reported as an error instead of timing the failure path.
+    """
+    response = process_batch(db, io.BytesIO(csv_bytes))
+    failed = [r for r in response['results'] if r['status'] != 'success']
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(response['results'])} rows failed (row {failed[0]['row']}: {failed[0]['error']})")
+    return response
+
+def service_benchmarks(db, sample, model, batch_rows, repeats):
+    """
+    The benchmarked service calls as (name, fn, setup, repeats).
+    Forecast benchmarks clear the forecast cache before every call unless marked cached.
+    """
+    store_id, product_id = sample['store_id'], sample['product_id']
+    benchmarks = [
+        ('record_receipt_transaction', lambda: record_receipt_transaction(db, store_id, product_id, 5), None, repeats),
+        ('record_sale_transaction', lambda: record_sale_transaction(db, store_id, product_id, 1), None, repeats),
+    ]
+
+    for rows in batch_rows:
+        csv_bytes = make_batch_csv(rows, sample['num_stores'], sample['num_products'], seed=rows)
+        batch_repeats = max(3, repeats // 4) if rows >= 10_000 else repeats
+        # Receipts first, so the sales batches have stock to draw from
+        benchmarks.append((f'process_receipts_batch_csv[{rows} rows]', lambda csv_bytes=csv_bytes: checked_batch(process_receipts_batch_csv, db, csv_bytes), None, batch_repeats))
+        benchmarks.append((f'process_sales_batch_csv[{rows} rows]', lambda csv_bytes=csv_bytes: checked_batch(process_sales_batch_csv, db, csv_bytes), None, batch_repeats))
+
+    benchmarks.extend([
+        ('get_low_stock_alerts_page', lambda: get_low_stock_alerts_page(db, 7, limit=50), None, repeats),
+        ('get_low_stock_alerts_page[store]', lambda: get_low_stock_alerts_page(db, 7, store_id, limit=50), None, repeats),
+        ('get_overstocked_products_data', lambda: get_overstocked_products_data(db, 3.0, 30), None, repeats),
+        ('get_overstocked_products_data[store]', lambda: get_overstocked_products_data(db, 3.0, 30, store_id), None, repeats),
+    ])
+
+    if model is None:
+        return benchmarks
+
+    for num_days in FORECAST_HORIZONS:
+        benchmarks.append((
+            f'get_demand_forecast_data_ml[{num_days}d]',
+            lambda num_days=num_days: get_demand_forecast_data_ml(db, *model.forecast_args(), store_id, product_id, num_days, model_version=model.version),
+            FORECAST_CACHE.clear, repeats
+        ))
+    benchmarks.append((
+        'get_demand_forecast_data_ml[30d cached]',
+        lambda: get_demand_forecast_data_ml(db, *model.forecast_args(), store_id, product_id, 30, model_version=model.version),
+        None, repeats
+    ))
+    benchmarks.append((
+        'get_reorder_recommendation',
+        lambda: get_reorder_recommendation(db, *model.forecast_args(), store_id, product_id, model_version=model.version),
+        FORECAST_CACHE.clear, repeats
+    ))
+    return benchmarks
+
+def parse_size(size):
+    num_stores, num_products = size.lower().split('x')
+    return int(num_stores), int(num_products)
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run(args):
+    client, db = open_benchmark_db(args.mongo_uri, args.mongomock)
+    batch_rows = args.batch_rows
+    if args.mongomock and batch_rows:
+        # mongomock's bulk_write does not accept the arguments of the current pymongo UpdateOne
+        print("Batch CSV benchmarks are skipped under --mongomock.")
+        batch_rows = []
+    registry = ModelRegistry()
+    registry.load()
+    model = registry.current()
+    if model is None:
+        print("No usable model in ml_models; forecast and reorder benchmarks are skipped.")
+
+    results = {}
+    try:
+        for size in args.sizes:
+            num_stores, num_products = parse_size(size)
+            started = time.perf_counter()
+            sample = build_synthetic_db(db, num_stores, num_products, seed=args.seed)
+            # Point benchmarks use the SKU with the most stock so sales never run out
+            richest = db.inventory.find_one({}, sort=[('current_stock', -1)])
+            sample.update(store_id=richest['store_id'], product_id=richest['product_id'])
+            print(f"\nDataset {size}: {num_stores * num_products} inventory documents built in {time.perf_counter() - started:.1f}s")
+            print(f"{'benchmark':<48} {'median ms':>10} {'p95 ms':>10}")
+
+            for name, fn, setup, repeats in service_benchmarks(db, sample, model, batch_rows, args.repeats):
+                key = f"{name}@{size}"
+                try:
+                    results[key] = time_call(fn, repeats, setup)
+                    print(f"{name:<48} {results[key]['median_ms']:>10.3f} {results[key]['p95_ms']:>10.3f}")
+                except Exception as e:
+                    results[key] = {'error': f"{type(e).__name__}: {e}"}
+                    print(f"{name:<48} error: {results[key]['error']}")
+    finally:
+        if not args.keep_db:
+            client.drop_database(BENCHMARK_DB_NAME)
+        client.close()
+
+    report = {
+        'meta': {
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': 'mongomock' if args.mongomock else 'mongod',
+            'model_version': model.version if model else None,
+            'sizes': args.sizes,
+            'batch_rows': batch_rows,
+            'repeats': args.repeats,
+            'seed': args.seed
+        },
+        'results': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"service_layer-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+def compare(args):
+    """
+    Compares the median latencies of two result files and exits with status 1 if any
+    benchmark got slower than the threshold allows.
+    """
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline['meta'].get('backend') != candidate['meta'].get('backend'):
+        print(f"Warning: comparing a {baseline['meta'].get('backend')} run with a {candidate['meta'].get('backend')} run.")
+
+    metric = args.metric
+    regressions = []
+    print(f"{'benchmark':<60} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for key in sorted(set(baseline['results']) | set(candidate['results'])):
+        before = baseline['results'].get(key, {}).get(metric)
+        after = candidate['results'].get(key, {}).get(metric)
+        if before is None or after is None:
+            print(f"{key:<60} {'-' if before is None else before:>10} {'-' if after is None else after:>10} {'n/a':>8}")
+            continue
+        change = (after - before) / before if before > 0 else 0.0
+        flag = ''
+        if change > args.threshold:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print(f"{key:<60} {before:>10.3f} {after:>10.3f} {change:>+7.1%}{flag}")
+
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%} on {metric}.")
+    if regressions:
+        sys.exit(1)
+
+def main():
+    """
+    Service-layer benchmarks on a synthetic stores x products dataset.
+    Run from the backend/ directory:
+        python -m benchmarks.service_layer run [--sizes 5x20 50x200] [--mongomock]
+        python -m benchmarks.service_layer compare baseline.json candidate.json [--threshold 0.1]
+    """
+    parser = argparse.ArgumentParser(description="Latency of the inventory service functions on a synthetic dataset.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Build the synthetic dataset(s) and time the service functions.")
+    run_parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help="Dataset sizes as STORESxPRODUCTS.")
+    run_parser.add_argument('--batch-rows', type=int, nargs='+', default=DEFAULT_BATCH_ROWS, help="Rows per batch CSV.")
+    run_parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--mongo-uri', default=os.getenv('BENCHMARK_MONGO_URI', 'mongodb://localhost:27017'))
+    run_parser.add_argument('--mongomock', action='store_true', help="Use an in-memory mongomock database (CI only).")
+    run_parser.add_argument('--output', default=None, help="Result file (default: benchmarks/results/service_layer-<timestamp>.json).")
+    run_parser.add_argument('--keep-db', action='store_true', help=f"Keep the '{BENCHMARK_DB_NAME}' database afterwards.")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser('compare', help="Flag regressions between two result files.")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Allowed relative slowdown (0.1 = 10%%).")
+    compare_parser.add_argument('--metric', default='median_ms', choices=['median_ms', 'p95_ms', 'min_ms', 'mean_ms'])
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
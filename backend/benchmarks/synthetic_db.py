@@ -0,0 +1,85 @@
+# backend/benchmarks/synthetic_db.py
+import datetime
+
+import numpy as np
+
+from generate_dataset import CATEGORIES, REGIONS
+from services.catalog_cache import invalidate_catalog
+from services.indexes import ensure_indexes
+from services.inventory_service import _stock_cover_days
+
+INSERT_BATCH_SIZE = 10_000
+
+def store_id(i):
+    return f"S{i + 1:04d}"
+
+def product_id(j):
+    return f"P{j + 1:05d}"
+
+def build_synthetic_db(db, num_stores, num_products, seed=0):
+    """
+    Replaces the products, stores and inventory collections of `db` with a synthetic
+    `num_stores` x `num_products` dataset in the shape written by the initial loader,
+    with a mix of out-of-stock, low, normal and overstocked SKUs, and creates the indexes.
+
+    Returns:
+        dict: Sample store and product IDs for the point benchmarks.
+    """
+    rng = np.random.default_rng(seed)
+    now = datetime.datetime.now()
+    for name in ('products', 'stores', 'inventory', 'reorder_plans'):
+        db[name].drop()
+
+    db.products.insert_many([
+        {
+            'product_id': product_id(j),
+            'category': CATEGORIES[j % len(CATEGORIES)],
+            'price': round(float(rng.uniform(5, 100)), 2),
+            'discount': int(rng.choice([0, 5, 10, 15, 20])),
+            'name': f"Product {product_id(j)}",
+            'min_replenish_time': int(rng.integers(3, 21))
+        }
+        for j in range(num_products)
+    ])
+    db.stores.insert_many([
+        {'store_id': store_id(i), 'region': REGIONS[i % len(REGIONS)], 'name': f"Store {store_id(i)}"}
+        for i in range(num_stores)
+    ])
+
+    batch = []
+    for i in range(num_stores):
+        daily_bases = rng.integers(1, 200, num_products)
+        # ~5% out of stock, ~15% under a week of cover, the rest up to ~4 months of cover
+        cover_days = rng.choice([0, 3, 30, 120], num_products, p=[0.05, 0.15, 0.6, 0.2]) * rng.uniform(0.5, 1.5, num_products)
+        for j in range(num_products):
+            current_stock = int(daily_bases[j] * cover_days[j])
+            batch.append({
+                'store_id': store_id(i),
+                'product_id': product_id(j),
+                'current_stock': current_stock,
+                'last_updated': now,
+                'daily_sales_simulation_base': int(daily_bases[j]),
+                'stock_cover_days': _stock_cover_days(current_stock, int(daily_bases[j])),
+                'last_sold_quantity': int(rng.integers(0, 50))
+            })
+            if len(batch) >= INSERT_BATCH_SIZE:
+                db.inventory.insert_many(batch, ordered=False)
+                batch = []
+    if batch:
+        db.inventory.insert_many(batch, ordered=False)
+
+    ensure_indexes(db, ['inventory', 'products', 'stores', 'reorder_plans'])
+    invalidate_catalog(db) # The next benchmark loads the new catalog
+    return {'store_id': store_id(0), 'product_id': product_id(0), 'num_stores': num_stores, 'num_products': num_products}
+
+def make_batch_csv(num_rows, num_stores, num_products, seed=0):
+    """
+    A sales/receipts batch CSV over the synthetic SKUs (bytes, like an uploaded file stream).
+    """
+    rng = np.random.default_rng(seed)
+    stores = rng.integers(0, num_stores, num_rows)
+    products = rng.integers(0, num_products, num_rows)
+    quantities = rng.integers(1, 5, num_rows)
+    lines = ['store_id,product_id,quantity']
+    lines.extend(f"{store_id(s)},{product_id(p)},{q}" for s, p, q in zip(stores, products, quantities))
+    return ('\n'.join(lines) + '\n').encode()
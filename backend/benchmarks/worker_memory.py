@@ -0,0 +1,79 @@
+# backend/benchmarks/worker_memory.py
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def read_smaps_rollup(pid):
+    """
+    Returns the Rss, Pss and USS (private clean + dirty) of a process in MiB, from
+    /proc/<pid>/smaps_rollup (Linux 4.14+).
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1]) # kB
+    uss = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return {'rss': values.get('Rss', 0) / 1024, 'pss': values.get('Pss', 0) / 1024, 'uss': uss / 1024}
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+def measure(workers, preload, port, settle_seconds):
+    """
+    Starts gunicorn with the given worker count and preload setting, waits for the workers
+    to boot and returns the memory of the master and of each worker.
+    """
+    env = dict(os.environ, GUNICORN_WORKERS=str(workers), GUNICORN_PRELOAD='true' if preload else 'false',
+               GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_ACCESS_LOG='')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        # Workers load the model themselves without preload, so wait until all of them exist and settle
+        deadline = time.time() + 120
+        while time.time() < deadline and len(child_pids(process.pid)) < workers:
+            time.sleep(0.5)
+        time.sleep(settle_seconds)
+        master = read_smaps_rollup(process.pid)
+        worker_stats = [read_smaps_rollup(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+    return master, worker_stats
+
+def main():
+    """
+    Compares the per-worker memory of gunicorn with and without preload_app. USS is the memory
+    only that worker holds (what each extra worker costs); PSS splits shared pages across the
+    processes sharing them. Linux only; needs gunicorn, the model files and a reachable MongoDB.
+    Run from the backend/ directory: `python -m benchmarks.worker_memory`.
+    """
+    parser = argparse.ArgumentParser(description="Worker memory of gunicorn with and without preload_app.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--settle-seconds', type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{'preload':>8} {'workers':>8} {'worker USS MiB':>15} {'worker PSS MiB':>15} {'total PSS MiB':>14}")
+    for workers in args.workers:
+        for preload in (False, True):
+            master, worker_stats = measure(workers, preload, args.port, args.settle_seconds)
+            if not worker_stats:
+                print(f"{str(preload):>8} {workers:>8} no workers found (check that gunicorn starts)")
+                continue
+            mean_uss = sum(w['uss'] for w in worker_stats) / len(worker_stats)
+            mean_pss = sum(w['pss'] for w in worker_stats) / len(worker_stats)
+            total_pss = master['pss'] + sum(w['pss'] for w in worker_stats)
+            print(f"{str(preload):>8} {workers:>8} {mean_uss:>15.1f} {mean_pss:>15.1f} {total_pss:>14.1f}")
+
+if __name__ == '__main__':
+    main()
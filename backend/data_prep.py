@@ -1,99 +1,199 @@
 # backend/data_prep.py
-import pandas as pd
-import json
+import argparse
 import datetime
+import json
 import os
-import random # NEW: Import random for generating replenishment time
+
+import numpy as np
+import pandas as pd
 
 # Path to your downloaded Kaggle dataset: "Retail Store Inventory Forecasting Dataset"
 # This file should be in the same directory as this script.
 DATASET_PATH = 'retail_inventory_forecast.csv'
 
-def prepare_firestore_data(csv_path):
+REQUIRED_COLUMNS = ['Store ID', 'Product ID', 'Inventory Level', 'Units Sold', 'Category', 'Price', 'Region']
+# Only the required columns are parsed, with explicit dtypes (IDs stay strings)
+COLUMN_DTYPES = {
+    'Store ID': str,
+    'Product ID': str,
+    'Inventory Level': 'int64',
+    'Units Sold': 'int64',
+    'Category': str,
+    'Price': 'float64',
+    'Region': str
+}
+DEFAULT_CHUNK_ROWS = 500_000
+DEFAULT_SEED = 42 # Seed of the random min_replenish_time, for reproducible outputs
+
+INVENTORY_KEY = ['Store ID', 'Product ID']
+INVENTORY_VALUES = ['Inventory Level', 'Units Sold']
+
+
+def _append_first_seen(table, chunk, key):
+    """
+    Adds the rows of `chunk` whose key has not been seen yet (first occurrence wins).
+    """
+    firsts = chunk.drop_duplicates(key, keep='first').set_index(key)
+    if table is None:
+        return firsts
+    return pd.concat([table, firsts[~firsts.index.isin(table.index)]])
+
+
+def _merge_last_seen(table, chunk):
+    """
+    Keeps the last occurrence of every (store, product) pair, in order of first appearance.
+    """
+    first_keys = pd.MultiIndex.from_frame(chunk[INVENTORY_KEY].drop_duplicates(keep='first'))
+    lasts = chunk.drop_duplicates(INVENTORY_KEY, keep='last').set_index(INVENTORY_KEY)[INVENTORY_VALUES]
+    if table is None:
+        return lasts.reindex(first_keys)
+    table = table.reindex(table.index.append(first_keys[~first_keys.isin(table.index)]))
+    table.loc[lasts.index, INVENTORY_VALUES] = lasts
+    return table
+
+
+def build_entity_tables(csv_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Derives the products, stores and inventory tables from the Kaggle CSV in a single chunked
+    pass, so memory is bounded by the number of distinct products, stores and pairs rather
+    than by the size of the extract. Products and stores keep their first occurrence, inventory
+    the last occurrence of each (store, product) pair; tables are in order of first appearance.
+
+    Returns:
+        tuple: (products, stores, inventory) DataFrames indexed by their IDs.
+    """
+    header = pd.read_csv(csv_path, nrows=0)
+    columns = {col.strip(): col for col in header.columns} # Clean column names
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise ValueError(f"Missing one or more required columns in '{csv_path}': {missing}")
+
+    products = stores = inventory = None
+    rows = 0
+    reader = pd.read_csv(
+        csv_path,
+        usecols=[columns[col] for col in REQUIRED_COLUMNS],
+        dtype={columns[col]: dtype for col, dtype in COLUMN_DTYPES.items()},
+        chunksize=chunk_rows
+    )
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip()
+        rows += len(chunk)
+        products = _append_first_seen(products, chunk[['Product ID', 'Category', 'Price']], 'Product ID')
+        stores = _append_first_seen(stores, chunk[['Store ID', 'Region']], 'Store ID')
+        inventory = _merge_last_seen(inventory, chunk)
+        print(f"  Processed {rows} rows ({len(products)} products, {len(stores)} stores, {len(inventory)} inventory items so far)...")
+
+    if products is None:
+        raise ValueError(f"No rows found in '{csv_path}'.")
+    inventory = inventory.astype({'Inventory Level': 'int64', 'Units Sold': 'int64'})
+    return products, stores, inventory
+
+
+def build_documents(products, stores, inventory, seed=DEFAULT_SEED, timestamp=None):
+    """
+    Turns the entity tables into the document lists written to NDJSON, with the same
+    fields and field order as before. `min_replenish_time` is drawn from a seeded RNG.
+    """
+    timestamp = (timestamp or datetime.datetime.now()).isoformat() # ISO format for datetime
+    rng = np.random.default_rng(seed)
+    min_replenish_times = rng.integers(3, 21, len(products)).tolist() # Random replenishment time (3-20 days)
+
+    products_list = [
+        {
+            'product_id': product_id,
+            'category': category,
+            'price': price,
+            'name': f"Product {product_id}", # Mock name
+            'min_replenish_time': min_replenish_time
+        }
+        for product_id, category, price, min_replenish_time in zip(
+            products.index.tolist(), products['Category'].tolist(), products['Price'].tolist(), min_replenish_times
+        )
+    ]
+    stores_list = [
+        {'store_id': store_id, 'region': region, 'name': f"Store {store_id}"} # Mock name
+        for store_id, region in zip(stores.index.tolist(), stores['Region'].tolist())
+    ]
+    inventory_list = [
+        {
+            'store_id': store_id,
+            'product_id': product_id,
+            'current_stock': current_stock,
+            'last_updated': timestamp,
+            'daily_sales_simulation_base': max(1, units_sold) # Ensure min 1 to avoid division by zero
+        }
+        for (store_id, product_id), current_stock, units_sold in zip(
+            inventory.index.tolist(), inventory['Inventory Level'].tolist(), inventory['Units Sold'].tolist()
+        )
+    ]
+    return products_list, stores_list, inventory_list
+
+
+def write_ndjson(data_list, filename, buffer_lines=10_000):
+    """
+    Writes one JSON object per line. IDs, stock, price and quantity numbers are written as strings.
+    """
+    with open(filename, 'w') as f:
+        lines = []
+        for item in data_list:
+            # Convert IDs to string for consistency if they might be numbers initially
+            item_copy = {k: str(v) if isinstance(v, (int, float)) and ('id' in k.lower() or 'stock' in k.lower() or 'price' in k.lower() or 'quantity' in k.lower()) else v for k, v in item.items()}
+            lines.append(json.dumps(item_copy) + '\n') # Newline for each JSON object
+            if len(lines) >= buffer_lines:
+                f.writelines(lines)
+                lines = []
+        f.writelines(lines)
+
+
+def write_parquet(data_list, filename):
+    """
+    Writes the documents as a Parquet file with typed columns (requires pyarrow or fastparquet).
+    """
+    frame = pd.DataFrame(data_list)
+    if 'last_updated' in frame:
+        frame['last_updated'] = pd.to_datetime(frame['last_updated'])
+    frame.to_parquet(filename, index=False)
+
+
+def prepare_firestore_data(csv_path, output_dir=None, chunk_rows=DEFAULT_CHUNK_ROWS, seed=DEFAULT_SEED, parquet=False):
     """
     Reads the retail inventory CSV, processes it, and generates
     NDJSON files suitable for MongoDB (and Firestore) import.
-    Generates 'inventory.json', 'products.json', and 'stores.json' locally.
-    Adds a random 'min_replenish_time' to products.
+    Generates 'inventory.json', 'products.json', and 'stores.json' locally,
+    plus Parquet copies of the three tables if `parquet` is set.
+    Adds a seeded random 'min_replenish_time' to products.
     """
     if not os.path.exists(csv_path):
         print(f"Error: Dataset not found at '{csv_path}'.")
         print("Please ensure 'retail_inventory_forecast.csv' is in the same directory as this script.")
         return
 
-    try:
-        df = pd.read_csv(csv_path)
-        df.columns = df.columns.str.strip() # Clean column names
-
-        required_cols = ['Store ID', 'Product ID', 'Inventory Level', 'Units Sold', 'Category', 'Price', 'Region']
-        if not all(col in df.columns for col in required_cols):
-            print(f"Error: Missing one or more required columns in '{csv_path}'.")
-            print(f"Expected columns: {required_cols}")
-            return
+    output_dir = output_dir or os.path.dirname(csv_path)
 
+    try:
         print("Starting data preparation for database import...")
-
-        # --- Prepare Products Data ---
-        products_data = {}
-        for _, row in df.iterrows():
-            product_id = str(row['Product ID'])
-            if product_id not in products_data:
-                products_data[product_id] = {
-                    'product_id': product_id,
-                    'category': row['Category'],
-                    'price': float(row['Price']),
-                    'name': f"Product {product_id}", # Mock name
-                    'min_replenish_time': random.randint(3, 20) # NEW: Random replenishment time (3-20 days)
-                }
-        products_list = list(products_data.values())
+        products, stores, inventory = build_entity_tables(csv_path, chunk_rows)
+        products_list, stores_list, inventory_list = build_documents(products, stores, inventory, seed)
         print(f"Prepared {len(products_list)} unique products.")
-
-        # --- Prepare Stores Data ---
-        stores_data = {}
-        for _, row in df.iterrows():
-            store_id = str(row['Store ID'])
-            if store_id not in stores_data:
-                stores_data[store_id] = {
-                    'store_id': store_id,
-                    'region': row['Region'],
-                    'name': f"Store {store_id}" # Mock name
-                }
-        stores_list = list(stores_data.values())
         print(f"Prepared {len(stores_list)} unique stores.")
-
-        # --- Prepare Inventory Data ---
-        inventory_items = {}
-        for _, row in df.iterrows():
-            store_id = str(row['Store ID'])
-            product_id = str(row['Product ID'])
-            doc_key = f"{store_id}_{product_id}" # Using a key to ensure uniqueness per store-product pair
-
-            # This will keep the last entry if duplicates exist for same store-product in the CSV
-            inventory_items[doc_key] = { 
-                'store_id': store_id,
-                'product_id': product_id,
-                'current_stock': int(row['Inventory Level']),
-                'last_updated': datetime.datetime.now().isoformat(), # ISO format for datetime
-                'daily_sales_simulation_base': max(1, int(row['Units Sold'])) # Ensure min 1 to avoid division by zero
-            }
-        inventory_list = list(inventory_items.values())
         print(f"Prepared {len(inventory_list)} unique inventory items.")
 
-        # --- Write to NDJSON files ---
-        def write_ndjson(data_list, filename):
-            with open(filename, 'w') as f:
-                for item in data_list:
-                    # Convert IDs to string for consistency if they might be numbers initially
-                    item_copy = {k: str(v) if isinstance(v, (int, float)) and ('id' in k.lower() or 'stock' in k.lower() or 'price' in k.lower() or 'quantity' in k.lower()) else v for k, v in item.items()}
-                    json.dump(item_copy, f)
-                    f.write('\n') # Newline for each JSON object
-
-        write_ndjson(products_list, os.path.join(os.path.dirname(csv_path), 'products.json'))
-        write_ndjson(stores_list, os.path.join(os.path.dirname(csv_path), 'stores.json'))
-        write_ndjson(inventory_list, os.path.join(os.path.dirname(csv_path), 'inventory.json'))
-
-        print("\nSuccessfully generated products.json, stores.json, and inventory.json in the backend/ directory.")
-        
+        outputs = {'products': products_list, 'stores': stores_list, 'inventory': inventory_list}
+        for name, data_list in outputs.items():
+            write_ndjson(data_list, os.path.join(output_dir, f"{name}.json"))
+        print(f"\nSuccessfully generated products.json, stores.json, and inventory.json in {output_dir}.")
+
+        if parquet:
+            try:
+                for name, data_list in outputs.items():
+                    write_parquet(data_list, os.path.join(output_dir, f"{name}.parquet"))
+                print(f"Successfully generated products.parquet, stores.parquet, and inventory.parquet in {output_dir}.")
+            except ImportError as e:
+                print(f"Parquet output skipped: {e}. Install pyarrow to enable it.")
+
+    except ValueError as e:
+        print(f"Error: {e}")
     except Exception as e:
         print(f"An error occurred during data preparation: {e}")
         import traceback
@@ -101,5 +201,11 @@ def prepare_firestore_data(csv_path):
 
 if __name__ == '__main__':
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    csv_file_path = os.path.join(current_dir, DATASET_PATH)
-    prepare_firestore_data(csv_file_path)
+    parser = argparse.ArgumentParser(description="Generate products/stores/inventory NDJSON files from the Kaggle CSV.")
+    parser.add_argument('csv_path', nargs='?', default=os.path.join(current_dir, DATASET_PATH))
+    parser.add_argument('--output-dir', default=None, help="Directory for the generated files (default: next to the CSV).")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="CSV rows parsed per chunk.")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Seed of the random min_replenish_time.")
+    parser.add_argument('--parquet', action='store_true', help="Also write Parquet copies of the three tables.")
+    args = parser.parse_args()
+    prepare_firestore_data(args.csv_path, args.output_dir, args.chunk_rows, args.seed, args.parquet)
@@ -1,7 +1,16 @@
 # backend/db_client.py
-from pymongo import MongoClient
+from pymongo import MongoClient, ReadPreference
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+from pymongo.write_concern import WriteConcern
 from dotenv import load_dotenv
+import contextvars
+import datetime
+import json
 import os
+import threading
+import time
 import urllib.parse
 import certifi # For SSL certificates
 
@@ -12,71 +21,410 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "walmart_inventory_db")
 
+def _env_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+# Connection pool, timeouts and compression (unset values keep the driver defaults)
+MONGO_MAX_POOL_SIZE = _env_int("MONGO_MAX_POOL_SIZE", 100)
+MONGO_MIN_POOL_SIZE = _env_int("MONGO_MIN_POOL_SIZE", 0)
+MONGO_MAX_IDLE_TIME_MS = _env_int("MONGO_MAX_IDLE_TIME_MS")
+MONGO_WAIT_QUEUE_TIMEOUT_MS = _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+MONGO_CONNECT_TIMEOUT_MS = _env_int("MONGO_CONNECT_TIMEOUT_MS", 10000)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000)
+MONGO_SOCKET_TIMEOUT_MS = _env_int("MONGO_SOCKET_TIMEOUT_MS")
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "") # e.g. "zstd,snappy,zlib"
+MONGO_PING_ON_CONNECT = os.getenv("MONGO_PING_ON_CONNECT", "true").lower() in ('1', 'true', 'yes')
+# Kept on by default for the hackathon environment; should be disabled in production
+MONGO_TLS_ALLOW_INVALID_CERTIFICATES = os.getenv("MONGO_TLS_ALLOW_INVALID_CERTIFICATES", "true").lower() in ('1', 'true', 'yes')
+
+# Database profiles: transactional reads/writes go to the primary; analytical reads
+# (alerts, batch forecasts) may be served by a secondary.
+PROFILE_TRANSACTIONAL = 'transactional'
+PROFILE_ANALYTICAL = 'analytical'
+MONGO_TRANSACTIONAL_WRITE_CONCERN = os.getenv("MONGO_TRANSACTIONAL_WRITE_CONCERN", "majority")
+MONGO_ANALYTICAL_READ_PREFERENCE = os.getenv("MONGO_ANALYTICAL_READ_PREFERENCE", "secondaryPreferred")
+MONGO_ANALYTICAL_MAX_STALENESS_SECONDS = _env_int("MONGO_ANALYTICAL_MAX_STALENESS_SECONDS", -1) # -1: no limit (minimum 90 otherwise)
+
+# Command monitoring: per-request round trips and DB time, and a structured slow-operation log
+MONGO_COMMAND_MONITORING = os.getenv("MONGO_COMMAND_MONITORING", "true").lower() in ('1', 'true', 'yes')
+MONGO_SLOW_OP_MS = float(os.getenv("MONGO_SLOW_OP_MS", "100"))
+# Requests issuing more commands than this are logged (N+1 query patterns)
+MONGO_REQUEST_ROUND_TRIPS_WARN = _env_int("MONGO_REQUEST_ROUND_TRIPS_WARN", 50)
+
+
+class PoolStatsListener(ConnectionPoolListener):
+    """
+    Collects connection pool statistics per server: open and checked-out connections,
+    checkouts, failed checkouts and the time spent waiting for a connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = {}
+
+    def _server(self, address):
+        key = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address)
+        return self._servers.setdefault(key, {
+            'open_connections': 0,
+            'checked_out': 0,
+            'max_checked_out': 0,
+            'checkouts': 0,
+            'checkout_failures': 0,
+            'checkout_wait_ms_total': 0.0,
+            'checkout_wait_ms_max': 0.0,
+            'pool_clears': 0
+        })
+
+    def _record_wait(self, stats, event):
+        duration = getattr(event, 'duration', None) # Seconds, reported by pymongo >= 4.7
+        if duration is not None:
+            stats['checkout_wait_ms_total'] += duration * 1000
+            stats['checkout_wait_ms_max'] = max(stats['checkout_wait_ms_max'], duration * 1000)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._server(event.address)['open_connections'] += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._server(event.address)['open_connections'] -= 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            stats = self._server(event.address)
+            stats['checked_out'] += 1
+            stats['checkouts'] += 1
+            stats['max_checked_out'] = max(stats['max_checked_out'], stats['checked_out'])
+            self._record_wait(stats, event)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            stats = self._server(event.address)
+            stats['checkout_failures'] += 1
+            self._record_wait(stats, event)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._server(event.address)['checked_out'] -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._server(event.address)['pool_clears'] += 1
+
+    # Events without statistics
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def snapshot(self):
+        with self._lock:
+            servers = {}
+            for address, stats in self._servers.items():
+                server = dict(stats)
+                server['checkout_wait_ms_avg'] = round(stats['checkout_wait_ms_total'] / stats['checkouts'], 3) if stats['checkouts'] else 0.0
+                server['checkout_wait_ms_total'] = round(stats['checkout_wait_ms_total'], 3)
+                server['checkout_wait_ms_max'] = round(stats['checkout_wait_ms_max'], 3)
+                servers[address] = server
+            return servers
+
+
+class RequestDbStats:
+    """
+    MongoDB commands issued on behalf of one request (also from the threads it fans out to).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.round_trips = 0
+        self.db_time_ms = 0.0
+        self.docs_returned = 0
+
+    def record(self, duration_ms, docs_returned):
+        with self._lock:
+            self.round_trips += 1
+            self.db_time_ms += duration_ms
+            self.docs_returned += docs_returned
+
+
+_request_db_stats = contextvars.ContextVar('request_db_stats', default=None)
+
+
+def start_request_db_stats():
+    """
+    Starts counting the MongoDB commands of the current request; returns the stats object.
+    """
+    stats = RequestDbStats()
+    _request_db_stats.set(stats)
+    return stats
+
+
+def get_request_db_stats():
+    return _request_db_stats.get()
+
+
+def log_request_db_stats(route, method, stats):
+    """
+    Logs a request as one JSON line if it issued more than MONGO_REQUEST_ROUND_TRIPS_WARN commands.
+    """
+    if stats is not None and stats.round_trips > MONGO_REQUEST_ROUND_TRIPS_WARN:
+        print(json.dumps({
+            'event': 'many_mongo_round_trips',
+            'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+            'pid': os.getpid(),
+            'route': route,
+            'method': method,
+            'round_trips': stats.round_trips,
+            'db_time_ms': round(stats.db_time_ms, 3),
+            'docs_returned': stats.docs_returned
+        }))
+
+
+def _docs_returned(command_name, reply):
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', ())))
+    if command_name == 'findAndModify':
+        return 1 if reply.get('value') else 0
+    if command_name in ('count', 'distinct'):
+        return 1
+    return 0
+
+
+class CommandStatsListener(CommandListener):
+    """
+    Records the name, collection, duration and number of returned documents of every command.
+    Adds them to the stats of the request being served and logs commands slower than
+    MONGO_SLOW_OP_MS as one JSON line, with the shape (field names) of the filter but not its values.
+    """
+
+    def __init__(self, slow_op_ms=MONGO_SLOW_OP_MS):
+        self.slow_op_ms = slow_op_ms
+        self._lock = threading.Lock()
+        self._started = {} # (connection, request id) -> (collection, filter fields)
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        query_filter = command.get('filter', command.get('query', command.get('q')))
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (
+                collection if isinstance(collection, str) else None,
+                sorted(query_filter) if isinstance(query_filter, dict) else None
+            )
+
+    def _finish(self, event, reply, failure=None):
+        with self._lock:
+            collection, filter_fields = self._started.pop((event.connection_id, event.request_id), (None, None))
+        duration_ms = event.duration_micros / 1000
+        docs_returned = _docs_returned(event.command_name, reply) if reply else 0
+
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats.record(duration_ms, docs_returned)
+
+        if duration_ms >= self.slow_op_ms:
+            entry = {
+                'event': 'slow_mongo_command',
+                'time': datetime.datetime.now().isoformat(timespec='milliseconds'),
+                'pid': os.getpid(),
+                'command': event.command_name,
+                'database': event.database_name,
+                'collection': collection,
+                'filter_fields': filter_fields,
+                'duration_ms': round(duration_ms, 3),
+                'docs_returned': docs_returned
+            }
+            if failure is not None:
+                entry['error'] = str(failure.get('errmsg', failure)) if isinstance(failure, dict) else str(failure)
+            print(json.dumps(entry))
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None, event.failure)
+
+
+# Per-process state: a MongoClient must not be used across fork(), so each process
+# (e.g. each pre-forked web worker) lazily creates its own on first use.
 client = None
 db = None
+_client_pid = None
+_databases = {}
+_pool_stats = None
+_client_created_at = None
+_connect_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    """
+    Forgets the parent's client in a forked child (without closing it: its sockets belong to the parent).
+    """
+    global client, db, _client_pid, _databases, _pool_stats, _client_created_at, _connect_lock
+    client = None
+    db = None
+    _client_pid = None
+    _databases = {}
+    _pool_stats = None
+    _client_created_at = None
+    _connect_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _escaped_uri():
+    parsed_uri = urllib.parse.urlparse(MONGO_URI)
+    username = parsed_uri.username
+    password = parsed_uri.password
+
+    # Reconstruct the URI with URL-escaped credentials if they exist
+    if username and password:
+        escaped_username = urllib.parse.quote_plus(username)
+        escaped_password = urllib.parse.quote_plus(password)
+        # Reconstruct only the userinfo part for netloc
+        netloc_with_creds = f"{escaped_username}:{escaped_password}@{parsed_uri.hostname}"
+        return parsed_uri._replace(netloc=netloc_with_creds).geturl()
+    return MONGO_URI # Use as is if no username/password in URI
+
+
+def _client_options():
+    options = {
+        'maxPoolSize': MONGO_MAX_POOL_SIZE,
+        'minPoolSize': MONGO_MIN_POOL_SIZE,
+        'connectTimeoutMS': MONGO_CONNECT_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        'tlsCAFile': certifi.where(),
+        'tlsAllowInvalidCertificates': MONGO_TLS_ALLOW_INVALID_CERTIFICATES
+    }
+    if MONGO_MAX_IDLE_TIME_MS is not None:
+        options['maxIdleTimeMS'] = MONGO_MAX_IDLE_TIME_MS
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options['waitQueueTimeoutMS'] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if MONGO_SOCKET_TIMEOUT_MS is not None:
+        options['socketTimeoutMS'] = MONGO_SOCKET_TIMEOUT_MS
+    if MONGO_COMPRESSORS:
+        options['compressors'] = MONGO_COMPRESSORS
+    return options
+
+
+def _profile_database(profile):
+    """
+    The database handle of a profile, with its read preference, read concern and write concern.
+    """
+    if profile == PROFILE_TRANSACTIONAL:
+        write_concern = WriteConcern(w=int(MONGO_TRANSACTIONAL_WRITE_CONCERN) if MONGO_TRANSACTIONAL_WRITE_CONCERN.isdigit() else MONGO_TRANSACTIONAL_WRITE_CONCERN)
+        return client.get_database(MONGO_DB_NAME, read_preference=ReadPreference.PRIMARY, write_concern=write_concern)
+    if profile == PROFILE_ANALYTICAL:
+        read_preference = make_read_preference(
+            read_pref_mode_from_name(MONGO_ANALYTICAL_READ_PREFERENCE),
+            None,
+            max_staleness=MONGO_ANALYTICAL_MAX_STALENESS_SECONDS
+        )
+        return client.get_database(MONGO_DB_NAME, read_preference=read_preference, read_concern=ReadConcern('local'))
+    raise ValueError(f"Unknown database profile '{profile}'.")
+
 
 def connect_to_mongodb():
     """
-    Establishes a connection to MongoDB Atlas.
+    Establishes this process's connection to MongoDB Atlas (once per process; safe after fork).
     Handles URL escaping for password in the connection string and uses certifi for SSL.
+    Pool size, timeouts and compression come from the MONGO_* environment variables.
     """
-    global client, db
-    if client is not None and db is not None:
+    global client, db, _client_pid, _databases, _pool_stats, _client_created_at
+    if client is not None and _client_pid == os.getpid():
         return db
 
     if MONGO_URI is None:
         raise ValueError("MONGO_URI environment variable not set. Please check your .env file.")
 
-    try:
-        print("Connecting to MongoDB Atlas...")
-        
-        parsed_uri = urllib.parse.urlparse(MONGO_URI)
-        username = parsed_uri.username
-        password = parsed_uri.password
-        
-        # Reconstruct the URI with URL-escaped credentials if they exist
-        if username and password:
-            escaped_username = urllib.parse.quote_plus(username)
-            escaped_password = urllib.parse.quote_plus(password)
-            # Reconstruct only the userinfo part for netloc
-            netloc_with_creds = f"{escaped_username}:{escaped_password}@{parsed_uri.hostname}"
-            mongo_uri_escaped = parsed_uri._replace(netloc=netloc_with_creds).geturl()
-        else:
-            mongo_uri_escaped = MONGO_URI # Use as is if no username/password in URI
-
-        # Use tlsCAFile from certifi for SSL. We will KEEP tlsAllowInvalidCertificates=True for hackathon
-        # as it was required to get it working for you due to environment constraints.
-        # In a production setup, tlsAllowInvalidCertificates=True should be REMOVED.
-        client = MongoClient(mongo_uri_escaped, tlsCAFile=certifi.where(), tlsAllowInvalidCertificates=True)
-        
-        # The ping command verifies the connection
-        client.admin.command('ping') 
-        
-        db = client[MONGO_DB_NAME]
-        print(f"Successfully connected to MongoDB database: {MONGO_DB_NAME}")
-        return db
-    except Exception as e:
-        print(f"Error connecting to MongoDB: {e}")
-        raise
+    with _connect_lock:
+        if client is not None and _client_pid == os.getpid():
+            return db
+        try:
+            print(f"Connecting to MongoDB Atlas (pid {os.getpid()}, max pool size {MONGO_MAX_POOL_SIZE})...")
+            pool_stats = PoolStatsListener()
+            event_listeners = [pool_stats]
+            if MONGO_COMMAND_MONITORING:
+                event_listeners.append(CommandStatsListener())
+            new_client = MongoClient(_escaped_uri(), event_listeners=event_listeners, **_client_options())
+
+            if MONGO_PING_ON_CONNECT:
+                # The ping command verifies the connection
+                new_client.admin.command('ping')
+
+            client = new_client
+            _pool_stats = pool_stats
+            _client_pid = os.getpid()
+            _client_created_at = time.time()
+            _databases = {}
+            db = get_db(PROFILE_TRANSACTIONAL)
+            print(f"Successfully connected to MongoDB database: {MONGO_DB_NAME}")
+            return db
+        except Exception as e:
+            print(f"Error connecting to MongoDB: {e}")
+            raise
+
+
+def get_db(profile=PROFILE_TRANSACTIONAL):
+    """
+    Returns the MongoDB database instance for this process. Connects if not already connected.
 
-def get_db():
+    Args:
+        profile (str): 'transactional' (primary reads, majority writes; the default) or
+            'analytical' (heavy reads such as alerts and batch forecasts, which may be
+            served by a secondary, see MONGO_ANALYTICAL_READ_PREFERENCE).
     """
-    Returns the MongoDB database instance. Connects if not already connected.
+    if client is None or _client_pid != os.getpid():
+        connect_to_mongodb()
+    database = _databases.get(profile)
+    if database is None:
+        database = _databases[profile] = _profile_database(profile)
+    return database
+
+
+def get_pool_stats():
     """
-    if db is None:
-        return connect_to_mongodb()
-    return db
+    Connection pool statistics of this process's client, per server, to help size
+    workers and MONGO_MAX_POOL_SIZE (checked-out connections, checkout wait times).
+    """
+    if _pool_stats is None or _client_pid != os.getpid():
+        return {'pid': os.getpid(), 'connected': False, 'servers': {}}
+    return {
+        'pid': os.getpid(),
+        'connected': True,
+        'max_pool_size': MONGO_MAX_POOL_SIZE,
+        'client_age_seconds': round(time.time() - _client_created_at, 1),
+        'servers': _pool_stats.snapshot()
+    }
+
 
 def close_mongodb_connection():
     """
     Closes the MongoDB connection.
     """
-    global client, db
+    global client, db, _client_pid, _databases, _pool_stats
     if client is not None:
-        client.close()
-        print("MongoDB connection closed.")
+        if _client_pid == os.getpid():
+            client.close()
+            print("MongoDB connection closed.")
         client = None
         db = None
+        _client_pid = None
+        _databases = {}
+        _pool_stats = None
 
 # Example usage (for testing, will be called from app.py)
 if __name__ == "__main__":
@@ -0,0 +1,272 @@
+# backend/generate_dataset.py
+import argparse
+import datetime
+import gzip
+import os
+
+import numpy as np
+import pandas as pd
+
+# Same schema as the Kaggle "Retail Store Inventory Forecasting Dataset" read by data_prep.py
+# and train_models.py (without its 'Demand Forecast' column, which training drops anyway)
+OUTPUT_COLUMNS = [
+    'Date', 'Store ID', 'Product ID', 'Category', 'Region', 'Inventory Level', 'Units Sold',
+    'Units Ordered', 'Price', 'Discount', 'Weather Condition', 'Holiday/Promotion',
+    'Competitor Pricing', 'Seasonality'
+]
+CATEGORIES = ['Groceries', 'Toys', 'Electronics', 'Furniture', 'Clothing']
+REGIONS = ['North', 'South', 'East', 'West']
+WEATHER_CONDITIONS = ['Sunny', 'Cloudy', 'Rainy', 'Snowy']
+SEASONS = ['Winter', 'Spring', 'Summer', 'Autumn']
+# Season label of each calendar month (1-12), as in the training data
+SEASON_BY_MONTH = [None, 'Winter', 'Winter', 'Spring', 'Spring', 'Spring', 'Summer', 'Summer', 'Summer', 'Autumn', 'Autumn', 'Autumn', 'Winter']
+
+# Yearly demand swing per category: (amplitude, month of the peak)
+CATEGORY_SEASONALITY = {
+    'Groceries': (0.05, 12),
+    'Toys': (0.35, 12),
+    'Electronics': (0.25, 11),
+    'Furniture': (0.20, 4),
+    'Clothing': (0.20, 7)
+}
+CATEGORY_PRICE_RANGE = {
+    'Groceries': (2.0, 20.0),
+    'Toys': (10.0, 60.0),
+    'Electronics': (40.0, 400.0),
+    'Furniture': (60.0, 600.0),
+    'Clothing': (10.0, 90.0)
+}
+DAY_OF_WEEK_FACTOR = np.array([0.90, 0.90, 0.95, 1.00, 1.10, 1.25, 1.20]) # Monday..Sunday
+# Probability of each weather condition per season, and its effect on demand
+WEATHER_PROBABILITIES = {
+    'Winter': [0.20, 0.35, 0.20, 0.25],
+    'Spring': [0.40, 0.30, 0.30, 0.00],
+    'Summer': [0.60, 0.25, 0.15, 0.00],
+    'Autumn': [0.30, 0.35, 0.30, 0.05]
+}
+WEATHER_DEMAND_FACTOR = np.array([1.05, 1.00, 0.90, 0.80])
+HOLIDAYS = {(1, 1), (2, 14), (7, 4), (10, 31), (12, 24), (12, 25), (12, 31)}
+HOLIDAY_DEMAND_FACTOR = 1.3
+PROMOTION_START_PROBABILITY = 0.02 # Per series and day
+PROMOTION_DAYS = (3, 8) # Length range of a promotion
+PROMOTION_DISCOUNTS = [10, 15, 20]
+REGULAR_DISCOUNTS = [0, 0, 0, 0, 5]
+REORDER_POINT_DAYS = 7 # Stock is reordered below this many days of base demand...
+ORDER_UP_TO_DAYS = 14 # ...up to this many, delivered the next morning
+
+DEFAULT_STORES = 5
+DEFAULT_PRODUCTS = 20
+DEFAULT_DAYS = 730
+DEFAULT_START_DATE = '2022-01-01'
+DEFAULT_CHUNK_ROWS = 500_000
+DEFAULT_SEED = 42
+
+
+def _id_labels(prefix, count, min_width):
+    width = max(min_width, len(str(count)))
+    return [f"{prefix}{i + 1:0{width}d}" for i in range(count)]
+
+
+def _is_holiday(date):
+    if (date.month, date.day) in HOLIDAYS:
+        return True
+    # Black Friday: the day after the fourth Thursday of November
+    if date.month == 11 and date.weekday() == 4:
+        return 23 <= date.day <= 29
+    return False
+
+
+class SeriesParameters:
+    """
+    The static parameters of every (store, product) series and of the stores and products,
+    drawn once from the seeded generator. Series are ordered by store, then product.
+    """
+
+    def __init__(self, rng, num_stores, num_products, products_per_store):
+        self.store_ids = _id_labels('S', num_stores, 3)
+        self.product_ids = _id_labels('P', num_products, 4)
+
+        product_category = rng.integers(0, len(CATEGORIES), num_products)
+        low = np.array([CATEGORY_PRICE_RANGE[c][0] for c in CATEGORIES])[product_category]
+        high = np.array([CATEGORY_PRICE_RANGE[c][1] for c in CATEGORIES])[product_category]
+        product_price = rng.uniform(low, high)
+        product_demand = rng.lognormal(np.log(100), 0.5, num_products)
+        product_elasticity = rng.uniform(1.0, 3.0, num_products)
+
+        store_region = rng.integers(0, len(REGIONS), num_stores)
+        store_size = rng.lognormal(0.0, 0.3, num_stores)
+        store_price_factor = rng.uniform(0.95, 1.05, num_stores)
+
+        # Each store carries `products_per_store` of the products (all of them by default)
+        if products_per_store >= num_products:
+            assortment = np.tile(np.arange(num_products), (num_stores, 1))
+        else:
+            assortment = np.sort(np.stack([rng.permutation(num_products)[:products_per_store] for _ in range(num_stores)]), axis=1)
+
+        self.store = np.repeat(np.arange(num_stores), assortment.shape[1])
+        self.product = assortment.ravel()
+        self.category = product_category[self.product]
+        self.region = store_region[self.store]
+        self.base_price = product_price[self.product] * store_price_factor[self.store]
+        self.base_demand = product_demand[self.product] * store_size[self.store]
+        self.elasticity = product_elasticity[self.product]
+        amplitude = np.array([CATEGORY_SEASONALITY[c][0] for c in CATEGORIES])
+        peak_day = (np.array([CATEGORY_SEASONALITY[c][1] for c in CATEGORIES]) - 0.5) * 365 / 12
+        self.season_amplitude = amplitude[self.category]
+        self.season_peak_day = peak_day[self.category]
+        self.num_series = len(self.store)
+
+        # Categorical output columns, built once and sliced per chunk
+        self.store_column = pd.Categorical.from_codes(self.store, self.store_ids)
+        self.product_column = pd.Categorical.from_codes(self.product, self.product_ids)
+        self.category_column = pd.Categorical.from_codes(self.category, CATEGORIES)
+        self.region_column = pd.Categorical.from_codes(self.region, REGIONS)
+
+
+def _spawned_rng(seed, *spawn_key):
+    """Returns an independent generator for one stream of the seed (keys must be non-negative)."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=spawn_key))
+
+
+def iter_dataset_days(num_stores, num_products, num_days, start_date, seed=DEFAULT_SEED, products_per_store=None):
+    """
+    Simulates the series day by day and yields one DataFrame per day with the OUTPUT_COLUMNS.
+
+    Demand is Poisson around a base level scaled by day of week, category seasonality, regional
+    weather, holidays, promotions (discount uplift through each product's price elasticity) and
+    the price gap to competitors; sales are capped by the stock on hand, and stock below
+    REORDER_POINT_DAYS of base demand is reordered up to ORDER_UP_TO_DAYS for the next day.
+    The opening stock and every day draw from their own generators, spawned from the seed under
+    keys (0,) and (1, day), so the output does not depend on how it is chunked. Memory grows
+    with the number of series, not with the history.
+    """
+    params = SeriesParameters(np.random.default_rng(seed), num_stores, num_products, products_per_store or num_products)
+    init_rng = _spawned_rng(seed, 0)
+    n = params.num_series
+
+    inventory = np.rint(params.base_demand * init_rng.uniform(REORDER_POINT_DAYS, 3 * ORDER_UP_TO_DAYS, n)).astype(np.int64)
+    incoming = np.zeros(n, dtype=np.int64)
+    promotion_days_left = np.zeros(n, dtype=np.int64)
+    promotion_discount = np.zeros(n, dtype=np.int64)
+
+    for day in range(num_days):
+        rng = _spawned_rng(seed, 1, day)
+        date = start_date + datetime.timedelta(days=day)
+        season = SEASON_BY_MONTH[date.month]
+        day_of_year = date.timetuple().tm_yday
+
+        inventory += incoming # Yesterday's orders arrive before opening
+
+        region_weather = rng.choice(len(WEATHER_CONDITIONS), len(REGIONS), p=WEATHER_PROBABILITIES[season])
+        weather = region_weather[params.region]
+        holiday = _is_holiday(date)
+
+        starting = (promotion_days_left == 0) & (rng.random(n) < PROMOTION_START_PROBABILITY)
+        promotion_days_left[starting] = rng.integers(*PROMOTION_DAYS, starting.sum())
+        promotion_discount[starting] = rng.choice(PROMOTION_DISCOUNTS, starting.sum())
+        on_promotion = promotion_days_left > 0
+        discount = np.where(on_promotion, promotion_discount, rng.choice(REGULAR_DISCOUNTS, n))
+
+        price = np.round(params.base_price * rng.normal(1.0, 0.02, n), 2)
+        competitor_price = np.round(price * rng.uniform(0.9, 1.1, n), 2)
+
+        demand = (
+            params.base_demand
+            * DAY_OF_WEEK_FACTOR[date.weekday()]
+            * (1 + params.season_amplitude * np.cos(2 * np.pi * (day_of_year - params.season_peak_day) / 365))
+            * WEATHER_DEMAND_FACTOR[weather]
+            * (HOLIDAY_DEMAND_FACTOR if holiday else 1.0)
+            * (1 + params.elasticity * discount / 100)
+            * (competitor_price / price) ** params.elasticity
+        )
+        units_sold = np.minimum(rng.poisson(demand), inventory)
+
+        level = inventory.copy()
+        inventory -= units_sold
+        reorder = inventory < params.base_demand * REORDER_POINT_DAYS
+        units_ordered = np.where(reorder, np.rint(params.base_demand * ORDER_UP_TO_DAYS).astype(np.int64) - inventory, 0)
+        incoming = units_ordered
+        promotion_days_left[on_promotion] -= 1
+
+        yield pd.DataFrame({
+            'Date': date.isoformat(),
+            'Store ID': params.store_column,
+            'Product ID': params.product_column,
+            'Category': params.category_column,
+            'Region': params.region_column,
+            'Inventory Level': level,
+            'Units Sold': units_sold,
+            'Units Ordered': units_ordered,
+            'Price': price,
+            'Discount': discount,
+            'Weather Condition': pd.Categorical.from_codes(weather, WEATHER_CONDITIONS),
+            'Holiday/Promotion': (on_promotion | holiday).astype(np.int64),
+            'Competitor Pricing': competitor_price,
+            'Seasonality': season
+        }, columns=OUTPUT_COLUMNS)
+
+
+def generate_dataset(output_path, num_stores=DEFAULT_STORES, num_products=DEFAULT_PRODUCTS, num_days=DEFAULT_DAYS,
+                     start_date=DEFAULT_START_DATE, seed=DEFAULT_SEED, products_per_store=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Writes a synthetic retail dataset CSV (gzip-compressed if the path ends in .gz), appending
+    chunks of about `chunk_rows` rows as the simulation advances, in date, store, product order.
+
+    Args:
+        output_path (str): CSV file to write.
+        num_stores (int): Number of stores.
+        num_products (int): Number of products in the catalog.
+        num_days (int): Days of history.
+        start_date (str): First date (YYYY-MM-DD).
+        seed (int): Seed; the same arguments always produce the same file.
+        products_per_store (int, optional): Products carried by each store (default: all).
+        chunk_rows (int): Rows buffered before each write.
+
+    Returns:
+        int: Number of rows written.
+    """
+    start = datetime.date.fromisoformat(start_date)
+    opener = gzip.open if output_path.endswith('.gz') else open
+    rows = 0
+    buffered = []
+    buffered_rows = 0
+    with opener(output_path, 'wt', newline='') as f:
+        def flush():
+            nonlocal rows, buffered, buffered_rows
+            if buffered:
+                pd.concat(buffered, ignore_index=True).to_csv(f, header=(rows == 0), index=False)
+                rows += buffered_rows
+                buffered = []
+                buffered_rows = 0
+
+        for day, day_frame in enumerate(iter_dataset_days(num_stores, num_products, num_days, start, seed, products_per_store)):
+            # Days larger than a chunk are written in slices so output buffers stay bounded
+            for offset in range(0, len(day_frame), chunk_rows):
+                part = day_frame.iloc[offset:offset + chunk_rows]
+                buffered.append(part)
+                buffered_rows += len(part)
+                if buffered_rows >= chunk_rows:
+                    flush()
+            if (day + 1) % 30 == 0:
+                print(f"  Simulated {day + 1} of {num_days} days ({rows + buffered_rows} rows)...")
+        flush()
+    return rows
+
+
+if __name__ == '__main__':
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic retail dataset with the Kaggle CSV schema.")
+    parser.add_argument('output_path', nargs='?', default=os.path.join(current_dir, 'synthetic_retail_inventory.csv'))
+    parser.add_argument('--stores', type=int, default=DEFAULT_STORES)
+    parser.add_argument('--products', type=int, default=DEFAULT_PRODUCTS)
+    parser.add_argument('--products-per-store', type=int, default=None, help="Products carried by each store (default: all).")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="Days of history.")
+    parser.add_argument('--start-date', default=DEFAULT_START_DATE)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="Rows buffered per write.")
+    args = parser.parse_args()
+
+    print(f"Generating {args.days} days for {args.stores} stores x {args.products_per_store or args.products} products into {args.output_path}...")
+    written = generate_dataset(args.output_path, args.stores, args.products, args.days, args.start_date,
+                               args.seed, args.products_per_store, args.chunk_rows)
+    print(f"Wrote {written} rows to {args.output_path}.")
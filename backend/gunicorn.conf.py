@@ -0,0 +1,61 @@
+# backend/gunicorn.conf.py
+# Production server configuration: `gunicorn -c gunicorn.conf.py wsgi:app` (from the backend/ directory).
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count())))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+# Recycle workers now and then to bound memory growth (0 disables)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+# Import the app (and load the ML model) once in the master; workers share those pages copy-on-write
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+# Load the model before forking when preloading (read by services/model_registry.py);
+# without preload every worker loads it in the background and reports readiness on /ready
+os.environ.setdefault('MODEL_LOAD_MODE', 'sync' if preload_app else 'background')
+
+# Shared directory of the per-worker metric files aggregated by /metrics (read by metrics.py)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'inventory_prometheus'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def on_starting(server):
+    # Metric files of a previous run would be aggregated into this one
+    multiproc_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def when_ready(server):
+    # Move everything loaded so far (model, preprocessor, modules) to the permanent GC generation,
+    # so the collector in the workers never writes to those objects and un-shares their pages
+    if preload_app:
+        gc.freeze()
+    server.log.info(f"Serving with {workers} workers x {threads} threads (preload_app={preload_app}).")
+
+
+def post_fork(server, worker):
+    # db_client and the ingest job pool reset themselves after fork (os.register_at_fork);
+    # MongoDB connections are opened lazily by each worker on its first request
+    server.log.info(f"Worker {worker.pid} forked.")
+
+
+def post_worker_init(worker):
+    from app import start_background_services
+    start_background_services()
+
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
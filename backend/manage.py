@@ -0,0 +1,56 @@
+# backend/manage.py
+import argparse
+import sys
+
+from db_client import get_db, close_mongodb_connection
+from services.indexes import dedupe_inventory, ensure_indexes
+from services.inventory_service import backfill_stock_cover_days, load_initial_inventory_data
+from services.query_plans import check_query_plans
+from services.reorder_planner import DEFAULT_PLANNING_CHUNK_SIZE, run_reorder_planning
+
+def main():
+    """
+    Command-line entry point for batch jobs and maintenance tasks.
+    Run from the backend/ directory, e.g. `python manage.py plan-reorders`.
+    """
+    parser = argparse.ArgumentParser(description="Maintenance commands for the inventory backend.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    plan_parser = subparsers.add_parser('plan-reorders', help="Precompute reorder recommendations for every inventory item.")
+    plan_parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: number of CPUs).")
+    plan_parser.add_argument('--chunk-size', type=int, default=DEFAULT_PLANNING_CHUNK_SIZE, help="SKUs forecast together per worker task.")
+
+    subparsers.add_parser('backfill-stock-cover', help="Migration: compute stock_cover_days on existing inventory documents and index it.")
+
+    load_parser = subparsers.add_parser('load-initial-data', help="Load products, stores and inventory from the NDJSON files generated by data_prep.py.")
+    load_parser.add_argument('--workers', type=int, default=None, help="Parallel inserts (default: INITIAL_LOAD_WORKERS).")
+    load_parser.add_argument('--fresh', action='store_true', help="Ignore checkpoints of an interrupted load and start over.")
+
+    subparsers.add_parser('ensure-indexes', help="Create the indexes of services/indexes.py (also done at app startup).")
+    subparsers.add_parser('dedupe-inventory', help="Remove duplicate inventory documents per SKU so the unique index can be built.")
+    subparsers.add_parser('check-query-plans', help="Explain every hot-path query and fail if one falls back to a COLLSCAN.")
+
+    args = parser.parse_args()
+
+    db = get_db()
+    try:
+        if args.command == 'plan-reorders':
+            run_reorder_planning(db, processes=args.processes, chunk_size=args.chunk_size)
+        elif args.command == 'backfill-stock-cover':
+            backfill_stock_cover_days(db)
+        elif args.command == 'load-initial-data':
+            load_initial_inventory_data(db, workers=args.workers, fresh=args.fresh)
+        elif args.command == 'ensure-indexes':
+            if ensure_indexes(db):
+                sys.exit(1)
+        elif args.command == 'dedupe-inventory':
+            dedupe_inventory(db)
+            ensure_indexes(db, ['inventory'])
+        elif args.command == 'check-query-plans':
+            if not all(entry['passed'] for entry in check_query_plans(db)):
+                sys.exit(1)
+    finally:
+        close_mongodb_connection()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# backend/metrics.py
+import contextlib
+import contextvars
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Set by gunicorn.conf.py so /metrics aggregates every worker, not just the one that answers the scrape
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', "Latency of API requests until the response is returned.",
+    ['route', 'method', 'status'], buckets=REQUEST_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    'service_stage_duration_seconds', "Time spent in a named stage of a service function (db_fetch, feature_build, transform, predict, serialize).",
+    ['route', 'stage'], buckets=STAGE_BUCKETS
+)
+BATCH_ROWS = Counter(
+    'batch_rows_total', "Rows received (in) and results returned (out) by the batch endpoints.",
+    ['route', 'direction', 'outcome']
+)
+
+# Route of the request being served, so stage timers in the service layer need no extra arguments
+_current_route = contextvars.ContextVar('metrics_route', default='none')
+
+
+def set_route(route):
+    return _current_route.set(route)
+
+
+def reset_route(token):
+    _current_route.reset(token)
+
+
+def observe_request(route, method, status, seconds):
+    if METRICS_ENABLED:
+        REQUEST_LATENCY.labels(route, method, str(status)).observe(seconds)
+
+
+def observe_stage(stage, seconds):
+    """
+    Records time measured by the caller (for stages timed inside loops without a context manager).
+    """
+    if METRICS_ENABLED:
+        STAGE_LATENCY.labels(_current_route.get(), stage).observe(seconds)
+
+
+@contextlib.contextmanager
+def stage_timer(stage):
+    """
+    Times the enclosed block as `stage` of the current route.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(_current_route.get(), stage).observe(time.perf_counter() - started)
+
+
+def count_batch_rows(direction, count, outcome='all'):
+    if METRICS_ENABLED and count:
+        BATCH_ROWS.labels(_current_route.get(), direction, outcome).inc(count)
+
+
+def count_batch_results(results):
+    """
+    Counts the per-row results of a batch endpoint by status.
+    """
+    outcomes = {}
+    for result in results:
+        outcomes[result.get('status', 'unknown')] = outcomes.get(result.get('status', 'unknown'), 0) + 1
+    for outcome, count in outcomes.items():
+        count_batch_rows('out', count, outcome)
+
+
+def render_metrics():
+    """
+    Returns (body, content type) of the Prometheus text exposition.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """
+    Drops the live-process files of an exited gunicorn worker (multiprocess mode only).
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,88 @@
+# backend/model_loader.py
+import hashlib
+import os
+import joblib # For loading the saved models and preprocessor
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(CURRENT_DIR, 'ml_models')
+
+MODEL_FILENAME_PREFIX = 'best_demand_forecast_model_'
+PREPROCESSOR_FILENAME = 'feature_preprocessor.joblib'
+NUM_FEATURES_FILENAME = 'numerical_features.joblib'
+CAT_FEATURES_FILENAME = 'categorical_features.joblib'
+
+def find_best_model_filename(models_dir=MODELS_DIR):
+    """
+    Returns the filename of the saved best demand forecast model (the most recently written one
+    if several exist), or None if there is none.
+    """
+    candidates = [
+        f for f in os.listdir(models_dir)
+        if f.startswith(MODEL_FILENAME_PREFIX) and f.endswith('.joblib')
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda f: (os.path.getmtime(os.path.join(models_dir, f)), f))
+
+def bundle_files(models_dir=MODELS_DIR):
+    """
+    Returns the paths of the artifacts that make up the current model bundle, or None if there is no model.
+    """
+    best_model_filename = find_best_model_filename(models_dir)
+    if best_model_filename is None:
+        return None
+    return [os.path.join(models_dir, f) for f in (best_model_filename, PREPROCESSOR_FILENAME, NUM_FEATURES_FILENAME, CAT_FEATURES_FILENAME)]
+
+def bundle_fingerprint(models_dir=MODELS_DIR):
+    """
+    Cheap change marker of the model bundle on disk (file names, sizes and modification times),
+    used to notice a retrained model without hashing the files.
+    """
+    paths = bundle_files(models_dir)
+    if paths is None:
+        return None
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        fingerprint.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+def compute_model_version(paths):
+    """
+    Content hash of the bundle artifacts: the same files always get the same version,
+    in every worker process and after restarts.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+def load_model_bundle(models_dir=MODELS_DIR):
+    """
+    Loads the demand forecast model, its preprocessor and the training feature lists
+    written by train_models.py.
+
+    Returns:
+        dict: Keys 'model', 'preprocessor', 'numerical_features', 'categorical_features',
+        'model_filename' and 'model_version' (content hash of the artifacts), or None if no
+        model file exists in `models_dir`. Errors while unpickling are raised to the caller.
+    """
+    paths = bundle_files(models_dir)
+    if paths is None:
+        return None
+    model_path, preprocessor_path, num_features_path, cat_features_path = paths
+
+    return {
+        'model': joblib.load(model_path),
+        'preprocessor': joblib.load(preprocessor_path),
+        'numerical_features': joblib.load(num_features_path),
+        'categorical_features': joblib.load(cat_features_path),
+        'model_filename': os.path.basename(model_path),
+        'model_version': compute_model_version(paths)
+    }
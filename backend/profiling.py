@@ -0,0 +1,164 @@
+# backend/profiling.py
+import collections
+import cProfile
+import datetime
+import hmac
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_OUTPUT_DIR = os.getenv('PROFILE_OUTPUT_DIR', os.path.join(CURRENT_DIR, 'profiles'))
+# Requests sending `X-Profile: <token>` are profiled; header profiling is off while unset
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+# Comma-separated URL rules profiled on every request, e.g. "/inventory/reorder_recommendation"
+PROFILE_ROUTES = {route.strip() for route in os.getenv('PROFILE_ROUTES', '').split(',') if route.strip()}
+# Profile 1 in N requests of any route with the stack sampler (0 disables)
+PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', '0'))
+# 'cprofile' (deterministic, .pstats) or 'sample' (stack sampler, collapsed stacks)
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'cprofile')
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+PROFILE_MODES = ('cprofile', 'sample')
+
+_request_counter = itertools.count(1)
+# Only one deterministic profiler can be active per process; concurrent requests are not profiled
+_cprofile_lock = threading.Lock()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval from a background thread and
+    aggregates the samples as collapsed stacks (root;...;leaf -> count). Overhead does not
+    depend on how many Python calls the request makes.
+    """
+
+    def __init__(self, thread_id, interval_ms=PROFILE_SAMPLE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfile:
+    """
+    A profiler running for the duration of one request.
+    """
+
+    def __init__(self, mode, reason):
+        self.mode = mode
+        self.reason = reason
+        self.started = time.perf_counter()
+        if mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = StackSampler(threading.get_ident())
+            self.profiler.start()
+
+    def finish(self, route, method, params, status):
+        """
+        Stops the profiler and writes its output and a metadata file (route, params, duration)
+        to PROFILE_OUTPUT_DIR. Returns the path of the profile.
+        """
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+            _cprofile_lock.release()
+        else:
+            self.profiler.stop()
+
+        os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+        route_slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        name = f"{datetime.datetime.now():%Y%m%d-%H%M%S}_{route_slug}_{duration_ms:.0f}ms_{uuid.uuid4().hex[:8]}"
+        if self.mode == 'cprofile':
+            path = os.path.join(PROFILE_OUTPUT_DIR, f"{name}.pstats")
+            self.profiler.dump_stats(path)
+        else:
+            path = os.path.join(PROFILE_OUTPUT_DIR, f"{name}.collapsed")
+            self.profiler.write(path)
+
+        with open(os.path.join(PROFILE_OUTPUT_DIR, f"{name}.json"), 'w') as f:
+            json.dump({
+                'route': route,
+                'method': method,
+                'params': params,
+                'status': status,
+                'duration_ms': round(duration_ms, 3),
+                'mode': self.mode,
+                'reason': self.reason,
+                'pid': os.getpid(),
+                'profile': os.path.basename(path)
+            }, f, indent=2)
+        return path
+
+
+def start_request_profile(route, headers):
+    """
+    Decides whether to profile a request and starts the profiler if so.
+
+    A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>` (the optional
+    `X-Profile-Mode` header picks the profiler), when its route is listed in PROFILE_ROUTES,
+    or when it is the Nth request of the 1-in-N sampling (always the stack sampler).
+
+    Returns:
+        RequestProfile or None.
+    """
+    mode = None
+    reason = None
+    header_token = headers.get('X-Profile')
+    if header_token and PROFILE_TOKEN and hmac.compare_digest(header_token, PROFILE_TOKEN):
+        mode = headers.get('X-Profile-Mode', PROFILE_MODE)
+        reason = 'header'
+    elif route in PROFILE_ROUTES:
+        mode = PROFILE_MODE
+        reason = 'route'
+    elif PROFILE_SAMPLE_EVERY > 0 and next(_request_counter) % PROFILE_SAMPLE_EVERY == 0:
+        mode = 'sample'
+        reason = 'sampled'
+    if mode is None:
+        return None
+
+    if mode not in PROFILE_MODES:
+        mode = PROFILE_MODE
+    if mode == 'cprofile' and not _cprofile_lock.acquire(blocking=False):
+        return None # Another request is under cProfile in this process
+    try:
+        return RequestProfile(mode, reason)
+    except Exception as e:
+        if mode == 'cprofile':
+            _cprofile_lock.release()
+        print(f"Could not start the request profiler: {e}")
+        return None
@@ -0,0 +1,83 @@
+# backend/services/batch_validation.py
+import numpy as np
+import pandas as pd
+
+REQUIRED_BATCH_COLUMNS = ['store_id', 'product_id', 'quantity']
+
+
+def read_batch_csv(csv_file_stream):
+    """
+    Reads a sale/receipt batch CSV. Every column is read as strings so pandas does not infer
+    (and re-format) numeric types for the IDs; quantities are converted by validate_batch_frame.
+    """
+    return _check_batch_columns(pd.read_csv(csv_file_stream, dtype=str))
+
+
+def iter_batch_csv_chunks(csv_path, chunk_rows, skip_rows=0):
+    """
+    Reads a spooled batch CSV lazily, `chunk_rows` rows at a time, like read_batch_csv.
+    The first `skip_rows` data rows are skipped without being parsed (to resume a job).
+    """
+    reader = pd.read_csv(csv_path, dtype=str, chunksize=chunk_rows, skiprows=range(1, skip_rows + 1))
+    for df in reader:
+        yield _check_batch_columns(df)
+
+
+def _check_batch_columns(df):
+    df.columns = df.columns.str.strip()
+    missing_cols = [col for col in REQUIRED_BATCH_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"CSV must contain 'store_id', 'product_id', and 'quantity' columns. Missing: {', '.join(missing_cols)}")
+    return df
+
+
+def validate_batch_frame(df, first_row=1):
+    """
+    Columnar validation of a sale/receipt batch.
+
+    `quantity` is coerced with pd.to_numeric and truncated towards zero, as int() did when rows
+    were validated one by one (2.5 is applied as 2, 0.5 is rejected as not positive). Rows whose
+    quantity is not a finite number are rejected as "Invalid quantity format." and rows with a
+    quantity <= 0 as "Quantity must be positive.". IDs are normalised to categorical string columns.
+
+    Args:
+        df (pd.DataFrame): Batch as returned by read_batch_csv.
+        first_row (int): CSV row number of the first row of `df` (for chunked reads).
+
+    Returns:
+        tuple: (valid, errors). `valid` is a DataFrame with columns row (CSV row number, 1 for the first data row),
+        store_id, product_id (categorical) and quantity (int64), in file order. `errors` holds
+        one failed result dict per rejected row, in file order.
+    """
+    store_ids = df['store_id'].astype(str).astype('category')
+    product_ids = df['product_id'].astype(str).astype('category')
+    row_numbers = np.arange(first_row, first_row + len(df))
+
+    quantities = pd.to_numeric(df['quantity'], errors='coerce').to_numpy(dtype=np.float64)
+    invalid_format = ~np.isfinite(quantities)
+    quantities = np.trunc(np.where(invalid_format, 0.0, quantities))
+    non_positive = ~invalid_format & (quantities <= 0)
+
+    errors = []
+    rejected = invalid_format | non_positive
+    if rejected.any():
+        rejected_positions = np.flatnonzero(rejected)
+        messages = np.where(invalid_format[rejected_positions], "Invalid quantity format.", "Quantity must be positive.")
+        errors = [
+            {"row": int(row), "status": "failed", "error": message, "store_id": store_id, "product_id": product_id}
+            for row, message, store_id, product_id in zip(
+                row_numbers[rejected_positions], messages,
+                store_ids.iloc[rejected_positions], product_ids.iloc[rejected_positions]
+            )
+        ]
+
+    accepted = ~rejected
+    valid = pd.DataFrame({
+        'row': row_numbers[accepted],
+        'store_id': store_ids.to_numpy()[accepted],
+        'product_id': product_ids.to_numpy()[accepted],
+        'quantity': quantities[accepted].astype(np.int64)
+    })
+    valid['store_id'] = valid['store_id'].astype('category')
+    valid['product_id'] = valid['product_id'].astype('category')
+    return valid, errors
@@ -0,0 +1,243 @@
+# backend/services/bulk_scheduler.py
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo.errors import (
+    AutoReconnect,
+    BulkWriteError,
+    ExecutionTimeout,
+    NetworkTimeout,
+    OperationFailure,
+    WTimeoutError
+)
+
+# Tuning defaults, overridable from the environment
+BULK_INITIAL_BATCH_SIZE = int(os.getenv('BULK_INITIAL_BATCH_SIZE', '100'))
+BULK_MIN_BATCH_SIZE = int(os.getenv('BULK_MIN_BATCH_SIZE', '10'))
+BULK_MAX_BATCH_SIZE = int(os.getenv('BULK_MAX_BATCH_SIZE', '1000'))
+BULK_TARGET_LATENCY_MS = float(os.getenv('BULK_TARGET_LATENCY_MS', '250'))
+BULK_MAX_IN_FLIGHT = int(os.getenv('BULK_MAX_IN_FLIGHT', '8'))
+BULK_MAX_RETRIES = 5
+BULK_MAX_BACKOFF_SECONDS = 10.0
+
+# Server error codes meaning "slow down": rate limiting, timeouts, elections and shutdowns
+PUSHBACK_ERROR_CODES = {
+    6, 7, 50, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436,
+    16500 # Request rate too large (Cosmos DB / throttled deployments)
+}
+
+
+def is_pushback_error(error):
+    if isinstance(error, (AutoReconnect, NetworkTimeout, ExecutionTimeout, WTimeoutError)):
+        return True
+    return isinstance(error, OperationFailure) and error.code in PUSHBACK_ERROR_CODES
+
+
+class AdaptiveBatchController:
+    """
+    Chooses the bulk_write batch size and the number of in-flight calls from observed behaviour.
+
+    Batch size follows the latency of successful calls: it grows while calls finish well under
+    the target latency and shrinks when they exceed it. Concurrency grows by one after a streak
+    of fast calls and is halved, with an exponential backoff, whenever the server pushes back.
+    """
+
+    def __init__(self, initial_batch_size=BULK_INITIAL_BATCH_SIZE, min_batch_size=BULK_MIN_BATCH_SIZE,
+                 max_batch_size=BULK_MAX_BATCH_SIZE, target_latency_ms=BULK_TARGET_LATENCY_MS,
+                 max_in_flight=BULK_MAX_IN_FLIGHT):
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency_ms / 1000.0
+        self.max_in_flight = max(1, max_in_flight)
+        self._batch_size = float(min(max(initial_batch_size, min_batch_size), max_batch_size))
+        self._in_flight_limit = max(1, min(4, self.max_in_flight))
+        self._fast_streak = 0
+        self._consecutive_pushbacks = 0
+        self._lock = threading.Lock()
+        self.pushbacks = 0
+
+    @property
+    def batch_size(self):
+        return int(self._batch_size)
+
+    @property
+    def in_flight_limit(self):
+        return self._in_flight_limit
+
+    def record_success(self, latency):
+        with self._lock:
+            self._consecutive_pushbacks = 0
+            if latency > self.target_latency:
+                self._batch_size = max(self.min_batch_size, self._batch_size * 0.7)
+                self._fast_streak = 0
+            elif latency < self.target_latency * 0.5:
+                self._batch_size = min(self.max_batch_size, self._batch_size * 1.5)
+                self._fast_streak += 1
+                if self._fast_streak >= 4 and self._in_flight_limit < self.max_in_flight:
+                    self._in_flight_limit += 1
+                    self._fast_streak = 0
+
+    def record_pushback(self):
+        """
+        Registers a pushback from the server and returns how long the caller should back off.
+        """
+        with self._lock:
+            self.pushbacks += 1
+            self._consecutive_pushbacks += 1
+            self._fast_streak = 0
+            self._in_flight_limit = max(1, self._in_flight_limit // 2)
+            self._batch_size = max(self.min_batch_size, self._batch_size * 0.5)
+            delay = min(BULK_MAX_BACKOFF_SECONDS, 0.1 * (2 ** (self._consecutive_pushbacks - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+
+class BulkWriteScheduler:
+    """
+    Runs bulk_write operations for a CSV ingestion, partitioned by store.
+
+    Operations are grouped by partition key (store_id) and each partition is written in file
+    order by a single thread, so operations on the same SKU are never reordered; different
+    partitions are written in parallel on a thread pool. Batches use `ordered=True`, which
+    tells exactly which operations were applied when a batch fails part-way, so a batch that
+    is pushed back can be resumed from the failed operation after backing off.
+    """
+
+    def __init__(self, collection, controller=None, max_workers=BULK_MAX_IN_FLIGHT):
+        self.collection = collection
+        self.controller = controller or AdaptiveBatchController(max_in_flight=max_workers)
+        self.max_workers = max(1, max_workers)
+        self._in_flight = 0
+        self._gate = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self.operations = 0
+        self.write_seconds = 0.0
+        self.batches = 0
+        self.retries = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.upserted_count = 0
+
+    def _acquire_slot(self):
+        with self._gate:
+            while self._in_flight >= self.controller.in_flight_limit:
+                self._gate.wait()
+            self._in_flight += 1
+
+    def _release_slot(self):
+        with self._gate:
+            self._in_flight -= 1
+            self._gate.notify_all()
+
+    def _record_result(self, result):
+        with self._stats_lock:
+            self.batches += 1
+            self.matched_count += result.get('nMatched', 0)
+            self.modified_count += result.get('nModified', 0)
+            self.upserted_count += result.get('nUpserted', 0)
+
+    def _write_partition(self, ops, outcomes):
+        position = 0
+        while position < len(ops):
+            batch = ops[position:position + self.controller.batch_size]
+            requests = [op['request'] for op in batch]
+            offset = 0 # First operation of the batch not yet applied
+            attempts = 0
+
+            while offset < len(batch):
+                backoff = 0.0 # Slept after the slot is released, so other partitions keep writing
+                self._acquire_slot()
+                started = time.perf_counter()
+                try:
+                    result = self.collection.bulk_write(requests[offset:], ordered=True)
+                    self.controller.record_success(time.perf_counter() - started)
+                    self._record_result(result.bulk_api_result)
+                    for op in batch[offset:]:
+                        outcomes[op['index']] = {'status': 'applied'}
+                    offset = len(batch)
+                except BulkWriteError as bwe:
+                    details = bwe.details
+                    self._record_result(details)
+                    write_errors = details.get('writeErrors') or []
+                    if not write_errors:
+                        # Only the write concern failed: the writes themselves were applied
+                        for op in batch[offset:]:
+                            outcomes[op['index']] = {'status': 'applied'}
+                        offset = len(batch)
+                        backoff = self.controller.record_pushback()
+                    else:
+                        error = write_errors[0]
+                        failed_at = offset + error['index']
+                        for op in batch[offset:failed_at]:
+                            outcomes[op['index']] = {'status': 'applied'}
+
+                        if error.get('code') in PUSHBACK_ERROR_CODES and attempts < BULK_MAX_RETRIES:
+                            attempts += 1
+                            with self._stats_lock:
+                                self.retries += 1
+                            offset = failed_at
+                            backoff = self.controller.record_pushback()
+                        else:
+                            outcomes[batch[failed_at]['index']] = {'status': 'failed', 'error': error.get('errmsg', 'Write error')}
+                            offset = failed_at + 1
+                except Exception as e:
+                    # pymongo has already retried retryable writes once; after that the outcome of the
+                    # remaining operations is unknown, so they are reported instead of re-sent
+                    for op in batch[offset:]:
+                        outcomes[op['index']] = {'status': 'unknown', 'error': f"Outcome unknown: {e}"}
+                    offset = len(batch)
+                    if is_pushback_error(e):
+                        backoff = self.controller.record_pushback()
+                finally:
+                    self._release_slot()
+                if backoff:
+                    time.sleep(backoff)
+
+            position += len(batch)
+
+    def run(self, ops):
+        """
+        Writes `ops`, a list of dicts with keys 'request' (a pymongo write model), 'partition'
+        (the store_id) and 'index' (a unique key, e.g. the CSV row number).
+
+        Returns:
+            tuple: (outcomes, stats). `outcomes` maps each op index to {'status': 'applied'},
+            {'status': 'failed', 'error': ...} or, when the connection failed mid-write,
+            {'status': 'unknown', 'error': ...}. Statistics accumulate over every run() of
+            this scheduler.
+        """
+        partitions = OrderedDict()
+        for op in ops:
+            partitions.setdefault(op['partition'], []).append(op)
+
+        outcomes = {}
+        started = time.perf_counter()
+        if partitions:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(partitions))) as executor:
+                # Each task runs in a copy of the caller's context, so its commands count towards the request
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self._write_partition, partition_ops, outcomes)
+                    for partition_ops in partitions.values()
+                ]
+                for future in futures:
+                    future.result()
+        self.operations += len(ops)
+        self.write_seconds += time.perf_counter() - started
+
+        return outcomes, {
+            "operations": self.operations,
+            "partitions": len(partitions),
+            "batches": self.batches,
+            "retries": self.retries,
+            "pushbacks": self.controller.pushbacks,
+            "final_batch_size": self.controller.batch_size,
+            "final_in_flight_limit": self.controller.in_flight_limit,
+            "matched_count": self.matched_count,
+            "modified_count": self.modified_count,
+            "upserted_count": self.upserted_count,
+            "write_seconds": round(self.write_seconds, 3)
+        }
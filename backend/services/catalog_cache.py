@@ -0,0 +1,477 @@
+# backend/services/catalog_cache.py
+import os
+import threading
+import time
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+CATALOG_CACHE_ENABLED = os.getenv('CATALOG_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Full reload interval when change streams are not available (standalone mongod)
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv('CATALOG_CACHE_TTL_SECONDS', '60'))
+CATALOG_COLLECTIONS = ('products', 'stores')
+CHANGE_STREAM_RETRY_SECONDS = 5
+
+
+# Product fields averaged by PricingStats, globally and per category
+PRICING_FIELDS = ('price', 'discount', 'competitor_price')
+_ALL_PRODUCTS = object() # Category key of the global totals
+
+
+def _as_number(value):
+    """
+    Float value of a numeric field, or None. Numeric strings count: the NDJSON export writes prices as strings.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class PricingStats:
+    """
+    Running sums and counts of PRICING_FIELDS over the cached products, globally and per
+    category. Kept current by adding/removing documents as the catalog changes, so averages
+    are read in O(1) instead of aggregating the products collection.
+    """
+
+    def __init__(self, products=()):
+        self._totals = {} # (category or _ALL_PRODUCTS, field) -> [sum, count]
+        for doc in products:
+            self.add(doc)
+
+    def add(self, doc, sign=1):
+        for field in PRICING_FIELDS:
+            value = _as_number(doc.get(field))
+            if value is None:
+                continue
+            category = doc.get('category')
+            for category in ((_ALL_PRODUCTS, category) if isinstance(category, str) else (_ALL_PRODUCTS,)):
+                totals = self._totals.setdefault((category, field), [0.0, 0])
+                totals[0] += sign * value
+                totals[1] += sign
+                if totals[1] == 0:
+                    del self._totals[(category, field)] # No float residue once the last value is gone
+
+    def remove(self, doc):
+        self.add(doc, -1)
+
+    def average(self, field, category=None):
+        """
+        Average of `field` over the products of `category` (or all products), or None.
+        """
+        totals = self._totals.get((_ALL_PRODUCTS if category is None else category, field))
+        if not totals or totals[1] <= 0:
+            return None
+        return totals[0] / totals[1]
+
+    def defaults(self, category=None):
+        """
+        {field: average} for a category, falling back to the global average for fields the
+        category has no values for (None when no product has one).
+        """
+        averages = {}
+        for field in PRICING_FIELDS:
+            average = self.average(field, category) if category is not None else None
+            averages[field] = average if average is not None else self.average(field)
+        return averages
+
+
+class CatalogCache:
+    """
+    In-process read-through cache of the `products` and `stores` collections of one database,
+    keyed by product_id / store_id.
+
+    The whole catalog is loaded on first use (or warmed at startup). Changes are applied from a
+    MongoDB change stream; where change streams are not available (standalone servers), the
+    catalog is reloaded every CATALOG_CACHE_TTL_SECONDS instead. Processes that never start the
+    watcher (flask run, scripts, manage.py commands) reload a snapshot older than the TTL on read. `version` is bumped on every
+    change so derived values (e.g. the longest lead time) are recomputed only when needed, while
+    the pricing statistics are updated incrementally with every product change. Point lookups of IDs missing from the snapshot fall through to the database.
+
+    Returned documents are shared between requests and must not be modified.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.RLock()
+        self._products = None
+        self._stores = None
+        self._pricing = PricingStats()
+        self._derived = {} # name -> (version, value)
+        self.version = 0
+        self.loaded_at = None
+        self.mode = 'not_started' # change_stream / polling once the watcher runs, reload_on_read without one
+        self.hits = 0
+        self.misses = 0
+        self.changes_applied = 0
+        self._watcher = None
+
+    # --- Loading ---
+
+    def warm(self):
+        """
+        (Re)loads both collections with one query each and swaps the snapshot in.
+        """
+        products = {doc['product_id']: doc for doc in self.db.products.find({}) if doc.get('product_id') is not None}
+        stores = {doc['store_id']: doc for doc in self.db.stores.find({}) if doc.get('store_id') is not None}
+        pricing = PricingStats(products.values())
+        with self._lock:
+            self._products = products
+            self._stores = stores
+            self._pricing = pricing
+            self.version += 1
+            self.loaded_at = time.time()
+        return len(products), len(stores)
+
+    def _watching(self):
+        return self._watcher is not None and self._watcher.is_alive()
+
+    def _is_stale(self):
+        return self._products is None or \
+            (not self._watching() and time.time() - self.loaded_at >= CATALOG_CACHE_TTL_SECONDS)
+
+    def _ensure_loaded(self):
+        if not self._is_stale():
+            return
+        with self._lock:
+            if not self._is_stale():
+                return
+            if self._products is None:
+                self.warm()
+            else:
+                try:
+                    self.warm()
+                except Exception as e:
+                    self.loaded_at = time.time() # Retry after another TTL rather than on every read
+                    print(f"Catalog cache: reload failed ({e}), keeping the previous snapshot.")
+            if not self._watching():
+                self.mode = 'reload_on_read'
+
+    # --- Lookups ---
+
+    def _get(self, collection_name, id_field, key):
+        self._ensure_loaded()
+        cached = self._products if collection_name == 'products' else self._stores
+        doc = cached.get(key)
+        if doc is not None:
+            self.hits += 1
+            return doc
+        self.misses += 1
+        doc = self.db[collection_name].find_one({id_field: key})
+        if doc is not None:
+            self._apply(collection_name, id_field, key, doc)
+        return doc
+
+    def get_product(self, product_id):
+        return self._get('products', 'product_id', product_id)
+
+    def get_store(self, store_id):
+        return self._get('stores', 'store_id', store_id)
+
+    def _get_many(self, collection_name, id_field, keys):
+        self._ensure_loaded()
+        cached = self._products if collection_name == 'products' else self._stores
+        found = {}
+        missing = []
+        for key in keys:
+            doc = cached.get(key)
+            if doc is None:
+                missing.append(key)
+            else:
+                found[key] = doc
+        self.hits += len(found)
+        if missing:
+            self.misses += len(missing)
+            for doc in self.db[collection_name].find({id_field: {'$in': missing}}):
+                found[doc[id_field]] = doc
+                self._apply(collection_name, id_field, doc[id_field], doc)
+        return found
+
+    def get_products(self, product_ids):
+        """
+        Returns {product_id: document} for the given IDs that exist.
+        """
+        return self._get_many('products', 'product_id', product_ids)
+
+    def get_stores(self, store_ids):
+        """
+        Returns {store_id: document} for the given IDs that exist.
+        """
+        return self._get_many('stores', 'store_id', store_ids)
+
+    def all_products(self):
+        self._ensure_loaded()
+        with self._lock:
+            return dict(self._products)
+
+    def all_stores(self):
+        self._ensure_loaded()
+        with self._lock:
+            return dict(self._stores)
+
+    def _derive(self, name, collection_name, compute):
+        """
+        Value of `compute(documents)` over one cached collection, recomputed only when the
+        version changed. The documents are copied under the lock, so the watcher thread cannot
+        change them mid-computation and the value is stored under the version it reflects.
+        """
+        self._ensure_loaded()
+        cached = self._derived.get(name)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        with self._lock:
+            version = self.version
+            docs = list((self._products if collection_name == 'products' else self._stores).values())
+        value = compute(docs)
+        self._derived[name] = (version, value)
+        return value
+
+    def stores_in_region(self, region):
+        """
+        Returns {store_id: document} of the stores in a region.
+        """
+        by_region = self._derive('stores_by_region', 'stores', lambda stores: _group_by(stores, 'region', 'store_id'))
+        return dict(by_region.get(region, {}))
+
+    def longest_min_replenish_time(self):
+        """
+        The longest `min_replenish_time` of all products (numbers only), or 0.
+        """
+        return self._derive('longest_min_replenish_time', 'products', lambda products: max(
+            (doc['min_replenish_time'] for doc in products
+             if isinstance(doc.get('min_replenish_time'), (int, float)) and not isinstance(doc.get('min_replenish_time'), bool)),
+            default=0
+        ))
+
+    def pricing_defaults(self, category=None):
+        """
+        Average price, discount and competitor price of a product category (global averages
+        where the category has no values), as a dict keyed by PRICING_FIELDS.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            return self._pricing.defaults(category)
+
+    # --- Invalidation ---
+
+    def _apply(self, collection_name, id_field, key, doc):
+        with self._lock:
+            cached = self._products if collection_name == 'products' else self._stores
+            if cached is None:
+                return
+            previous = cached.pop(key, None)
+            if doc is not None:
+                cached[key] = doc
+            if collection_name == 'products':
+                if previous is not None:
+                    self._pricing.remove(previous)
+                if doc is not None:
+                    self._pricing.add(doc)
+            self.version += 1
+
+    def _apply_change(self, change):
+        collection_name = change.get('ns', {}).get('coll')
+        operation = change.get('operationType')
+        if operation in ('drop', 'rename', 'dropDatabase', 'invalidate'):
+            self.warm() # e.g. the initial loader swapping in a freshly loaded collection
+            return
+        if collection_name not in CATALOG_COLLECTIONS:
+            return
+        id_field = 'product_id' if collection_name == 'products' else 'store_id'
+        if operation == 'delete':
+            # Only the _id is known for deletes; find the cached document that had it
+            doc_id = change.get('documentKey', {}).get('_id')
+            with self._lock:
+                cached = self._products if collection_name == 'products' else self._stores
+                keys = [key for key, doc in (cached or {}).items() if doc.get('_id') == doc_id]
+            for key in keys:
+                self._apply(collection_name, id_field, key, None)
+        else:
+            doc = change.get('fullDocument')
+            if doc is not None and doc.get(id_field) is not None:
+                self._apply(collection_name, id_field, doc[id_field], doc)
+            else:
+                self.warm()
+        self.changes_applied += 1
+
+    def _watch_change_stream(self):
+        """
+        Applies catalog changes as they happen; returns False if change streams are not supported.
+        """
+        pipeline = [{'$match': {'$or': [
+            {'ns.coll': {'$in': list(CATALOG_COLLECTIONS)}},
+            {'to.coll': {'$in': list(CATALOG_COLLECTIONS)}}, # A staging collection renamed over a catalog collection
+            {'operationType': {'$in': ['dropDatabase', 'invalidate']}}
+        ]}}]
+        resume_token = None
+        while True:
+            try:
+                with self.db.watch(pipeline, full_document='updateLookup', resume_after=resume_token) as stream:
+                    if self.mode != 'change_stream':
+                        self.mode = 'change_stream'
+                        self.warm() # Changes made before the stream opened
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        self._apply_change(change)
+                        if change.get('operationType') == 'invalidate':
+                            resume_token = None
+                            break
+            except OperationFailure as e:
+                if self.mode != 'change_stream':
+                    print(f"Catalog cache: change streams unavailable ({e}), reloading every {CATALOG_CACHE_TTL_SECONDS:.0f}s instead.")
+                    return False
+                print(f"Catalog cache: change stream failed ({e}), reopening.")
+                resume_token = None
+                self.warm()
+            except PyMongoError as e:
+                print(f"Catalog cache: change stream interrupted ({e}), retrying in {CHANGE_STREAM_RETRY_SECONDS}s.")
+                time.sleep(CHANGE_STREAM_RETRY_SECONDS)
+
+    def _poll(self):
+        self.mode = 'polling'
+        while True:
+            time.sleep(CATALOG_CACHE_TTL_SECONDS)
+            try:
+                self.warm()
+            except Exception as e:
+                print(f"Catalog cache: reload failed ({e}), keeping the previous snapshot.")
+
+    def start_watcher(self):
+        """
+        Starts keeping the cache current in a daemon thread (once per process).
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def run():
+            if not self._watch_change_stream():
+                self._poll()
+
+        self._watcher = threading.Thread(target=run, name='catalog-cache-watcher', daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        return {
+            "enabled": CATALOG_CACHE_ENABLED,
+            "products": len(self._products or {}),
+            "stores": len(self._stores or {}),
+            "version": self.version,
+            "mode": self.mode,
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "changes_applied": self.changes_applied,
+            "pricing": self._pricing.defaults()
+        }
+
+
+class _UncachedCatalog(CatalogCache):
+    """
+    Same interface, every call served by a query (CATALOG_CACHE_ENABLED=false): point lookups
+    by ID, `$in` reads for several IDs, full reads only where the whole catalog is asked for.
+    """
+
+    def warm(self):
+        return 0, 0
+
+    def get_product(self, product_id):
+        return self.db.products.find_one({'product_id': product_id})
+
+    def get_store(self, store_id):
+        return self.db.stores.find_one({'store_id': store_id})
+
+    def get_products(self, product_ids):
+        return {doc['product_id']: doc for doc in self.db.products.find({'product_id': {'$in': list(product_ids)}})}
+
+    def get_stores(self, store_ids):
+        return {doc['store_id']: doc for doc in self.db.stores.find({'store_id': {'$in': list(store_ids)}})}
+
+    def all_products(self):
+        return {doc['product_id']: doc for doc in self.db.products.find({}) if doc.get('product_id') is not None}
+
+    def all_stores(self):
+        return {doc['store_id']: doc for doc in self.db.stores.find({}) if doc.get('store_id') is not None}
+
+    def stores_in_region(self, region):
+        return {doc['store_id']: doc for doc in self.db.stores.find({'region': region})}
+
+    def longest_min_replenish_time(self):
+        product = self.db.products.find_one(
+            {'min_replenish_time': {'$type': 'number'}},
+            {'min_replenish_time': 1, '_id': 0},
+            sort=[('min_replenish_time', -1)]
+        )
+        return product['min_replenish_time'] if product else 0
+
+    def pricing_defaults(self, category=None):
+        # Only called for products missing a price, discount or competitor price
+        return PricingStats(self.db.products.find({}, {'category': 1, **{field: 1 for field in PRICING_FIELDS}})).defaults(category)
+
+    def start_watcher(self):
+        pass
+
+
+def _group_by(docs, field, id_field):
+    groups = {}
+    for doc in docs:
+        groups.setdefault(doc.get(field), {})[doc[id_field]] = doc
+    return groups
+
+
+# One cache per database (keyed by client and name), shared by every request of this process
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+def _reset_after_fork():
+    # Watcher threads do not survive fork(); each worker loads and watches its own catalog
+    global _CATALOGS, _CATALOGS_LOCK
+    _CATALOGS = {}
+    _CATALOGS_LOCK = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_catalog(db):
+    """
+    Returns the catalog cache of a database (the analytical and transactional handles of the
+    same database share one cache).
+    """
+    key = (id(db.client), db.name)
+    catalog = _CATALOGS.get(key)
+    if catalog is None:
+        with _CATALOGS_LOCK:
+            catalog = _CATALOGS.get(key)
+            if catalog is None:
+                catalog = _CATALOGS[key] = (CatalogCache if CATALOG_CACHE_ENABLED else _UncachedCatalog)(db)
+    return catalog
+
+
+def invalidate_catalog(db):
+    """
+    Drops the cached catalog of a database (e.g. after rebuilding it in a script).
+    """
+    with _CATALOGS_LOCK:
+        _CATALOGS.pop((id(db.client), db.name), None)
+
+
+def warm_catalog(db, watch=True):
+    """
+    Loads the catalog of `db` and, if `watch` is set, starts keeping it current.
+    Called at startup in every serving process.
+    """
+    catalog = get_catalog(db)
+    if not CATALOG_CACHE_ENABLED:
+        return catalog
+    products, stores = catalog.warm()
+    print(f"Catalog cache warmed with {products} products and {stores} stores.")
+    if watch:
+        catalog.start_watcher()
+    return catalog
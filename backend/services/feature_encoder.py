@@ -0,0 +1,260 @@
+# backend/services/feature_encoder.py
+import datetime
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+# Features derived from the forecast date rather than from the series itself
+CALENDAR_FEATURES = ['Year', 'Month', 'Day', 'DayOfWeek', 'WeekOfYear', 'Seasonality']
+
+def get_seasonality(month):
+    """
+    Maps a calendar month to the season label used in the training data.
+    """
+    return "Spring" if 3 <= month <= 5 else \
+           "Summer" if 6 <= month <= 8 else \
+           "Autumn" if 9 <= month <= 11 else \
+           "Winter"
+
+
+def get_calendar_features(forecast_date):
+    """
+    Returns the date-derived model features for a single forecast date.
+    Mirrors the `.dt` accessors used in train_models.engineer_features.
+    """
+    return {
+        'Year': forecast_date.year,
+        'Month': forecast_date.month,
+        'Day': forecast_date.day,
+        'DayOfWeek': forecast_date.weekday(), # Monday=0, Sunday=6
+        'WeekOfYear': forecast_date.isocalendar()[1],
+        'Seasonality': get_seasonality(forecast_date.month)
+    }
+
+
+CALENDAR_CACHE_MAX_DATES = 4096 # Forecast dates kept in an encoder's calendar lookup table
+
+# Compiled encoders registered at startup, keyed by id() of the preprocessor they replace
+_COMPILED_ENCODERS = {}
+
+
+def _is_identity_function_transformer(transformer):
+    return isinstance(transformer, FunctionTransformer) and transformer.func is None
+
+
+class CompiledFeatureEncoder:
+    """
+    Replays a fitted `ColumnTransformer(passthrough numerical + OneHotEncoder categorical)`
+    without pandas (an identity `FunctionTransformer`, as scikit-learn stores 'passthrough'
+    after fitting, counts as passthrough): numerical features are copied into the output as floats and each
+    categorical value is mapped to its one-hot column through a dict built from the fitted
+    `OneHotEncoder.categories_`. Unknown categories encode as all zeros, like
+    `handle_unknown='ignore'`. The output has the same layout and sparsity as
+    `preprocessor.transform`.
+
+    Raises ValueError at construction if the preprocessor uses features this encoder
+    cannot reproduce exactly (other transformers, dropped or infrequent categories).
+    """
+
+    def __init__(self, preprocessor, numerical_features, categorical_features):
+        self.numerical_features = list(numerical_features)
+        self.categorical_features = list(categorical_features)
+        self.sparse_output = bool(getattr(preprocessor, 'sparse_output_', False))
+
+        self._numeric_slots = [] # (feature, output column)
+        self._categorical_slots = [] # (feature, first output column, {category: offset})
+        output_column = 0
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or (name == 'remainder' and len(columns) == 0):
+                continue
+            if not all(isinstance(col, str) for col in columns):
+                raise ValueError(f"Transformer '{name}' selects columns by position, which is not supported.")
+
+            if transformer == 'passthrough' or _is_identity_function_transformer(transformer):
+                for col in columns:
+                    self._numeric_slots.append((col, output_column))
+                    output_column += 1
+            elif isinstance(transformer, OneHotEncoder):
+                if getattr(transformer, 'drop_idx_', None) is not None:
+                    raise ValueError("OneHotEncoder with dropped categories is not supported.")
+                if getattr(transformer, '_infrequent_enabled', False):
+                    raise ValueError("OneHotEncoder with infrequent categories is not supported.")
+                if transformer.handle_unknown == 'error':
+                    raise ValueError("OneHotEncoder with handle_unknown='error' is not supported.")
+                for col, categories in zip(columns, transformer.categories_):
+                    lookup = {category.item() if isinstance(category, np.generic) else category: offset
+                              for offset, category in enumerate(categories)}
+                    self._categorical_slots.append((col, output_column, lookup))
+                    output_column += len(categories)
+            else:
+                raise ValueError(f"Transformer '{name}' ({type(transformer).__name__}) is not supported.")
+
+        self.n_output_columns = output_column
+        # CSR rows need ascending column indices: order the slots by where they land in the output
+        self._slot_order = np.argsort(
+            [col for _, col in self._numeric_slots] + [start for _, start, _ in self._categorical_slots],
+            kind='stable'
+        )
+        self._calendar_slots = [i for i, (feature, _, _) in enumerate(self._categorical_slots) if feature in CALENDAR_FEATURES]
+        # Per instance, so a retired encoder is not kept alive by a shared cache
+        self._calendar_cache = {}
+
+    def _category_columns(self, slot, values, num_rows):
+        feature, start, lookup = slot
+        if isinstance(values, (list, tuple, np.ndarray, pd.Series)):
+            return np.fromiter(
+                (start + lookup[v] if v in lookup else -1 for v in values),
+                dtype=np.int64, count=num_rows
+            )
+        column = start + lookup[values] if values in lookup else -1
+        return np.full(num_rows, column, dtype=np.int64)
+
+    def _calendar_columns(self, forecast_date):
+        """
+        Calendar lookup table: output columns of the date-derived features for one forecast date.
+        """
+        columns = self._calendar_cache.get(forecast_date)
+        if columns is None:
+            calendar = get_calendar_features(forecast_date)
+            columns = {
+                self._categorical_slots[i][0]: self._category_columns(self._categorical_slots[i], calendar[self._categorical_slots[i][0]], 1)[0]
+                for i in self._calendar_slots
+            }
+            if len(self._calendar_cache) >= CALENDAR_CACHE_MAX_DATES:
+                self._calendar_cache.clear()
+            self._calendar_cache[forecast_date] = columns
+        return columns
+
+    def encode(self, columns, num_rows, forecast_date=None):
+        """
+        Encodes `num_rows` rows given as a mapping of training column name to either a scalar
+        (shared by every row) or a sequence of length `num_rows`.
+        If `forecast_date` is given, calendar features missing from `columns` are taken
+        from the calendar lookup table.
+
+        Returns:
+            scipy.sparse.csr_matrix or numpy.ndarray, matching `preprocessor.transform`.
+        """
+        calendar_columns = self._calendar_columns(forecast_date) if forecast_date is not None else {}
+
+        values = np.empty((num_rows, len(self._numeric_slots) + len(self._categorical_slots)), dtype=np.float64)
+        indices = np.empty(values.shape, dtype=np.int64)
+
+        for i, (feature, column) in enumerate(self._numeric_slots):
+            values[:, i] = np.asarray(columns.get(feature, 0.0), dtype=np.float64)
+            indices[:, i] = column
+
+        offset = len(self._numeric_slots)
+        for i, slot in enumerate(self._categorical_slots):
+            feature = slot[0]
+            if feature not in columns and feature in calendar_columns:
+                indices[:, offset + i] = calendar_columns[feature]
+            else:
+                indices[:, offset + i] = self._category_columns(slot, columns.get(feature, 'Unknown'), num_rows)
+            values[:, offset + i] = 1.0
+
+        values = values[:, self._slot_order]
+        indices = indices[:, self._slot_order]
+        # Unknown categories produce no column; explicit zeros are not stored, like scipy's hstack
+        keep = (indices >= 0) & (values != 0)
+
+        if not self.sparse_output:
+            dense = np.zeros((num_rows, self.n_output_columns), dtype=np.float64)
+            rows = np.broadcast_to(np.arange(num_rows)[:, None], indices.shape)
+            dense[rows[keep], indices[keep]] = values[keep]
+            return dense
+
+        indptr = np.zeros(num_rows + 1, dtype=np.int64)
+        np.cumsum(keep.sum(axis=1), out=indptr[1:])
+        return sparse.csr_matrix(
+            (values[keep], indices[keep], indptr),
+            shape=(num_rows, self.n_output_columns)
+        )
+
+    def smoke_columns(self, num_rows=64):
+        """
+        Builds a column mapping that exercises every category of every feature (plus unknown
+        values) for the parity check against the fitted preprocessor.
+        """
+        rng = np.random.default_rng(0)
+        columns = {}
+        for feature, _ in self._numeric_slots:
+            sample = rng.normal(50.0, 25.0, num_rows).round(2)
+            sample[::7] = 0.0
+            columns[feature] = sample.tolist()
+        for feature, _, lookup in self._categorical_slots:
+            categories = list(lookup.keys())
+            unknown = -1 if all(isinstance(c, (int, float)) for c in categories) else '__unknown__'
+            sample = [categories[i % len(categories)] if categories else unknown for i in range(num_rows)]
+            sample[-1] = unknown
+            columns[feature] = sample
+        return columns
+
+
+def _matrices_equal(a, b):
+    if a.shape != b.shape:
+        return False
+    if sparse.issparse(a) or sparse.issparse(b):
+        a = sparse.csr_matrix(a)
+        b = sparse.csr_matrix(b)
+        return (a != b).nnz == 0
+    return np.array_equal(np.asarray(a), np.asarray(b))
+
+
+def verify_encoder_parity(encoder, preprocessor, num_rows=64):
+    """
+    Checks that the compiled encoder reproduces `preprocessor.transform` exactly, both for
+    explicit rows and for calendar features served from the lookup table.
+    """
+    columns = encoder.smoke_columns(num_rows)
+    all_features = encoder.numerical_features + encoder.categorical_features
+    frame = pd.DataFrame(columns, index=range(num_rows)).reindex(columns=all_features)
+    expected = preprocessor.transform(frame)
+    if sparse.issparse(expected) != encoder.sparse_output or not _matrices_equal(expected, encoder.encode(columns, num_rows)):
+        return False
+
+    forecast_date = datetime.date.today()
+    dated_columns = {k: v for k, v in columns.items() if k not in CALENDAR_FEATURES}
+    dated_frame = pd.DataFrame(dict(dated_columns, **get_calendar_features(forecast_date)), index=range(num_rows)).reindex(columns=all_features)
+    return _matrices_equal(preprocessor.transform(dated_frame), encoder.encode(dated_columns, num_rows, forecast_date=forecast_date))
+
+
+def compile_feature_encoder(preprocessor, numerical_features, categorical_features):
+    """
+    Builds the compiled encoder for a fitted preprocessor, verifies it against
+    `preprocessor.transform`, and registers it for the serving path.
+    Returns the encoder, or None (keeping the pandas path) if it cannot be used.
+    """
+    try:
+        encoder = CompiledFeatureEncoder(preprocessor, numerical_features, categorical_features)
+        if not verify_encoder_parity(encoder, preprocessor):
+            print("Compiled feature encoder does not match the fitted preprocessor. Using preprocessor.transform.")
+            return None
+    except Exception as e:
+        print(f"Could not compile feature encoder: {e}. Using preprocessor.transform.")
+        return None
+
+    _COMPILED_ENCODERS[id(preprocessor)] = (preprocessor, encoder)
+    return encoder
+
+
+def get_compiled_encoder(preprocessor):
+    """
+    Returns the compiled encoder registered for this preprocessor, if any.
+    """
+    registered = _COMPILED_ENCODERS.get(id(preprocessor))
+    if registered is None or registered[0] is not preprocessor:
+        return None
+    return registered[1]
+
+
+def release_compiled_encoder(preprocessor):
+    """
+    Unregisters the compiled encoder of a preprocessor that is no longer served (after a model swap),
+    so the retired model version can be garbage collected.
+    """
+    registered = _COMPILED_ENCODERS.get(id(preprocessor))
+    if registered is not None and registered[0] is preprocessor:
+        del _COMPILED_ENCODERS[id(preprocessor)]
@@ -0,0 +1,198 @@
+# backend/services/forecast_cache.py
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+
+FORECAST_CACHE_ENABLED = os.getenv('FORECAST_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv('FORECAST_CACHE_MAX_ENTRIES', '10000'))
+FORECAST_CACHE_TTL_SECONDS = float(os.getenv('FORECAST_CACHE_TTL_SECONDS', '900'))
+
+
+class _InFlight:
+    """
+    A forecast currently being computed; identical concurrent requests wait on it.
+    """
+    def __init__(self, num_days):
+        self.num_days = num_days
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.stale = False # Set when the SKU is invalidated mid-computation; the result is not cached
+
+
+class ForecastCache:
+    """
+    In-process LRU + TTL cache for get_demand_forecast_data_ml results.
+
+    Entries are keyed on everything a forecast depends on apart from the horizon: the SKU, the
+    'what-if' overrides, the model, the forecast start date and the inputs read from the stored
+    documents (`inputs_token`). Keying on the inputs keeps every worker process correct when
+    another one writes: a changed inventory, product or store document produces a new key, and
+    the entries of the old inputs age out through the LRU and TTL. Each entry keeps the longest
+    horizon computed so far, and shorter requests are answered from its prefix (the recursive
+    forecast of the first N days does not depend on how many days follow).
+    Identical concurrent requests share a single computation, and writes to a SKU made by this
+    process invalidate all of its entries right away.
+    """
+
+    def __init__(self, max_entries=FORECAST_CACHE_MAX_ENTRIES, ttl_seconds=FORECAST_CACHE_TTL_SECONDS, enabled=FORECAST_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (expires_at, forecast rows)
+        self._sku_keys = {} # (store_id, product_id) -> set of keys
+        self._in_flight = {} # key -> _InFlight
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(store_id, product_id, model_token, what_if_params, inputs_token=None):
+        return (
+            store_id,
+            product_id,
+            model_token,
+            datetime.date.today().isoformat(),
+            tuple(sorted(what_if_params.items())),
+            inputs_token
+        )
+
+    def get_or_compute(self, store_id, product_id, num_days, model_token, what_if_params, compute, inputs_token=None):
+        """
+        Returns the first `num_days` forecast rows for the key, calling `compute(num_days)`
+        only when neither a cached entry nor an in-flight computation can answer it.
+        `inputs_token` is a hashable summary of the stored values the forecast was built from.
+        """
+        if not self.enabled:
+            return compute(num_days)
+
+        key = self.make_key(store_id, product_id, model_token, what_if_params, inputs_token)
+        sku = (store_id, product_id)
+
+        with self._lock:
+            forecast = self._lookup(key, num_days)
+            if forecast is not None:
+                self.hits += 1
+                return forecast
+
+            flight = self._in_flight.get(key)
+            if flight is not None and flight.num_days >= num_days:
+                self.shared += 1
+                owner = False
+            else:
+                self.misses += 1
+                flight = _InFlight(num_days)
+                self._in_flight[key] = flight
+                owner = True
+
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return [dict(row) for row in flight.result[:num_days]]
+
+        try:
+            forecast = compute(num_days)
+            flight.result = forecast
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+                # Results computed across an invalidation may be based on the old documents
+                if flight.error is None and not flight.stale:
+                    self._store(key, sku, forecast)
+            flight.done.set()
+
+        return [dict(row) for row in forecast]
+
+    def _lookup(self, key, num_days):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, forecast = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        if len(forecast) < num_days:
+            return None
+        self._entries.move_to_end(key)
+        return [dict(row) for row in forecast[:num_days]]
+
+    def _store(self, key, sku, forecast):
+        existing = self._entries.get(key)
+        if existing is not None and len(existing[1]) > len(forecast):
+            return # Keep the longer horizon already cached
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, forecast)
+        self._entries.move_to_end(key)
+        self._sku_keys.setdefault(sku, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        sku = (key[0], key[1])
+        keys = self._sku_keys.get(sku)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._sku_keys[sku]
+
+    def invalidate_sku(self, store_id, product_id):
+        """
+        Drops every cached forecast of a SKU after its inventory document changed.
+        """
+        self.invalidate_skus([(store_id, product_id)])
+
+    def invalidate_skus(self, skus):
+        """
+        Drops every cached forecast of the SKUs. Computations of those SKUs still in flight
+        are detached: their callers get their result, but it is not cached or shared.
+        """
+        if not self.enabled:
+            return
+        skus = set(skus)
+        with self._lock:
+            for sku in skus:
+                for key in list(self._sku_keys.get(sku, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+            for key in [key for key in self._in_flight if (key[0], key[1]) in skus]:
+                self._in_flight.pop(key).stale = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sku_keys.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.shared
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_in_flight": self.shared,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_ratio": round((self.hits + self.shared) / lookups, 4) if lookups else 0.0
+            }
+
+
+# Shared by every request handled by this process
+FORECAST_CACHE = ForecastCache()
@@ -0,0 +1,95 @@
+# backend/services/forecast_engine.py
+import datetime
+import time
+import numpy as np
+import pandas as pd
+
+from metrics import observe_stage
+
+from services.feature_encoder import CALENDAR_FEATURES, get_calendar_features, get_compiled_encoder
+
+# The recursive feature: yesterday's (predicted) units sold feeds today's prediction
+LAG_FEATURE = 'Units Sold Lag1'
+
+
+def forecast_series_lockstep(ml_model, preprocessor, numerical_features, categorical_features, series_rows, num_days, start_date=None):
+    """
+    Runs the recursive daily demand forecast for many (store, product) series at once.
+
+    All series advance together one horizon step at a time, so each day costs a single
+    feature build, a single `preprocessor.transform` and a single `ml_model.predict`
+    regardless of how many series are being forecast. The rounded prediction of each
+    series is fed back as its `Units Sold Lag1` for the next day, exactly like the
+    per-day loop in get_demand_forecast_data_ml used to do.
+
+    Args:
+        ml_model: The pre-trained machine learning model.
+        preprocessor: The pre-trained ColumnTransformer for feature preprocessing.
+        numerical_features: List of numerical feature names used during training.
+        categorical_features: List of categorical feature names used during training.
+        series_rows (list[dict]): One dict per series holding the static model features
+            (e.g. 'Store ID', 'Price', 'Units Sold Lag1'), keyed by training column name.
+        num_days (int): Number of future days to forecast.
+        start_date (datetime.date, optional): First forecast day (default: today).
+
+    Returns:
+        list[list[int]]: Predicted daily demand per series, in the order of `series_rows`.
+    """
+    if not series_rows or num_days <= 0:
+        return [[] for _ in series_rows]
+
+    if start_date is None:
+        start_date = datetime.date.today()
+
+    all_expected_features = numerical_features + categorical_features
+    num_series = len(series_rows)
+
+    # Static columns are built once; only the calendar and lag columns change per step
+    static_columns = {}
+    for col in all_expected_features:
+        if col in CALENDAR_FEATURES or col == LAG_FEATURE:
+            continue
+        if col in series_rows[0]:
+            static_columns[col] = [row[col] for row in series_rows]
+        elif col in numerical_features:
+            static_columns[col] = 0.0
+        else:
+            static_columns[col] = 'Unknown'
+
+    last_units_sold = [row.get(LAG_FEATURE, 0) for row in series_rows]
+    predictions = np.empty((num_series, num_days), dtype=np.int64)
+
+    # Compiled at startup from the fitted preprocessor; skips pandas and ColumnTransformer
+    encoder = get_compiled_encoder(preprocessor)
+
+    for step in range(num_days):
+        forecast_date = start_date + datetime.timedelta(days=step)
+
+        step_columns = dict(static_columns)
+        step_columns[LAG_FEATURE] = last_units_sold
+
+        started = time.perf_counter()
+        if encoder is not None:
+            # The compiled encoder builds and encodes the features in one pass
+            X_forecast_processed = encoder.encode(step_columns, num_series, forecast_date=forecast_date)
+        else:
+            step_columns.update(get_calendar_features(forecast_date))
+            X_forecast_input = pd.DataFrame(step_columns, index=range(num_series))
+            X_forecast_input = X_forecast_input.reindex(columns=all_expected_features)
+            built = time.perf_counter()
+            observe_stage('feature_build', built - started)
+            started = built
+            X_forecast_processed = preprocessor.transform(X_forecast_input)
+        transformed = time.perf_counter()
+        observe_stage('transform', transformed - started)
+
+        predicted_demand = ml_model.predict(X_forecast_processed)
+        observe_stage('predict', time.perf_counter() - transformed)
+
+        # Same rounding as the builtin round() on a NumPy float (half to even), floored at 0
+        predicted_demand = np.maximum(0, np.rint(predicted_demand)).astype(np.int64)
+        predictions[:, step] = predicted_demand
+
+        last_units_sold = predicted_demand
+
+    return predictions.tolist()
@@ -0,0 +1,86 @@
+# backend/services/indexes.py
+import pymongo
+from pymongo.errors import OperationFailure
+
+ASC = pymongo.ASCENDING
+
+# Every index the service layer relies on, per collection: (name, keys, options).
+# ensure_indexes creates them at startup; check_query_plans (manage.py) verifies they are used.
+INDEX_SPECS = {
+    'inventory': [
+        # One document per SKU: point lookups of sales, receipts, forecasts and reorders, and race-free receipt upserts
+        ('store_product_unique', [('store_id', ASC), ('product_id', ASC)], {'unique': True}),
+        # Low-stock and overstock range scans on the materialized days of cover
+        ('store_stock_cover', [('store_id', ASC), ('stock_cover_days', ASC)], {}),
+        ('stock_cover', [('stock_cover_days', ASC)], {}),
+    ],
+    'products': [
+        # Point lookups of the catalog cache when an ID is missing from its snapshot
+        ('product_id_unique', [('product_id', ASC)], {'unique': True}),
+    ],
+    'stores': [
+        ('store_id_unique', [('store_id', ASC)], {'unique': True}),
+    ],
+    'reorder_plans': [
+        ('store_product_unique', [('store_id', ASC), ('product_id', ASC)], {'unique': True}),
+    ],
+    'ingest_jobs': [
+        ('status', [('status', ASC)], {}),
+    ],
+}
+
+
+def create_collection_indexes(collection, specs):
+    """
+    Creates the given index specs on a collection (a no-op for indexes that already exist).
+    Returns the names of the indexes that could not be created, with the reason.
+    """
+    failures = {}
+    for name, keys, options in specs:
+        try:
+            collection.create_index(keys, name=name, **options)
+        except OperationFailure as e:
+            failures[name] = str(e)
+    return failures
+
+
+def ensure_indexes(db, collections=None):
+    """
+    Creates the indexes of INDEX_SPECS (for all collections, or only the given ones).
+
+    A unique index cannot be built while the collection holds duplicates (e.g. SKU documents
+    created by racing receipt upserts); such failures are reported, not raised, so the
+    service still starts. Run `python manage.py dedupe-inventory` and restart to fix them.
+
+    Returns:
+        dict: Failed index names per collection (empty when every index exists).
+    """
+    failures = {}
+    for collection_name, specs in INDEX_SPECS.items():
+        if collections is not None and collection_name not in collections:
+            continue
+        collection_failures = create_collection_indexes(db[collection_name], specs)
+        if collection_failures:
+            failures[collection_name] = collection_failures
+            for name, reason in collection_failures.items():
+                print(f"Warning: could not create index '{name}' on '{collection_name}': {reason}")
+    return failures
+
+
+def dedupe_inventory(db):
+    """
+    Removes duplicate inventory documents of the same (store_id, product_id), keeping the one
+    updated last (the record forecasts already use), so the unique SKU index can be built.
+    Returns the number of documents deleted.
+    """
+    duplicates = db.inventory.aggregate([
+        {'$sort': {'last_updated': -1, '_id': -1}},
+        {'$group': {'_id': {'store_id': '$store_id', 'product_id': '$product_id'}, 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}}
+    ], allowDiskUse=True)
+
+    deleted = 0
+    for group in duplicates:
+        deleted += db.inventory.delete_many({'_id': {'$in': group['ids'][1:]}}).deleted_count
+    print(f"Removed {deleted} duplicate inventory documents.")
+    return deleted
@@ -0,0 +1,255 @@
+# backend/services/ingest_jobs.py
+import datetime
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import ReturnDocument
+
+import metrics
+from services.batch_validation import iter_batch_csv_chunks, validate_batch_frame
+from services.indexes import ensure_indexes
+from services.inventory_service import apply_receipt_rows, apply_sale_rows
+
+INGEST_JOBS_COLLECTION = 'ingest_jobs'
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+INGEST_SPOOL_DIR = os.getenv('INGEST_SPOOL_DIR', os.path.join(os.path.dirname(CURRENT_DIR), 'ingest_spool'))
+INGEST_JOB_WORKERS = int(os.getenv('INGEST_JOB_WORKERS', '2'))
+# Rows applied and committed to the job document together; a resumed job restarts at a chunk boundary
+INGEST_JOB_CHUNK_ROWS = int(os.getenv('INGEST_JOB_CHUNK_ROWS', '50000'))
+# A job whose owner has not committed a chunk for this long is considered abandoned and can be resumed
+INGEST_JOB_LEASE_SECONDS = int(os.getenv('INGEST_JOB_LEASE_SECONDS', '300'))
+INGEST_JOB_MAX_ERRORS = 1000 # Failed row results kept on the job document
+
+JOB_KINDS = {
+    'sale': apply_sale_rows,
+    'receipt': apply_receipt_rows
+}
+
+_WORKER_ID = uuid.uuid4().hex # Lease owner id of this process
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _reset_after_fork():
+    # Pool threads do not survive fork(); a forked worker starts its own pool on first use,
+    # and needs its own lease owner id
+    global _WORKER_ID, _EXECUTOR, _EXECUTOR_LOCK
+    _WORKER_ID = uuid.uuid4().hex
+    _EXECUTOR = None
+    _EXECUTOR_LOCK = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_executor():
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=INGEST_JOB_WORKERS, thread_name_prefix='ingest-job')
+        return _EXECUTOR
+
+
+def _submit(db, job_id):
+    _get_executor().submit(_run_ingest_job, db, job_id)
+
+
+def ensure_ingest_job_indexes(db):
+    ensure_indexes(db, [INGEST_JOBS_COLLECTION])
+
+
+def create_ingest_job(db, kind, file_storage):
+    """
+    Spools an uploaded CSV to disk, records the job and queues it on the worker pool.
+
+    Args:
+        db: MongoDB database instance.
+        kind (str): 'sale' or 'receipt'.
+        file_storage: The uploaded file (werkzeug FileStorage); streamed to disk, not held in memory.
+
+    Returns:
+        str: The job id.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind '{kind}'.")
+
+    job_id = uuid.uuid4().hex
+    os.makedirs(INGEST_SPOOL_DIR, exist_ok=True)
+    spool_path = os.path.join(INGEST_SPOOL_DIR, f"{job_id}.csv")
+    file_storage.save(spool_path)
+
+    db[INGEST_JOBS_COLLECTION].insert_one({
+        '_id': job_id,
+        'kind': kind,
+        'status': 'queued',
+        'filename': file_storage.filename,
+        'spool_path': spool_path,
+        'chunk_rows': INGEST_JOB_CHUNK_ROWS,
+        'created_at': datetime.datetime.now(),
+        'rows_total': None,
+        'rows_parsed': 0,
+        'rows_applied': 0,
+        'rows_failed': 0,
+        'committed_chunks': 0,
+        'processing_seconds': 0.0,
+        'errors': []
+    })
+    _submit(db, job_id)
+    return job_id
+
+
+def _claim_job(db, job_id):
+    """
+    Takes the lease of an unfinished job, unless another live worker holds it.
+    """
+    now = datetime.datetime.now()
+    return db[INGEST_JOBS_COLLECTION].find_one_and_update(
+        {
+            '_id': job_id,
+            'status': {'$in': ['queued', 'running']},
+            '$or': [{'lease_expires_at': None}, {'lease_expires_at': {'$lt': now}}, {'lease_owner': _WORKER_ID}]
+        },
+        {'$set': {
+            'status': 'running',
+            'lease_owner': _WORKER_ID,
+            'lease_expires_at': now + datetime.timedelta(seconds=INGEST_JOB_LEASE_SECONDS),
+            'updated_at': now
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _retry_when_lease_expires(db, job_id):
+    job = db[INGEST_JOBS_COLLECTION].find_one({'_id': job_id}, {'status': 1, 'lease_expires_at': 1})
+    if job and job['status'] in ('queued', 'running') and job.get('lease_expires_at'):
+        delay = max(1.0, (job['lease_expires_at'] - datetime.datetime.now()).total_seconds() + 1)
+        timer = threading.Timer(delay, _submit, (db, job_id))
+        timer.daemon = True
+        timer.start()
+
+
+def _count_data_rows(csv_path):
+    with open(csv_path, 'rb') as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+def _run_ingest_job(db, job_id):
+    """
+    Processes a job chunk by chunk. Each chunk is applied with a batch id derived from the job
+    and chunk number, then committed to the job document; a job resumed after a restart skips
+    the committed chunks, and replaying the uncommitted one does not apply its rows twice.
+    """
+    jobs = db[INGEST_JOBS_COLLECTION]
+    job = _claim_job(db, job_id)
+    if job is None:
+        _retry_when_lease_expires(db, job_id)
+        return
+
+    apply_rows = JOB_KINDS[job['kind']]
+    chunk_rows = job['chunk_rows']
+    # Job threads serve no request; their stage timers and row counters get a route of their own
+    metrics.set_route(f"ingest_job:{job['kind']}")
+    first_chunk = job['committed_chunks']
+    print(f"Ingest job {job_id} ({job['kind']}) {'resuming at chunk ' + str(first_chunk) if first_chunk else 'started'}.")
+
+    try:
+        if job.get('rows_total') is None:
+            jobs.update_one({'_id': job_id}, {'$set': {'rows_total': _count_data_rows(job['spool_path'])}})
+
+        chunks = iter_batch_csv_chunks(job['spool_path'], chunk_rows, skip_rows=first_chunk * chunk_rows)
+        for chunk_index, df in enumerate(chunks, start=first_chunk):
+            started = time.perf_counter()
+            valid, failed = validate_batch_frame(df, first_row=chunk_index * chunk_rows + 1)
+            results, _ = apply_rows(db, valid, f"{job_id}:{chunk_index}", datetime.datetime.now())
+            failed = sorted(failed + [r for r in results if r['status'] != 'success'], key=lambda r: r['row'])
+            metrics.count_batch_rows('in', len(df))
+            metrics.count_batch_rows('out', len(df) - len(failed), 'success')
+            metrics.count_batch_rows('out', len(failed), 'failed')
+
+            now = datetime.datetime.now()
+            update = {
+                '$inc': {
+                    'rows_parsed': len(df),
+                    'rows_applied': len(df) - len(failed),
+                    'rows_failed': len(failed),
+                    'processing_seconds': time.perf_counter() - started
+                },
+                '$set': {
+                    'committed_chunks': chunk_index + 1,
+                    'updated_at': now,
+                    'lease_expires_at': now + datetime.timedelta(seconds=INGEST_JOB_LEASE_SECONDS)
+                }
+            }
+            if failed:
+                update['$push'] = {'errors': {'$each': failed, '$slice': INGEST_JOB_MAX_ERRORS}}
+            if jobs.update_one({'_id': job_id, 'lease_owner': _WORKER_ID}, update).matched_count == 0:
+                print(f"Ingest job {job_id}: lease lost to another worker, stopping.")
+                return
+
+        jobs.update_one({'_id': job_id, 'lease_owner': _WORKER_ID}, {
+            '$set': {'status': 'completed', 'finished_at': datetime.datetime.now()},
+            '$unset': {'lease_owner': '', 'lease_expires_at': ''}
+        })
+        os.remove(job['spool_path'])
+        print(f"Ingest job {job_id} completed.")
+    except Exception as e:
+        print(f"Ingest job {job_id} failed: {e}")
+        jobs.update_one({'_id': job_id, 'lease_owner': _WORKER_ID}, {
+            '$set': {'status': 'failed', 'error': str(e), 'finished_at': datetime.datetime.now()},
+            '$unset': {'lease_owner': '', 'lease_expires_at': ''}
+        })
+
+
+def resume_ingest_jobs(db):
+    """
+    Queues the unfinished jobs found in the `ingest_jobs` collection (called at startup).
+    Jobs still leased by a live worker are picked up once their lease expires.
+    """
+    ensure_ingest_job_indexes(db)
+    job_ids = [job['_id'] for job in db[INGEST_JOBS_COLLECTION].find({'status': {'$in': ['queued', 'running']}}, {'_id': 1})]
+    for job_id in job_ids:
+        _submit(db, job_id)
+    if job_ids:
+        print(f"Resuming {len(job_ids)} unfinished ingest job(s).")
+    return len(job_ids)
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime.datetime) else value
+
+
+def get_ingest_job(db, job_id):
+    """
+    Returns the progress of a job (rows parsed/applied/failed, rows/s, ETA) and, once it has
+    finished, its result, or None if the job does not exist.
+    """
+    job = db[INGEST_JOBS_COLLECTION].find_one({'_id': job_id})
+    if job is None:
+        return None
+
+    rows_per_second = job['rows_parsed'] / job['processing_seconds'] if job['processing_seconds'] > 0 else None
+    eta_seconds = None
+    if job['status'] in ('queued', 'running') and rows_per_second and job.get('rows_total') is not None:
+        eta_seconds = round(max(0, job['rows_total'] - job['rows_parsed']) / rows_per_second, 1)
+
+    return {
+        "job_id": job['_id'],
+        "kind": job['kind'],
+        "status": job['status'],
+        "filename": job.get('filename'),
+        "created_at": _format_time(job.get('created_at')),
+        "updated_at": _format_time(job.get('updated_at')),
+        "finished_at": _format_time(job.get('finished_at')),
+        "rows_total": job.get('rows_total'),
+        "rows_parsed": job['rows_parsed'],
+        "rows_applied": job['rows_applied'],
+        "rows_failed": job['rows_failed'],
+        "rows_per_second": round(rows_per_second, 1) if rows_per_second else None,
+        "eta_seconds": eta_seconds,
+        "errors": job.get('errors', []),
+        "error": job.get('error')
+    }
@@ -0,0 +1,237 @@
+# backend/services/initial_loader.py
+import datetime
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from services.bulk_scheduler import AdaptiveBatchController, is_pushback_error
+from services.indexes import INDEX_SPECS, create_collection_indexes
+from services.inventory_service import _stock_cover_days
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+
+LOAD_CHECKPOINTS_COLLECTION = 'load_checkpoints'
+STAGING_SUFFIX = '__staging'
+INITIAL_LOAD_WORKERS = int(os.getenv('INITIAL_LOAD_WORKERS', '4'))
+INITIAL_LOAD_MAX_RETRIES = 5
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _prepare_inventory_item(item):
+    # Ensure 'last_updated' is a datetime object
+    if 'last_updated' in item and isinstance(item['last_updated'], str):
+        try:
+            item['last_updated'] = datetime.datetime.fromisoformat(item['last_updated'])
+        except ValueError:
+            item['last_updated'] = datetime.datetime.now()
+    else:
+        item['last_updated'] = datetime.datetime.now()
+    # Ensure numerical fields are proper types, provide defaults
+    item['current_stock'] = int(item.get('current_stock', 0))
+    item['daily_sales_simulation_base'] = int(item.get('daily_sales_simulation_base', 1))
+    item['stock_cover_days'] = _stock_cover_days(item['current_stock'], item['daily_sales_simulation_base'])
+    return item
+
+
+# Collections in load order, with their NDJSON file and document preparation.
+# Their INDEX_SPECS include a unique natural-key index, which makes re-sent inserts idempotent.
+LOAD_COLLECTIONS = [
+    ('products', 'products.json', None),
+    ('stores', 'stores.json', None),
+    ('inventory', 'inventory.json', _prepare_inventory_item),
+]
+
+
+def _iter_ndjson_batches(file_path, skip_lines, controller, prepare):
+    """
+    Reads an NDJSON file lazily and yields (first line, end line, documents) batches sized by
+    the controller. Line numbers count every line of the file, blank ones included, so they
+    can be used as a resume offset.
+    """
+    batch = []
+    first_line = skip_lines
+    with open(file_path, 'r') as f:
+        for line_number, line in enumerate(f):
+            if line_number < skip_lines:
+                continue
+            if line.strip(): # Avoid empty lines
+                item = json.loads(line)
+                batch.append(prepare(item) if prepare else item)
+            if len(batch) >= controller.batch_size:
+                yield first_line, line_number + 1, batch
+                batch = []
+                first_line = line_number + 1
+        if batch:
+            yield first_line, line_number + 1, batch
+
+
+def _insert_batch(collection, documents, controller):
+    """
+    Inserts a batch into the staging collection. The unique natural-key index makes inserts
+    idempotent, so a batch that was (partly) written before a retry or a restart is simply
+    re-sent and its duplicate-key errors ignored.
+    """
+    for attempt in range(1, INITIAL_LOAD_MAX_RETRIES + 1):
+        started = time.perf_counter()
+        try:
+            collection.insert_many(documents, ordered=False)
+            controller.record_success(time.perf_counter() - started)
+            return len(documents)
+        except BulkWriteError as bwe:
+            write_errors = bwe.details.get('writeErrors', [])
+            other_errors = [e for e in write_errors if e.get('code') != DUPLICATE_KEY_ERROR]
+            if not other_errors:
+                controller.record_success(time.perf_counter() - started)
+                return bwe.details.get('nInserted', 0)
+            if attempt == INITIAL_LOAD_MAX_RETRIES:
+                raise
+            print(f"  {len(other_errors)} insert errors in {collection.name}, e.g. {other_errors[0].get('errmsg')}. Retrying batch...")
+            time.sleep(controller.record_pushback())
+        except Exception as e:
+            if attempt == INITIAL_LOAD_MAX_RETRIES or not is_pushback_error(e):
+                raise
+            delay = controller.record_pushback()
+            print(f"  Server pushback while inserting into {collection.name}: {e}. Retrying in {delay:.1f}s (attempt {attempt}/{INITIAL_LOAD_MAX_RETRIES})")
+            time.sleep(delay)
+        finally:
+            # insert_many adds _id to the documents; drop them so a retry does not reuse ids of a partial insert
+            for document in documents:
+                document.pop('_id', None)
+
+
+def _copy_indexes(source, target, skip_names):
+    """
+    Recreates the secondary indexes of the live collection on the staging collection.
+    """
+    for name, info in source.index_information().items():
+        if name == '_id_' or name in skip_names:
+            continue
+        options = {k: v for k, v in info.items() if k in ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds', 'collation')}
+        try:
+            target.create_index(list(info['key']), name=name, **options)
+        except OperationFailure as e:
+            # e.g. an old index with the same keys as one of INDEX_SPECS under another name
+            print(f"  Index '{name}' of {source.name} not copied: {e}")
+
+
+def load_collection(db, collection_name, file_path, prepare=None, workers=INITIAL_LOAD_WORKERS, fresh=False):
+    """
+    Streams an NDJSON file into `<collection>__staging` with parallel, adaptively sized inserts,
+    then swaps it in with renameCollection(dropTarget=True). The staging collection gets the
+    INDEX_SPECS indexes of the collection up front (their unique natural key makes re-sent inserts
+    idempotent) and copies of the live collection's other indexes. The live collection keeps serving
+    reads until the swap. Progress is checkpointed in `load_checkpoints`, so a load interrupted
+    midway resumes from the last contiguous batch written if the source file is unchanged.
+
+    Args:
+        db: MongoDB database instance.
+        collection_name (str): Live collection to replace.
+        file_path (str): NDJSON source file.
+        prepare (callable, optional): Converts a parsed line into the document to insert.
+        workers (int): insert_many calls in flight.
+        fresh (bool): Ignore any checkpoint and restart the load from the first line.
+
+    Returns:
+        dict: docs inserted, seconds and docs/s for this run.
+    """
+    staging_name = collection_name + STAGING_SUFFIX
+    staging = db[staging_name]
+    checkpoints = db[LOAD_CHECKPOINTS_COLLECTION]
+    stat = os.stat(file_path)
+    source = {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    checkpoint = checkpoints.find_one({'_id': collection_name})
+    if not fresh and checkpoint and checkpoint.get('source') == source and staging_name in db.list_collection_names():
+        committed_lines = checkpoint['committed_lines']
+        print(f"Resuming {collection_name} load from line {committed_lines} of {file_path}.")
+    else:
+        committed_lines = 0
+        staging.drop()
+        checkpoints.replace_one({'_id': collection_name}, {'_id': collection_name, 'source': source, 'committed_lines': 0}, upsert=True)
+    specs = INDEX_SPECS.get(collection_name, [])
+    failures = create_collection_indexes(staging, specs)
+    if failures:
+        raise ValueError(f"Could not create the indexes of {staging_name}: {failures}")
+
+    controller = AdaptiveBatchController(initial_batch_size=500, max_batch_size=5000, max_in_flight=workers)
+    inserted = 0
+    completed = {} # first line -> end line of batches written out of order
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def collect(done_futures):
+            nonlocal inserted, committed_lines
+            for future in done_futures:
+                first_line, end_line = pending.pop(future)
+                inserted += future.result()
+                completed[first_line] = end_line
+            # Checkpoint the highest line below which every batch has been written
+            advanced = committed_lines
+            while advanced in completed:
+                advanced = completed.pop(advanced)
+            if advanced != committed_lines:
+                committed_lines = advanced
+                checkpoints.update_one({'_id': collection_name}, {'$set': {'committed_lines': committed_lines, 'updated_at': datetime.datetime.now()}})
+
+        for first_line, end_line, documents in _iter_ndjson_batches(file_path, committed_lines, controller, prepare):
+            # Bound the number of batches held in memory, following the controller's in-flight limit
+            while len(pending) >= controller.in_flight_limit:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(_insert_batch, staging, documents, controller)] = (first_line, end_line)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    live = db[collection_name]
+    if collection_name in db.list_collection_names():
+        _copy_indexes(live, staging, {name for name, _, _ in specs})
+    staging.rename(collection_name, dropTarget=True)
+    checkpoints.delete_one({'_id': collection_name})
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        'collection': collection_name,
+        'inserted': inserted,
+        'documents': db[collection_name].estimated_document_count(),
+        'seconds': round(elapsed, 2),
+        'docs_per_second': round(inserted / elapsed, 1) if elapsed > 0 else None
+    }
+    print(f"Loaded {collection_name}: {summary['inserted']} docs inserted in {summary['seconds']}s ({summary['docs_per_second']} docs/s), {summary['documents']} docs live.")
+    return summary
+
+
+def run_initial_load(db, data_dir=BACKEND_DIR, workers=INITIAL_LOAD_WORKERS, fresh=False):
+    """
+    Loads the NDJSON files generated by data_prep.py (products, stores, inventory) with
+    load_collection and prints a docs/s summary per collection.
+
+    Returns:
+        list[dict]: One summary per collection, or None if a file is missing.
+    """
+    files = {name: os.path.join(data_dir, file_name) for name, file_name, _ in LOAD_COLLECTIONS}
+    missing = [path for path in files.values() if not os.path.exists(path)]
+    if missing:
+        print("Error: One or more NDJSON files not found at expected locations:")
+        for path in missing:
+            print(f" - {path}")
+        print("Please ensure they are in the backend/ directory and were generated by data_prep.py.")
+        return None
+
+    print(f"Starting initial data load from NDJSON files into MongoDB ({workers} parallel inserts)...")
+    summaries = []
+    for collection_name, _, prepare in LOAD_COLLECTIONS:
+        print(f"\n--- Loading {collection_name} collection from {files[collection_name]} ---")
+        summaries.append(load_collection(db, collection_name, files[collection_name], prepare, workers=workers, fresh=fresh))
+
+    print("\n--- Initial data load summary ---")
+    for summary in summaries:
+        print(f"  {summary['collection']:<10} {summary['inserted']:>10} docs {summary['seconds']:>9}s {summary['docs_per_second']:>12} docs/s")
+    return summaries
@@ -1,147 +1,134 @@
 # backend/services/inventory_service.py
+import base64
 import datetime
 import os
 import json
 import time
-import pandas as pd
+import uuid
+from collections import OrderedDict
 import pymongo # Needed for pymongo.UpdateOne
-from pymongo.errors import BulkWriteError, ConnectionFailure
 from pymongo import ReturnDocument
+from bson import ObjectId
+
+from services.forecast_engine import forecast_series_lockstep
+from metrics import stage_timer
+from services.forecast_cache import FORECAST_CACHE
+from services.bulk_scheduler import BulkWriteScheduler
+from services.batch_validation import read_batch_csv, validate_batch_frame
+from services.indexes import ensure_indexes
+from services.catalog_cache import get_catalog, invalidate_catalog
+
+# Days of stock left at the simulated daily sales rate, stored on every inventory document
+# as `stock_cover_days` so alert queries become index range scans. It is null when there is
+# stock but no demand (the item never runs out). Used in pipeline-style updates so the field
+# is recomputed atomically with the stock change.
+STOCK_COVER_DAYS_EXPR = {'$switch': {
+    'branches': [
+        {'case': {'$gt': [{'$ifNull': ['$daily_sales_simulation_base', 1]}, 0]},
+         'then': {'$divide': [{'$ifNull': ['$current_stock', 0]}, {'$ifNull': ['$daily_sales_simulation_base', 1]}]}},
+        {'case': {'$eq': [{'$ifNull': ['$current_stock', 0]}, 0]}, 'then': 0.0}
+    ],
+    'default': None
+}}
+
+def _stock_cover_days(current_stock, daily_sales_simulation_base):
+    """
+    Python counterpart of STOCK_COVER_DAYS_EXPR, for documents built before insertion.
+    """
+    if daily_sales_simulation_base > 0:
+        return current_stock / daily_sales_simulation_base
+    if current_stock == 0:
+        return 0.0
+    return None
+
+# Batch ingestion tags the documents it updates with its batch id; the last few ids are kept
+SALE_BATCH_IDS_FIELD = 'recent_sale_batch_ids'
+RECEIPT_BATCH_IDS_FIELD = 'recent_receipt_batch_ids'
+BATCH_IDS_KEPT = 20
 
-# Paths to your pre-generated NDJSON files (relative to backend/ directory, where data_prep.py placed them)
-PRODUCTS_JSON_PATH = 'products.json'
-STORES_JSON_PATH = 'stores.json'
-INVENTORY_JSON_PATH = 'inventory.json'
+def _append_batch_id(field, batch_id):
+    return {'$slice': [{'$concatArrays': [{'$ifNull': ['$' + field, []]}, [batch_id]]}, -BATCH_IDS_KEPT]}
 
-def load_initial_inventory_data(db):
+def _sale_update(quantity, timestamp, last_sold_quantity=None, batch_id=None):
+    """
+    Pipeline update decrementing stock for a sale and refreshing `stock_cover_days`.
+    Netted batch sales pass the quantity of the last row folded into `quantity` as
+    `last_sold_quantity`, and a `batch_id` recorded in `recent_sale_batch_ids`.
+    """
+    fields = {
+        'current_stock': {'$add': ['$current_stock', -quantity]},
+        'last_updated': timestamp,
+        'last_sold_quantity': quantity if last_sold_quantity is None else last_sold_quantity
+    }
+    if batch_id is not None:
+        fields[SALE_BATCH_IDS_FIELD] = _append_batch_id(SALE_BATCH_IDS_FIELD, batch_id)
+    return [
+        {'$set': fields},
+        {'$set': {'stock_cover_days': STOCK_COVER_DAYS_EXPR}}
+    ]
+
+def _receipt_update(quantity, timestamp, last_receipt_quantity=None, batch_id=None):
+    """
+    Pipeline update incrementing stock for a receipt (also valid for upserts) and refreshing `stock_cover_days`.
+    With a `batch_id`, the stock is only incremented if the document does not carry that id yet,
+    so replaying a batch (e.g. when a job resumes) does not count its receipts twice.
+    """
+    new_stock = {'$add': [{'$ifNull': ['$current_stock', 0]}, quantity]}
+    if batch_id is not None:
+        new_stock = {'$cond': [
+            {'$in': [batch_id, {'$ifNull': ['$' + RECEIPT_BATCH_IDS_FIELD, []]}]},
+            '$current_stock',
+            new_stock
+        ]}
+    fields = {
+        'current_stock': new_stock,
+        'last_updated': timestamp,
+        'last_receipt_quantity': quantity if last_receipt_quantity is None else last_receipt_quantity
+    }
+    if batch_id is not None:
+        fields[RECEIPT_BATCH_IDS_FIELD] = _append_batch_id(RECEIPT_BATCH_IDS_FIELD, batch_id)
+    return [
+        {'$set': fields},
+        {'$set': {'stock_cover_days': STOCK_COVER_DAYS_EXPR}}
+    ]
+
+def ensure_stock_cover_indexes(db):
+    """
+    Creates the inventory indexes, including the low-stock and overstock range scans on `stock_cover_days`.
+    """
+    ensure_indexes(db, ['inventory'])
+
+def backfill_stock_cover_days(db):
+    """
+    Migration: computes `stock_cover_days` for every existing inventory document and creates its indexes.
+    Returns the number of documents modified.
+    """
+    result = db.inventory.update_many({}, [{'$set': {'stock_cover_days': STOCK_COVER_DAYS_EXPR}}])
+    ensure_stock_cover_indexes(db)
+    print(f"Backfilled stock_cover_days on {result.modified_count} of {result.matched_count} inventory documents.")
+    return result.modified_count
+
+def load_initial_inventory_data(db, workers=None, fresh=False):
     """
     Loads initial data from generated NDJSON files into MongoDB collections.
-    This function is intended to be called once for initial data population.
-    It includes aggressive rate limiting and basic retry logic.
-    
+    Each file is streamed into a staging collection with parallel, adaptively sized inserts and
+    swapped in atomically, so the live collections keep serving until their copy is complete;
+    an interrupted load resumes from its checkpoint (see services/initial_loader.py).
+
     Args:
         db: The MongoDB database client instance.
+        workers (int, optional): Parallel inserts (default: INITIAL_LOAD_WORKERS).
+        fresh (bool): Ignore checkpoints of a previous interrupted load.
     """
     if db is None:
         print("MongoDB database instance not provided. Cannot load initial data.")
         return
 
-    # Adjust paths if data_prep.py places them elsewhere or if this script is run from a different CWD
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    backend_dir = os.path.dirname(current_dir) # Go up one level from services to backend
-    
-    products_file = os.path.join(backend_dir, PRODUCTS_JSON_PATH)
-    stores_file = os.path.join(backend_dir, STORES_JSON_PATH)
-    inventory_file = os.path.join(backend_dir, INVENTORY_JSON_PATH)
-
-    if not (os.path.exists(products_file) and
-            os.path.exists(stores_file) and
-            os.path.exists(inventory_file)):
-        print(f"Error: One or more NDJSON files not found at expected locations:")
-        print(f" - Products: {products_file}")
-        print(f" - Stores: {stores_file}")
-        print(f" - Inventory: {inventory_file}")
-        print("Please ensure they are in the backend/ directory and were generated by data_prep.py.")
-        return
-
-    print("Starting initial data load from NDJSON files into MongoDB...")
-    
-    collections_to_load = {
-        'products': products_file,
-        'stores': stores_file,
-        'inventory': inventory_file,
-    }
-
-    # Configuration for rate limiting and retries
-    max_batch_size = 100 # Smaller batch size for initial load
-    delay_between_batches = 3.0 # Seconds to wait between batch inserts (increased for safety)
-    max_retries = 5
-    retry_delay_multiplier = 2 # Multiplier for exponential backoff on retry
-
-    print(f"Delay between batches set to: {delay_between_batches} seconds")
-    print(f"Max batch size set to: {max_batch_size} operations")
-
-    for collection_name, file_path in collections_to_load.items():
-        print(f"\n--- Loading {collection_name} collection from {file_path} ---")
-        
-        items_to_insert = []
-        with open(file_path, 'r') as f:
-            for line in f:
-                if line.strip(): # Avoid empty lines
-                    item = json.loads(line)
-                    # Prepare data for MongoDB insertion based on collection type
-                    if collection_name == 'inventory':
-                        # Ensure 'last_updated' is a datetime object
-                        if 'last_updated' in item and isinstance(item['last_updated'], str):
-                            try:
-                                item['last_updated'] = datetime.datetime.fromisoformat(item['last_updated'])
-                            except ValueError:
-                                item['last_updated'] = datetime.datetime.now()
-                        else:
-                            item['last_updated'] = datetime.datetime.now()
-                        # Ensure numerical fields are proper types, provide defaults
-                        item['current_stock'] = int(item.get('current_stock', 0))
-                        item['daily_sales_simulation_base'] = int(item.get('daily_sales_simulation_base', 1))
-
-                    items_to_insert.append(item)
-        
-        print(f"Read {len(items_to_insert)} items for {collection_name}.")
-
-        if not items_to_insert:
-            print(f"No items to load for {collection_name}. Skipping.")
-            continue
-
-        current_collection = db[collection_name]
-        
-        # Drop the collection before inserting to ensure a clean slate on re-run (for development)
-        # CAUTION: In production, you would NOT do this for existing data
-        print(f"Dropping existing '{collection_name}' collection for clean import...")
-        current_collection.drop()
-
-        # Perform bulk inserts with rate limiting
-        total_items_processed = 0
-        for i in range(0, len(items_to_insert), max_batch_size):
-            batch_data = items_to_insert[i:i + max_batch_size]
-            
-            retries = 0
-            while retries < max_retries:
-                try:
-                    # Insert many documents at once
-                    current_collection.insert_many(batch_data, ordered=False) # ordered=False continues on error
-                    total_items_processed += len(batch_data)
-                    print(f"  Inserted {len(batch_data)} {collection_name} records (Total: {total_items_processed}). Waiting {delay_between_batches}s...")
-                    time.sleep(delay_between_batches)
-                    break # Batch inserted successfully, break retry loop
-                except BulkWriteError as bwe:
-                    print(f"  BulkWriteError for {collection_name}: {bwe.details}")
-                    # For a hackathon, we might just log and continue on BulkWriteError (e.g., duplicate key)
-                    total_items_processed += bwe.details.get('nInserted', 0) # Count successful inserts in batch
-                    print(f"  Partial batch inserted. Total: {total_items_processed}. Waiting {delay_between_batches}s...")
-                    time.sleep(delay_between_batches)
-                    break # Continue even on partial errors for now
-                except ConnectionFailure as ce:
-                    print(f"  MongoDB ConnectionFailure during insert for {collection_name}: {ce}")
-                    retries += 1
-                    current_retry_delay = delay_between_batches * (retry_delay_multiplier ** retries)
-                    print(f"  Connection error. Retrying in {current_retry_delay}s... (Attempt {retries}/{max_retries})")
-                    time.sleep(current_retry_delay)
-                except Exception as e:
-                    print(f"  Error inserting batch for {collection_name}: {e}")
-                    retries += 1
-                    current_retry_delay = delay_between_batches * (retry_delay_multiplier ** retries)
-                    print(f"  General error. Retrying in {current_retry_delay}s... (Attempt {retries}/{max_retries})")
-                    time.sleep(current_retry_delay)
-
-            if retries == max_retries:
-                print(f"  Failed to insert batch for {collection_name} after {max_retries} retries. Skipping remaining items in this batch.")
-
-        # Ensure all items processed messages are printed for this collection even if batch_item_count is less than max_batch_size
-        if total_items_processed < len(items_to_insert):
-            print(f"  Note: Some items might have been skipped for {collection_name} due to errors.")
-        
-        print(f"Finished loading {collection_name}. Total {total_items_processed} items processed.")
-
-    print("\n--- Initial data load process complete ---")
+    # Imported here: the loader builds on helpers of this module
+    from services.initial_loader import INITIAL_LOAD_WORKERS, run_initial_load
+    result = run_initial_load(db, workers=workers or INITIAL_LOAD_WORKERS, fresh=fresh)
+    invalidate_catalog(db) # Other processes pick the new catalog up from their change stream or reload
+    return result
 
 def get_inventory_item(db, store_id, product_id):
     """
@@ -164,12 +151,14 @@ def record_sale_transaction(db, store_id, product_id, quantity):
     Ensures sufficient stock before update.
     Returns the new stock level or raises ValueError.
     """
-    result = db.inventory.find_one_and_update(
-        {'store_id': store_id, 'product_id': product_id, 'current_stock': {'$gte': quantity}},
-        {'$inc': {'current_stock': -quantity}, '$set': {'last_updated': datetime.datetime.now(), 'last_sold_quantity': quantity}},
-        return_document=ReturnDocument.AFTER
-    )
+    with stage_timer('db_write'):
+        result = db.inventory.find_one_and_update(
+            {'store_id': store_id, 'product_id': product_id, 'current_stock': {'$gte': quantity}},
+            _sale_update(quantity, datetime.datetime.now()),
+            return_document=ReturnDocument.AFTER
+        )
     if result:
+        FORECAST_CACHE.invalidate_sku(store_id, product_id)
         return result['current_stock']
     else:
         existing_item = db.inventory.find_one({'store_id': store_id, 'product_id': product_id})
@@ -184,249 +173,438 @@ def record_receipt_transaction(db, store_id, product_id, quantity):
     Creates the entry if it doesn't exist (upsert).
     Returns the new stock level.
     """
-    result = db.inventory.find_one_and_update(
-        {'store_id': store_id, 'product_id': product_id},
-        {'$inc': {'current_stock': quantity}, '$set': {'last_updated': datetime.datetime.now(), 'last_receipt_quantity': quantity}},
-        upsert=True,
-        return_document=ReturnDocument.AFTER
-    )
+    with stage_timer('db_write'):
+        result = db.inventory.find_one_and_update(
+            {'store_id': store_id, 'product_id': product_id},
+            _receipt_update(quantity, datetime.datetime.now()),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
     if result:
+        FORECAST_CACHE.invalidate_sku(store_id, product_id)
         return result['current_stock']
     else:
         # This case should be rare with upsert=True unless a different error occurs
         raise ValueError(f"Failed to record receipt for Product ID: {product_id} at Store ID: {store_id}")
 
 
-def process_sales_batch_csv(db, csv_file_stream):
+def _sku_rows_from_frame(valid):
     """
-    Processes a CSV stream for multiple sales events using bulk write operations.
+    Groups the rows of a validated batch frame by SKU.
+    Returns an OrderedDict of (store_id, product_id) -> [(row number, quantity)] in file order.
+    """
+    sku_rows = OrderedDict()
+    for row_number, store_id, product_id, quantity in zip(
+        valid['row'].tolist(), valid['store_id'].tolist(), valid['product_id'].tolist(), valid['quantity'].tolist()
+    ):
+        sku_rows.setdefault((store_id, product_id), []).append((row_number, quantity))
+    return sku_rows
+
+def apply_receipt_rows(db, valid, batch_id, timestamp):
     """
-    df = pd.read_csv(csv_file_stream)
-    df.columns = df.columns.str.strip()
+    Applies the valid rows of a receipts batch: rows of the same SKU are netted into one
+    upsert incrementing the stock by their total quantity, tagged with the batch id so a
+    replay of the same batch is a no-op.
 
-    required_cols = ['store_id', 'product_id', 'quantity']
-    if not all(col in df.columns for col in required_cols):
-        raise ValueError(f"CSV must contain 'store_id', 'product_id', and 'quantity' columns. Missing: {', '.join([col for col in required_cols if col not in df.columns])}")
+    Args:
+        db: MongoDB database instance.
+        valid (pd.DataFrame): Valid rows, as returned by validate_batch_frame.
+        batch_id (str): Token identifying this batch on the inventory documents.
+        timestamp (datetime.datetime): `last_updated` value written by the batch.
+
+    Returns:
+        tuple: (results, stats) with one result dict per row and the scheduler statistics.
+    """
+    sku_rows = _sku_rows_from_frame(valid)
+    scheduler = BulkWriteScheduler(db.inventory)
+    outcomes, stats = scheduler.run([
+        {
+            'request': pymongo.UpdateOne(
+                {'store_id': sku[0], 'product_id': sku[1]},
+                _receipt_update(sum(quantity for _, quantity in rows), timestamp, rows[-1][1], batch_id),
+                upsert=True
+            ),
+            'partition': sku[0],
+            'index': sku
+        } for sku, rows in sku_rows.items()
+    ])
 
     results = []
-    batch_size = 50
-    delay_between_batches = 0.2
-
-    all_updates_to_perform = []
-
-    for index, row in df.iterrows():
-        store_id = str(row['store_id'])
-        product_id = str(row['product_id'])
-        try:
-            quantity = int(row['quantity'])
-            if quantity <= 0:
-                results.append({"row": index + 1, "status": "failed", "error": "Quantity must be positive.", "store_id": store_id, "product_id": product_id})
-                continue
-        except ValueError:
-            results.append({"row": index + 1, "status": "failed", "error": "Invalid quantity format.", "store_id": store_id, "product_id": product_id})
-            continue
+    for sku, rows in sku_rows.items():
+        outcome = outcomes.get(sku, {'status': 'failed', 'error': 'Not written'})
+        for row_number, _ in rows:
+            result = {"row": row_number, "store_id": sku[0], "product_id": sku[1]}
+            if outcome['status'] == 'applied':
+                result.update(status="success", message="Processed in batch")
+            else:
+                result.update(status="failed", error=outcome['error'])
+            results.append(result)
 
-        all_updates_to_perform.append({
-            'filter': {'store_id': store_id, 'product_id': product_id, 'current_stock': {'$gte': quantity}},
-            'update': {'$inc': {'current_stock': -quantity}, '$set': {'last_updated': datetime.datetime.now(), 'last_sold_quantity': quantity}},
-            'index': index + 1 # Store original row index for results
-        })
-    
-    for i in range(0, len(all_updates_to_perform), batch_size):
-        current_batch_updates = all_updates_to_perform[i:i + batch_size]
-        
-        bulk_write_requests = [
-            pymongo.UpdateOne(op['filter'], op['update']) for op in current_batch_updates
-        ]
-        
-        try:
-            if bulk_write_requests:
-                db.inventory.bulk_write(bulk_write_requests, ordered=False)
-                for op_info in current_batch_updates:
-                    results.append({
-                        "row": op_info['index'],
-                        "status": "success",
-                        "message": "Processed in batch (stock checked)",
-                        "store_id": op_info['filter']['store_id'],
-                        "product_id": op_info['filter']['product_id']
-                    })
-            time.sleep(delay_between_batches)
-
-        except BulkWriteError as bwe:
-            print(f"  Partial success/error in batch sale: {bwe.details}")
-            for op_info in current_batch_updates:
-                results.append({
-                    "row": op_info['index'],
-                    "status": "partial_success/failure",
-                    "message": "See backend logs for details",
-                    "store_id": op_info['filter']['store_id'],
-                    "product_id": op_info['filter']['product_id']
-                })
-            time.sleep(delay_between_batches)
-        except Exception as e:
-            print(f"  Error processing sale batch: {e}")
-            for op_info in current_batch_updates:
-                results.append({
-                    "row": op_info['index'],
-                    "status": "failed",
-                    "error": str(e),
-                    "store_id": op_info['filter']['store_id'],
-                    "product_id": op_info['filter']['product_id']
-                })
-            time.sleep(delay_between_batches)
-    
-    return results
+    # Cached forecasts of the SKUs in this batch were based on the old stock levels
+    FORECAST_CACHE.invalidate_skus(set(sku_rows))
+    return results, stats
 
-def process_receipts_batch_csv(db, csv_file_stream):
+def _batch_response(results, stats, total_rows, started):
     """
-    Processes a CSV stream for multiple receipt events using bulk write operations.
+    Combines per-row results and scheduler statistics into the batch processing response.
     """
-    df = pd.read_csv(csv_file_stream)
-    df.columns = df.columns.str.strip()
+    elapsed = time.perf_counter() - started
+    stats = dict(stats, rows=total_rows, elapsed_seconds=round(elapsed, 3))
+    stats['rows_per_second'] = round(total_rows / elapsed, 1) if elapsed > 0 else None
+    print(f"  Batch of {total_rows} rows processed in {elapsed:.2f}s ({stats['rows_per_second']} rows/s, "
+          f"{stats['batches']} bulk writes, final batch size {stats['final_batch_size']}).")
+    return {"results": sorted(results, key=lambda r: r['row']), "stats": stats}
 
-    required_cols = ['store_id', 'product_id', 'quantity']
-    if not all(col in df.columns for col in required_cols):
-        raise ValueError(f"CSV must contain 'store_id', 'product_id', and 'quantity' columns. Missing: {', '.join([col for col in required_cols if col not in df.columns])}")
+# Write/read rounds per sales batch before rows of SKUs whose stock keeps changing are rejected
+SALE_NETTING_MAX_ROUNDS = 3
 
-    results = []
-    batch_size = 50
-    delay_between_batches = 0.2
-    
-    all_updates_to_perform = []
-
-    for index, row in df.iterrows():
-        store_id = str(row['store_id'])
-        product_id = str(row['product_id'])
-        try:
-            quantity = int(row['quantity'])
-            if quantity <= 0:
-                results.append({"row": index + 1, "status": "failed", "error": "Quantity must be positive.", "store_id": store_id, "product_id": product_id})
-                continue
-        except ValueError:
-            results.append({"row": index + 1, "status": "failed", "error": "Invalid quantity format.", "store_id": store_id, "product_id": product_id})
+def _allocate_sale_rows(rows, available_stock):
+    """
+    Allocates stock to the sale rows of one SKU in file order, exactly as applying them one
+    by one with the `current_stock >= quantity` check would.
+
+    Returns:
+        tuple: (applied rows, rejected rows as (row, quantity, stock available to the row))
+    """
+    applied, rejected = [], []
+    for row_number, quantity in rows:
+        if quantity <= available_stock:
+            applied.append((row_number, quantity))
+            available_stock -= quantity
+        else:
+            rejected.append((row_number, quantity, available_stock))
+    return applied, rejected
+
+def _read_sale_netting_state(db, skus, batch_id):
+    """
+    Single `$in` read of the SKUs of a netting round.
+    Returns a dict of (store_id, product_id) -> (current_stock, whether the batch was applied).
+    """
+    store_ids = list({store_id for store_id, _ in skus})
+    product_ids = list({product_id for _, product_id in skus})
+    state = {}
+    for doc in db.inventory.find(
+        {'store_id': {'$in': store_ids}, 'product_id': {'$in': product_ids}},
+        {'store_id': 1, 'product_id': 1, 'current_stock': 1, SALE_BATCH_IDS_FIELD: 1}
+    ):
+        sku = (doc['store_id'], doc['product_id'])
+        if sku not in skus:
             continue
+        applied = batch_id in (doc.get(SALE_BATCH_IDS_FIELD) or [])
+        previous = state.get(sku)
+        # With duplicate documents, the one carrying the batch id (or else the most stock) wins
+        if previous is None or (applied and not previous[1]) or \
+                (not previous[1] and not applied and doc.get('current_stock', 0) > previous[0]):
+            state[sku] = (doc.get('current_stock', 0), applied)
+    return state
+
+def _apply_netted_sales(db, sku_rows, batch_id, timestamp):
+    """
+    Applies the valid sale rows of a batch, folded per SKU into conditional decrements.
 
-        all_updates_to_perform.append({
-            'filter': {'store_id': store_id, 'product_id': product_id},
-            'update': {'$inc': {'current_stock': quantity}, '$set': {'last_updated': datetime.datetime.now(), 'last_receipt_quantity': quantity}},
-            'upsert': True,
-            'index': index + 1
-        })
-    
-    for i in range(0, len(all_updates_to_perform), batch_size):
-        current_batch_updates = all_updates_to_perform[i:i + batch_size]
-        
-        bulk_write_requests = [
-            pymongo.UpdateOne(op['filter'], op['update'], upsert=op['upsert']) for op in current_batch_updates
-        ]
-        
-        try:
-            if bulk_write_requests:
-                db.inventory.bulk_write(bulk_write_requests, ordered=False)
-                for op_info in current_batch_updates:
-                    results.append({
-                        "row": op_info['index'],
-                        "status": "success",
-                        "message": "Processed in batch",
-                        "store_id": op_info['filter']['store_id'],
-                        "product_id": op_info['filter']['product_id']
-                    })
-            time.sleep(delay_between_batches)
-
-        except BulkWriteError as bwe:
-            print(f"  Partial success/error in batch receipt: {bwe.details}")
-            for op_info in current_batch_updates:
-                results.append({
-                    "row": op_info['index'],
-                    "status": "partial_success/failure",
-                    "message": "See backend logs for details",
-                    "store_id": op_info['filter']['store_id'],
-                    "product_id": op_info['filter']['product_id']
-                })
-            time.sleep(delay_between_batches)
-        except Exception as e:
-            print(f"  Error processing receipt batch: {e}")
-            for op_info in current_batch_updates:
+    Each round sends one conditional update per SKU for the total quantity of its pending rows,
+    tagged with the batch id. When every update matched (BulkWriteResult match counts) all rows
+    are applied. Otherwise a single `$in` read tells which SKUs carry the batch id, and the stock
+    of the others is allocated to their rows in file order; the allocated rows are retried in the
+    next round and the rest are rejected for insufficient stock.
+
+    Args:
+        db: MongoDB database instance.
+        sku_rows (OrderedDict): (store_id, product_id) -> list of (row number, quantity) in file order.
+        batch_id (str): Token identifying this batch on the inventory documents.
+        timestamp (datetime.datetime): `last_updated` value written by the batch.
+
+    Returns:
+        tuple: (results, stats) with one result dict per row and the scheduler statistics
+        of all rounds (`netting_rounds` tells how many there were).
+    """
+    scheduler = BulkWriteScheduler(db.inventory)
+    results = []
+    rounds = 0
+    partitions = 0
+
+    def settle(sku, rows, status, text):
+        for row_number, _ in rows:
+            result = {"row": row_number, "status": status, "store_id": sku[0], "product_id": sku[1]}
+            result["message" if status == "success" else "error"] = text
+            results.append(result)
+
+    pending = OrderedDict(sku_rows) # Settled SKUs are popped; the caller's dict stays whole
+    for round_number in range(1, SALE_NETTING_MAX_ROUNDS + 1):
+        rounds = round_number
+        matched_before = scheduler.matched_count
+        outcomes, stats = scheduler.run([
+            {
+                'request': pymongo.UpdateOne(
+                    {
+                        'store_id': sku[0],
+                        'product_id': sku[1],
+                        'current_stock': {'$gte': sum(quantity for _, quantity in rows)},
+                        SALE_BATCH_IDS_FIELD: {'$ne': batch_id}
+                    },
+                    _sale_update(sum(quantity for _, quantity in rows), timestamp, rows[-1][1], batch_id)
+                ),
+                'partition': sku[0],
+                'index': sku
+            } for sku, rows in pending.items()
+        ])
+        # The scheduler's counters accumulate over rounds; its partition count is per round
+        partitions = max(partitions, stats['partitions'])
+
+        for sku, outcome in outcomes.items():
+            if outcome['status'] == 'failed':
+                settle(sku, pending.pop(sku), "failed", outcome['error'])
+
+        if scheduler.matched_count - matched_before == len(pending) and all(o['status'] == 'applied' for o in outcomes.values()):
+            for sku, rows in pending.items():
+                settle(sku, rows, "success", "Applied")
+            pending = OrderedDict()
+            break
+
+        state = _read_sale_netting_state(db, pending, batch_id)
+        next_pending = OrderedDict()
+        for sku, rows in pending.items():
+            if sku not in state:
+                settle(sku, rows, "failed", f"Inventory item not found for Product ID: {sku[1]} at Store ID: {sku[0]}")
+                continue
+            current_stock, applied = state[sku]
+            if applied:
+                settle(sku, rows, "success", "Applied")
+                continue
+            if round_number == SALE_NETTING_MAX_ROUNDS:
+                settle(sku, rows, "failed", "Stock changed concurrently while the batch was applied. Please retry these rows.")
+                continue
+            applied_rows, rejected_rows = _allocate_sale_rows(rows, current_stock)
+            for row_number, quantity, available in rejected_rows:
                 results.append({
-                    "row": op_info['index'],
-                    "status": "failed",
-                    "error": str(e),
-                    "store_id": op_info['filter']['store_id'],
-                    "product_id": op_info['filter']['product_id']
+                    "row": row_number, "status": "failed",
+                    "error": f"Insufficient stock. Current: {available}, Requested: {quantity}",
+                    "store_id": sku[0], "product_id": sku[1]
                 })
-            time.sleep(delay_between_batches)
-    
-    return results
+            if applied_rows:
+                next_pending[sku] = applied_rows
+        pending = next_pending
+        if not pending:
+            break
 
-def get_low_stock_alerts_data(db, days_left_threshold, store_filter_id=None):
+    # Cached forecasts of the SKUs in this batch were based on the old stock levels
+    FORECAST_CACHE.invalidate_skus(set(sku_rows))
+    return results, dict(stats, partitions=partitions, netting_rounds=rounds)
+
+def apply_sale_rows(db, valid, batch_id, timestamp):
     """
-    Identifies and returns products across all stores that are projected to run out
-    within a specified number of `days_left`, based on their current stock and
-    simulated daily sales. Also incorporates 'min_replenish_time' for advanced alerts.
-    Results are sorted by 'days_remaining' in ascending order.
+    Applies the valid rows of a sales batch (see _apply_netted_sales). Replaying the same
+    batch id is a no-op for the SKUs it already decremented.
+
+    Returns:
+        tuple: (results, stats) with one result dict per row and the scheduler statistics.
     """
-    critical_stock_items = []
-    
-    query_filter = {}
+    return _apply_netted_sales(db, _sku_rows_from_frame(valid), batch_id, timestamp)
+
+def process_sales_batch_csv(db, csv_file_stream):
+    """
+    Processes a CSV stream for multiple sales events using bulk write operations.
+    Rows for the same (store_id, product_id) are netted into a single conditional decrement,
+    and every row is reported as applied or rejected, as if the rows were applied one by one.
+
+    Returns:
+        dict: 'results' (one entry per row, in file order) and 'stats' (throughput in rows/s
+        and the batch sizes and concurrency chosen by the bulk write scheduler).
+    """
+    started = time.perf_counter()
+    with stage_timer('validate'):
+        df = read_batch_csv(csv_file_stream)
+        valid, results = validate_batch_frame(df)
+    timestamp = datetime.datetime.now() # One timestamp for the whole batch
+
+    with stage_timer('db_write'):
+        write_results, stats = apply_sale_rows(db, valid, uuid.uuid4().hex, timestamp)
+    return _batch_response(results + write_results, stats, len(df), started)
+
+def process_receipts_batch_csv(db, csv_file_stream):
+    """
+    Processes a CSV stream for multiple receipt events using bulk write operations.
+    Rows for the same (store_id, product_id) are netted into a single upsert.
+
+    Returns:
+        dict: 'results' (one entry per row, in file order) and 'stats' (throughput in rows/s
+        and the batch sizes and concurrency chosen by the bulk write scheduler).
+    """
+    started = time.perf_counter()
+    with stage_timer('validate'):
+        df = read_batch_csv(csv_file_stream)
+        valid, results = validate_batch_frame(df)
+    timestamp = datetime.datetime.now() # One timestamp for the whole batch
+
+    with stage_timer('db_write'):
+        write_results, stats = apply_receipt_rows(db, valid, uuid.uuid4().hex, timestamp)
+    return _batch_response(results + write_results, stats, len(df), started)
+
+# Alert categories of get_low_stock_alerts_data, keyed by the code accepted as `category` filter
+LOW_STOCK_ALERT_CATEGORIES = {
+    'out_of_stock': "Critical - Out of Stock",
+    'below_lead_time': "Critical - Below Replenishment Lead Time",
+    'approaching_threshold': "Warning - Approaching Threshold"
+}
+
+def _encode_alerts_cursor(days_remaining, doc_id):
+    """
+    Opaque pagination cursor: the sort key of the last alert returned.
+    """
+    payload = json.dumps([days_remaining, str(doc_id), isinstance(doc_id, ObjectId)])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def _decode_alerts_cursor(cursor):
+    try:
+        days_remaining, doc_id, is_object_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return float(days_remaining), ObjectId(doc_id) if is_object_id else doc_id
+    except Exception:
+        raise ValueError("Invalid 'cursor' value.")
+
+def _low_stock_candidates_filter(days_left_threshold, max_replenish_time, store_filter_id=None, category=None, cursor=None):
+    """
+    Filter of the inventory documents that can raise a low stock alert: an index range on
+    (store_id, stock_cover_days), narrowed by the category and the page cursor where possible.
+    """
+    # Items with stock_cover_days above both the threshold and the longest lead time can never
+    # alert, so the scan is restricted to an index range on (store_id, stock_cover_days)
+    upper = max(days_left_threshold, max_replenish_time)
+    if category == 'below_lead_time':
+        upper = max_replenish_time
+    elif category == 'approaching_threshold':
+        upper = days_left_threshold
+    cover_range = {'$lte': upper}
+    if category in ('below_lead_time', 'approaching_threshold'):
+        cover_range['$gt'] = 0
+    if cursor:
+        # Alerts are paged on days remaining rounded to 2 decimals
+        after_days, _ = _decode_alerts_cursor(cursor)
+        cover_range['$gte'] = after_days - 0.005
+
+    query_filter = {'stock_cover_days': cover_range}
     if store_filter_id:
         query_filter['store_id'] = store_filter_id
+    if category == 'out_of_stock':
+        query_filter['current_stock'] = {'$in': [0, None]}
+    return query_filter
 
-    # Fetch all products once to get their replenishment times
-    products_collection = db['products']
-    all_products = {}
-    for product_doc in products_collection.find({}):
-        all_products[product_doc['product_id']] = product_doc.get('min_replenish_time', 0) # Default to 0 if missing
+def _lead_time(product_details):
+    min_replenish_time = (product_details or {}).get('min_replenish_time')
+    if isinstance(min_replenish_time, (int, float)) and not isinstance(min_replenish_time, bool):
+        return min_replenish_time
+    return 0
 
-    for item in db.inventory.find(query_filter):
-        product_id = item.get('product_id')
-        store_id = item.get('store_id')
-        current_stock = item.get('current_stock', 0)
-        daily_demand_sim = item.get('daily_sales_simulation_base', 1) 
-        min_replenish_time = all_products.get(product_id, 0) # Get replenishment time for this product
+def _categorise_low_stock(current_stock, days_remaining, min_replenish_time, days_left_threshold):
+    """
+    Returns the LOW_STOCK_ALERT_CATEGORIES code of an inventory item, or None if it does not alert.
+    """
+    if current_stock == 0:
+        return 'out_of_stock'
+    if days_remaining is not None and days_remaining > 0:
+        if days_remaining <= min_replenish_time:
+            return 'below_lead_time'
+        if days_remaining <= days_left_threshold:
+            return 'approaching_threshold'
+    return None
+
+def _alerts_sort_key(days_remaining_sort, doc_id):
+    # Same order as a MongoDB sort on (days, _id): strings sort before ObjectIds
+    return (days_remaining_sort, isinstance(doc_id, ObjectId), str(doc_id))
+
+def get_low_stock_alerts_page(db, days_left_threshold, store_filter_id=None, category=None, limit=None, cursor=None):
+    """
+    Returns one page of low stock alerts (see get_low_stock_alerts_data) and the cursor of the
+    next page, or None when this is the last page. Candidates are read in `stock_cover_days`
+    order from an index range scan and categorised with the lead times of the catalog cache
+    (no join with the products collection); the scan stops as soon as the page is complete.
+
+    Args:
+        db: The MongoDB database client instance.
+        days_left_threshold (int): Alert when stock runs out within this many days.
+        store_filter_id (str, optional): Filters alerts for a specific store.
+        category (str, optional): Only return one alert category (a LOW_STOCK_ALERT_CATEGORIES key).
+        limit (int, optional): Maximum number of alerts to return.
+        cursor (str, optional): Cursor returned with the previous page.
+    """
+    if category and category not in LOW_STOCK_ALERT_CATEGORIES:
+        raise ValueError(f"Invalid 'category' value. Must be one of: {', '.join(LOW_STOCK_ALERT_CATEGORIES)}.")
+
+    catalog = get_catalog(db)
+    with stage_timer('db_fetch'):
+        max_replenish_time = catalog.longest_min_replenish_time()
+        query_filter = _low_stock_candidates_filter(days_left_threshold, max_replenish_time, store_filter_id, category, cursor)
+        candidates = db.inventory.find(query_filter, {
+            'product_id': 1, 'store_id': 1, 'current_stock': 1, 'daily_sales_simulation_base': 1,
+            'stock_cover_days': 1, 'last_updated': 1
+        }).sort([('stock_cover_days', pymongo.ASCENDING)])
+        if limit:
+            candidates = candidates.batch_size(max(limit + 1, 100))
+
+        after_key = _alerts_sort_key(*_decode_alerts_cursor(cursor)) if cursor else None
+        alerts = []
+        for item in candidates:
+            days_remaining = item['stock_cover_days']
+            days_remaining_sort = round(days_remaining, 2)
+            # Pages are ordered by (rounded days, _id) and the scan by days: once the page is full,
+            # it is complete when the rounded days move past those of the last alert collected
+            if limit and len(alerts) > limit and days_remaining_sort > alerts[-1][0][0]:
+                break
+            sort_key = _alerts_sort_key(days_remaining_sort, item['_id'])
+            if after_key is not None and sort_key <= after_key:
+                continue
+            current_stock = item.get('current_stock')
+            if current_stock is None:
+                current_stock = 0
+            product_details = catalog.get_product(item.get('product_id'))
+            min_replenish_time = _lead_time(product_details)
+            alert_code = _categorise_low_stock(current_stock, days_remaining, min_replenish_time, days_left_threshold)
+            if alert_code is None or (category and alert_code != category):
+                continue
+            alerts.append((sort_key, item, current_stock, days_remaining, min_replenish_time, alert_code))
+    alerts.sort(key=lambda alert: alert[0])
 
-        days_remaining = float('inf')
-        if daily_demand_sim > 0:
-            days_remaining = current_stock / daily_demand_sim
-        elif current_stock == 0:
-            days_remaining = 0.0
+    next_cursor = None
+    if limit and len(alerts) > limit:
+        alerts = alerts[:limit]
+        next_cursor = _encode_alerts_cursor(alerts[-1][0][0], alerts[-1][1]['_id'])
 
-        alert_category = "Standard Alert"
-        alert_reason = f"Projected to run out in {round(days_remaining, 2)} days (within {days_left_threshold} days limit)"
+    critical_stock_items = []
+    for _, item, current_stock, days_remaining, min_replenish_time, alert_code in alerts:
+        alert_category = LOW_STOCK_ALERT_CATEGORIES[alert_code]
 
-        if current_stock == 0:
-            alert_category = "Critical - Out of Stock"
+        if alert_code == 'out_of_stock':
             alert_reason = "Currently out of stock."
-        elif days_remaining <= min_replenish_time and days_remaining > 0:
-            alert_category = "Critical - Below Replenishment Lead Time"
+        elif alert_code == 'below_lead_time':
             alert_reason = f"Projected to run out in {round(days_remaining, 2)} days, which is less than replenishment time of {min_replenish_time} days."
-        elif days_remaining <= days_left_threshold and days_remaining > 0:
-            alert_category = "Warning - Approaching Threshold"
+        else:
             alert_reason = f"Projected to run out in {round(days_remaining, 2)} days (within {days_left_threshold} days limit)."
-        else: # If stock is sufficient and not critical, we don't add to alerts list
-            continue
-
 
-        # Only add to alerts list if it matches one of our alert conditions
-        if alert_category != "Standard Alert":
-            if 'last_updated' in item and isinstance(item['last_updated'], datetime.datetime):
-                item['last_updated'] = item['last_updated'].strftime('%Y-%m-%d %H:%M:%S')
-            
-            alert_info = {
-                "product_id": product_id,
-                "store_id": store_id,
-                "current_stock": current_stock,
-                "daily_demand_sim": daily_demand_sim,
-                "min_replenish_time": min_replenish_time,
-                "days_remaining": round(days_remaining, 2),
-                "alert_category": alert_category,
-                "alert_reason": alert_reason,
-                "last_updated": item.get('last_updated')
-            }
-            critical_stock_items.append(alert_info)
+        if 'last_updated' in item and isinstance(item['last_updated'], datetime.datetime):
+            item['last_updated'] = item['last_updated'].strftime('%Y-%m-%d %H:%M:%S')
+
+        daily_demand_sim = item.get('daily_sales_simulation_base')
+        critical_stock_items.append({
+            "product_id": item.get('product_id'),
+            "store_id": item.get('store_id'),
+            "current_stock": current_stock,
+            "daily_demand_sim": daily_demand_sim if daily_demand_sim is not None else 1,
+            "min_replenish_time": min_replenish_time,
+            "days_remaining": round(days_remaining, 2),
+            "alert_category": alert_category,
+            "alert_reason": alert_reason,
+            "last_updated": item.get('last_updated')
+        })
 
-    # Sort the alerts by 'days_remaining' in ascending order
-    critical_stock_items.sort(key=lambda x: x['days_remaining'])
+    return critical_stock_items, next_cursor
 
+def get_low_stock_alerts_data(db, days_left_threshold, store_filter_id=None, category=None, limit=None, cursor=None):
+    """
+    Identifies and returns products across all stores that are projected to run out
+    within a specified number of `days_left`, based on their current stock and
+    simulated daily sales. Also incorporates 'min_replenish_time' for advanced alerts.
+    Results are sorted by 'days_remaining' in ascending order.
+    """
+    critical_stock_items, _ = get_low_stock_alerts_page(db, days_left_threshold, store_filter_id, category, limit, cursor)
     return critical_stock_items
 
 def get_overstocked_products_data(db, threshold_multiplier, days_for_demand, store_filter_id=None):
@@ -443,17 +621,23 @@ def get_overstocked_products_data(db, threshold_multiplier, days_for_demand, sto
     """
     overstocked_items = []
 
-    query_filter = {}
+    # stock > multiplier * (daily * days) is stock_cover_days > multiplier * days: an index range scan
+    query_filter = {'stock_cover_days': {'$gt': threshold_multiplier * days_for_demand}}
     if store_filter_id:
         query_filter['store_id'] = store_filter_id
 
-    # Fetch product names for a more descriptive alert
-    products_collection = db['products']
-    all_products_names = {}
-    for product_doc in products_collection.find({}):
-        all_products_names[product_doc['product_id']] = product_doc.get('name', 'Unknown Product')
+    with stage_timer('db_fetch'):
+        candidate_items = list(db.inventory.find(query_filter, {
+            'product_id': 1, 'store_id': 1, 'current_stock': 1, 'daily_sales_simulation_base': 1, 'last_updated': 1
+        }))
+
+        # Fetch product names for a more descriptive alert
+        candidate_products = get_catalog(db).get_products(list({item.get('product_id') for item in candidate_items}))
+        all_products_names = {
+            product_id: product_doc.get('name', 'Unknown Product') for product_id, product_doc in candidate_products.items()
+        }
 
-    for item in db.inventory.find(query_filter):
+    for item in candidate_items:
         product_id = item.get('product_id')
         store_id = item.get('store_id')
         current_stock = item.get('current_stock', 0)
@@ -491,10 +675,83 @@ def get_overstocked_products_data(db, threshold_multiplier, days_for_demand, sto
 
     return overstocked_items
 
-def get_demand_forecast_data_ml(db, ml_model, preprocessor, numerical_features, categorical_features, store_id, product_id, num_days=30, **kwargs):
+def _get_product_pricing(product_pricing, default_price=10.0, default_discount=0.0):
+    """
+    Returns the (price, discount) pair stored on a product document, falling back to the defaults.
+    """
+    price = default_price
+    discount = default_discount
+    if product_pricing.get('price') is not None:
+        price = float(product_pricing['price'])
+    if product_pricing.get('discount') is not None:
+        discount = float(product_pricing['discount'])
+    return price, discount
+
+def _resolve_forecast_pricing(product_details, catalog):
+    """
+    Returns the (price, discount, competitor_price) features of a product, shared by the single,
+    batch and planned forecasts. Fields missing on the product fall back to the averages of its
+    category (then the global ones) kept by the catalog cache, then to 10.0 / 0.0.
+    competitor_price is None when it should be derived from the price.
+    """
+    avg_price = 10.0
+    avg_discount = 0.0
+    competitor_price = None
+
+    try:
+        if product_details.get('competitor_price') is not None:
+            competitor_price = float(product_details['competitor_price'])
+        if product_details.get('price') is not None and product_details.get('discount') is not None:
+            avg_price, avg_discount = _get_product_pricing(product_details)
+        else:
+            category_pricing = catalog.pricing_defaults(product_details.get('category'))
+            avg_price, avg_discount = _get_product_pricing(
+                product_details,
+                category_pricing['price'] if category_pricing['price'] is not None else avg_price,
+                category_pricing['discount'] if category_pricing['discount'] is not None else avg_discount
+            )
+            if competitor_price is None and product_details.get('price') is None:
+                competitor_price = category_pricing['competitor_price']
+    except Exception as e:
+        print(f"Warning: Could not robustly calculate price/discount for product {product_details.get('product_id')}: {e}. Using defaults.")
+
+    return avg_price, avg_discount, competitor_price
+
+def _build_forecast_series_row(store_id, product_id, inventory_record, product_details, store_details, avg_price, avg_discount, competitor_price=None, **kwargs):
+    """
+    Builds the static model features of one (store, product) series for the forecasting engine.
+    'What-if' kwargs override the defaults derived from the stored documents; the competitor
+    price defaults to 95% of the price unless `competitor_price` is given.
+    """
+    last_units_sold = inventory_record.get('last_sold_quantity', 0)
+    last_inventory_level = inventory_record.get('current_stock', 0)
+
+    units_ordered_future = 0
+    competitor_pricing_default = competitor_price if competitor_price is not None else avg_price * 0.95
+
+    # Use kwargs for 'what-if' values, or fall back to defaults
+    return {
+        'Store ID': store_id,
+        'Product ID': product_id,
+        'Category': product_details.get('category', 'Unknown'),
+        'Region': store_details.get('region', 'Unknown'),
+        'Inventory Level': last_inventory_level,
+        'Units Ordered': units_ordered_future,
+        'Price': kwargs.get('future_price', avg_price),
+        'Discount': kwargs.get('future_discount', avg_discount),
+        'Weather Condition': kwargs.get('future_weather', "Clear"), # Default to clear
+        'Holiday/Promotion': kwargs.get('future_holiday', "No"),
+        'Competitor Pricing': kwargs.get('future_competitor_pricing', competitor_pricing_default),
+        'Units Sold Lag1': last_units_sold,
+        'Inventory Level Lag1': last_inventory_level
+    }
+
+def get_demand_forecast_data_ml(db, ml_model, preprocessor, numerical_features, categorical_features, store_id, product_id, num_days=30, model_version=None, **kwargs):
     """
     Generates a demand forecast for a specific product at a given store for future days
     using the loaded machine learning model and preprocessor. Allows for 'what-if' scenario inputs.
+    Results are served from the in-process forecast cache when possible; the documents are
+    read on every call, so a cached forecast is only reused while its inputs are unchanged.
 
     Args:
         db: MongoDB database instance.
@@ -505,11 +762,43 @@ def get_demand_forecast_data_ml(db, ml_model, preprocessor, numerical_features,
         store_id (str): The ID of the store for which to forecast.
         product_id (str): The ID of the product for which to forecast.
         num_days (int): Number of future days to forecast.
+        model_version (str, optional): Version of the model (cache key; a swapped-in model never
+            serves forecasts cached for the previous one). Defaults to the identity of `ml_model`.
         **kwargs: Optional 'what-if' parameters (e.g., 'future_discount', 'future_holiday').
     """
     if ml_model is None or preprocessor is None:
         raise ValueError("ML model or preprocessor not loaded in the backend.")
 
+    with stage_timer('db_fetch'):
+        inventory_record, product_details, store_details, avg_price, avg_discount, competitor_price = _fetch_forecast_documents(db, store_id, product_id)
+
+    with stage_timer('feature_build'):
+        series_row = _build_forecast_series_row(
+            store_id, product_id, inventory_record, product_details, store_details,
+            avg_price, avg_discount, competitor_price=competitor_price, **kwargs
+        )
+
+    def compute(horizon):
+        return _compute_demand_forecast_data_ml(
+            ml_model, preprocessor, numerical_features, categorical_features,
+            store_id, product_id, series_row, horizon
+        )
+
+    model_token = model_version if model_version is not None else id(ml_model)
+    # The series row holds every stored value the forecast depends on, so a write made by
+    # another process (stock, product or store change) yields a new key instead of a stale hit
+    inputs_token = tuple(series_row.items())
+    return FORECAST_CACHE.get_or_compute(store_id, product_id, num_days, model_token, kwargs, compute, inputs_token=inputs_token)
+
+def _fetch_forecast_documents(db, store_id, product_id):
+    """
+    Reads the inventory, product and store documents of a single-SKU forecast and the
+    price/discount/competitor price defaults. Raises ValueError if one of the documents is missing.
+
+    Returns:
+        tuple: (inventory_record, product_details, store_details, avg_price, avg_discount, competitor_price),
+        competitor_price being None when it should be derived from the price.
+    """
     inventory_record = db.inventory.find_one(
         {'store_id': store_id, 'product_id': product_id},
         sort=[('last_updated', pymongo.DESCENDING)]
@@ -517,175 +806,225 @@ def get_demand_forecast_data_ml(db, ml_model, preprocessor, numerical_features,
     if not inventory_record:
         raise ValueError(f"Inventory record not found for Product ID: {product_id} at Store ID: {store_id}.")
     
-    product_details = db.products.find_one({'product_id': product_id})
+    catalog = get_catalog(db)
+    product_details = catalog.get_product(product_id)
     if not product_details:
         raise ValueError(f"Product details not found for Product ID: {product_id}.")
 
-    store_details = db.stores.find_one({'store_id': store_id})
+    store_details = catalog.get_store(store_id)
     if not store_details:
         raise ValueError(f"Store details not found for Store ID: {store_id}.")
 
-    last_units_sold = inventory_record.get('last_sold_quantity', 0)
-    last_inventory_level = inventory_record.get('current_stock', 0)
-    
-    avg_price = 10.0
-    avg_discount = 0.0
+    avg_price, avg_discount, competitor_price = _resolve_forecast_pricing(product_details, catalog)
 
-    try:
-        product_pricing = db.products.find_one(
-            {"product_id": product_id},
-            {"price": 1, "discount": 1, "_id": 0}
-        )
-        if product_pricing:
-            if product_pricing.get('price') is not None:
-                avg_price = float(product_pricing['price'])
-            if product_pricing.get('discount') is not None:
-                avg_discount = float(product_pricing['discount'])
-        else: 
-            try:
-                avg_price_doc = db.products.aggregate([{"$group": {"_id": None, "avg_price": {"$avg": "$price"}}}]).next()
-                if avg_price_doc and avg_price_doc.get('avg_price') is not None:
-                    avg_price = float(avg_price_doc['avg_price'])
-            except StopIteration:
-                pass
-            
-            try:
-                avg_discount_doc = db.products.aggregate([{"$group": {"_id": None, "avg_discount": {"$avg": "$discount"}}}]).next()
-                if avg_discount_doc and avg_discount_doc.get('avg_discount') is not None:
-                    avg_discount = float(avg_discount_doc['avg_discount'])
-            except StopIteration:
-                pass
-    except Exception as e:
-        print(f"Warning: Could not robustly calculate price/discount for product {product_id}: {e}. Using defaults.")
+    return inventory_record, product_details, store_details, avg_price, avg_discount, competitor_price
 
-    units_ordered_future = 0 
-    competitor_pricing_default = avg_price * 0.95 
-    
-    forecast_data = []
+def _compute_demand_forecast_data_ml(ml_model, preprocessor, numerical_features, categorical_features, store_id, product_id, series_row, num_days=30):
+    """
+    Computes the forecast served by get_demand_forecast_data_ml from its series row, bypassing the cache.
+    """
     current_date = datetime.date.today()
+    daily_demand = forecast_series_lockstep(
+        ml_model, preprocessor, numerical_features, categorical_features,
+        [series_row], num_days, start_date=current_date
+    )[0]
 
-    # Use kwargs for 'what-if' values, or fall back to defaults
-    future_discount_override = kwargs.get('future_discount', avg_discount)
-    future_holiday_override = kwargs.get('future_holiday', "No")
-    future_weather_override = kwargs.get('future_weather', "Clear") # Default to clear
-    future_price_override = kwargs.get('future_price', avg_price)
-    future_competitor_pricing_override = kwargs.get('future_competitor_pricing', competitor_pricing_default)
-
-
-    for i in range(num_days):
+    forecast_data = []
+    for i, predicted_demand in enumerate(daily_demand):
         forecast_date = current_date + datetime.timedelta(days=i)
-        
-        # Apply overrides from what-if scenarios, otherwise use defaults
-        weather_condition = future_weather_override
-        holiday_promotion = future_holiday_override
-        price_for_forecast = future_price_override
-        discount_for_forecast = future_discount_override
-        competitor_pricing_for_forecast = future_competitor_pricing_override
-
-        month = forecast_date.month
-        seasonality = "Spring" if 3 <= month <= 5 else \
-                      "Summer" if 6 <= month <= 8 else \
-                      "Autumn" if 9 <= month <= 11 else \
-                      "Winter" 
-        
-        future_data_row_dict = {
-            'Date': forecast_date, 
-            'Store ID': store_id,
-            'Product ID': product_id,
-            'Category': product_details.get('category', 'Unknown'),
-            'Region': store_details.get('region', 'Unknown'),
-            'Inventory Level': last_inventory_level,
-            'Units Ordered': units_ordered_future,
-            'Price': price_for_forecast,
-            'Discount': discount_for_forecast,
-            'Weather Condition': weather_condition,
-            'Holiday/Promotion': holiday_promotion,
-            'Competitor Pricing': competitor_pricing_for_forecast,
-            'Seasonality': seasonality,
-            'Units Sold Lag1': last_units_sold, 
-            'Inventory Level Lag1': last_inventory_level 
-        }
-
-        future_data_df = pd.DataFrame([future_data_row_dict])
-        future_data_df['Date'] = pd.to_datetime(future_data_df['Date'])
-        
-        future_data_df['Year'] = future_data_df['Date'].dt.year
-        future_data_df['Month'] = future_data_df['Date'].dt.month
-        future_data_df['Day'] = future_data_df['Date'].dt.day
-        future_data_df['DayOfWeek'] = future_data_df['Date'].dt.dayofweek
-        future_data_df['WeekOfYear'] = future_data_df['Date'].dt.isocalendar().week.astype(int)
-
-        all_expected_features_for_df = numerical_features + categorical_features
-
-        X_forecast_input = pd.DataFrame(columns=all_expected_features_for_df)
-        for col in all_expected_features_for_df:
-            if col in future_data_df.columns:
-                X_forecast_input[col] = future_data_df[col]
-            else:
-                if col in numerical_features:
-                    X_forecast_input[col] = 0.0 
-                elif col in categorical_features:
-                    X_forecast_input[col] = 'Unknown'
-                else:
-                    X_forecast_input[col] = 'NaN' 
-
-        X_forecast_processed = preprocessor.transform(X_forecast_input)
-
-        predicted_demand = ml_model.predict(X_forecast_processed)[0]
-        predicted_demand = max(0, round(predicted_demand)) 
-
         forecast_data.append({
             "date": forecast_date.isoformat(),
             "predicted_demand": predicted_demand,
             "store_id": store_id,
             "product_id": product_id
         })
-        
-        last_units_sold = predicted_demand 
 
     return forecast_data
 
 
-def get_reorder_recommendation(db, ml_model, preprocessor, numerical_features, categorical_features, store_id, product_id):
+FORECAST_BATCH_CHUNK_SIZE = 500 # Series advanced together per lockstep engine run
+
+def _is_newer_inventory_record(candidate, current):
     """
-    Calculates reorder recommendations (quantity, order date, delivery date)
-    based on current stock, product lead time, and forecasted demand.
+    Mirrors the `sort=[('last_updated', DESCENDING)]` tie-break of the single forecast lookup.
     """
-    inventory_record = db.inventory.find_one(
-        {'store_id': store_id, 'product_id': product_id}
-    )
-    if not inventory_record:
-        raise ValueError(f"Inventory record not found for Product ID: {product_id} at Store ID: {store_id}.")
-    
-    product_details = db.products.find_one({'product_id': product_id})
-    if not product_details:
-        raise ValueError(f"Product details not found for Product ID: {product_id}.")
+    candidate_ts = candidate.get('last_updated')
+    current_ts = current.get('last_updated')
+    if current_ts is None:
+        return candidate_ts is not None
+    if candidate_ts is None:
+        return False
+    try:
+        return candidate_ts > current_ts
+    except TypeError:
+        return False
 
-    current_stock = inventory_record.get('current_stock', 0)
-    # Default replenishment time to 7 days if not found in product details
-    min_replenish_time = product_details.get('min_replenish_time', 7) 
-    
-    # Define safety stock days (e.g., 7 days of forecasted demand)
-    SAFETY_STOCK_DAYS = 7 
-    # Define target inventory days (e.g., maintain 30 days of stock after replenishment)
-    TARGET_INVENTORY_DAYS = 30
+def prepare_forecast_batch(db, pairs=None, store_id=None, region=None):
+    """
+    Resolves a fleet forecast selection into the documents the forecasting engine needs.
+    Inventory documents are fetched with one query; products and stores come from the catalog cache.
+
+    Args:
+        db: MongoDB database instance.
+        pairs (list[dict], optional): Explicit list of {'store_id', 'product_id'} selections.
+        store_id (str, optional): Select every inventory item of this store.
+        region (str, optional): Select every inventory item of the stores in this region.
+
+    Returns:
+        tuple: (entries, errors). `entries` is a list of
+        (store_id, product_id, inventory_record, product_details, store_details, pricing) tuples
+        (pricing as returned by _resolve_forecast_pricing) and
+        `errors` lists the selections that could not be resolved, in request order.
+    """
+    catalog = get_catalog(db)
+    if pairs:
+        requested = list(dict.fromkeys((str(p['store_id']), str(p['product_id'])) for p in pairs))
+        store_ids = sorted({s for s, _ in requested})
+        product_ids = sorted({p for _, p in requested})
+        all_stores = catalog.get_stores(store_ids)
+        inventory_filter = {'store_id': {'$in': store_ids}, 'product_id': {'$in': product_ids}}
+    elif store_id:
+        requested = None
+        all_stores = catalog.get_stores([store_id])
+        inventory_filter = {'store_id': store_id}
+    elif region:
+        requested = None
+        all_stores = catalog.stores_in_region(region)
+        inventory_filter = None
+    else:
+        raise ValueError("Provide 'pairs', 'store_id' or 'region' to select the series to forecast.")
+
+    if inventory_filter is None:
+        inventory_filter = {'store_id': {'$in': list(all_stores.keys())}}
+
+    latest_inventory = {}
+    for item in db.inventory.find(inventory_filter):
+        key = (item.get('store_id'), item.get('product_id'))
+        if key not in latest_inventory or _is_newer_inventory_record(item, latest_inventory[key]):
+            latest_inventory[key] = item
+
+    if requested is None:
+        requested = list(latest_inventory.keys())
+        product_ids = sorted({p for _, p in requested})
+
+    all_products = catalog.get_products(product_ids)
+
+    entries = []
+    errors = []
+    for series_store_id, series_product_id in requested:
+        inventory_record = latest_inventory.get((series_store_id, series_product_id))
+        product_details = all_products.get(series_product_id)
+        store_details = all_stores.get(series_store_id)
+
+        error = None
+        if not inventory_record:
+            error = f"Inventory record not found for Product ID: {series_product_id} at Store ID: {series_store_id}."
+        elif not product_details:
+            error = f"Product details not found for Product ID: {series_product_id}."
+        elif not store_details:
+            error = f"Store details not found for Store ID: {series_store_id}."
+
+        if error:
+            errors.append({"store_id": series_store_id, "product_id": series_product_id, "error": error})
+        else:
+            pricing = _resolve_forecast_pricing(product_details, catalog)
+            entries.append((series_store_id, series_product_id, inventory_record, product_details, store_details, pricing))
+
+    return entries, errors
+
+def iter_demand_forecast_batch_ml(ml_model, preprocessor, numerical_features, categorical_features, entries, num_days=30, chunk_size=FORECAST_BATCH_CHUNK_SIZE, **kwargs):
+    """
+    Forecasts every entry returned by prepare_forecast_batch, yielding one result per series.
+    Entries are forecast `chunk_size` at a time through the lockstep engine, so results can be
+    streamed to the client while later chunks are still being computed.
+    The same 'what-if' kwargs are applied to every series.
+    """
+    if ml_model is None or preprocessor is None:
+        raise ValueError("ML model or preprocessor not loaded in the backend.")
+
+    current_date = datetime.date.today()
+    forecast_dates = [(current_date + datetime.timedelta(days=i)).isoformat() for i in range(num_days)]
+
+    for i in range(0, len(entries), chunk_size):
+        chunk = entries[i:i + chunk_size]
+
+        series_rows = []
+        for store_id, product_id, inventory_record, product_details, store_details, (avg_price, avg_discount, competitor_price) in chunk:
+            series_rows.append(_build_forecast_series_row(
+                store_id, product_id, inventory_record, product_details, store_details,
+                avg_price, avg_discount, competitor_price=competitor_price, **kwargs
+            ))
+
+        daily_demand_per_series = forecast_series_lockstep(
+            ml_model, preprocessor, numerical_features, categorical_features,
+            series_rows, num_days, start_date=current_date
+        )
+
+        for (store_id, product_id, _, _, _, _), daily_demand in zip(chunk, daily_demand_per_series):
+            yield {
+                "store_id": store_id,
+                "product_id": product_id,
+                "forecast": [
+                    {"date": forecast_date, "predicted_demand": predicted_demand}
+                    for forecast_date, predicted_demand in zip(forecast_dates, daily_demand)
+                ]
+            }
 
-    # 1. Get demand forecast for lead time + safety stock days
+def get_demand_forecast_batch_ml(db, ml_model, preprocessor, numerical_features, categorical_features, pairs=None, store_id=None, region=None, num_days=30, **kwargs):
+    """
+    Generates demand forecasts for a whole selection of (store, product) series in one call.
+    See prepare_forecast_batch for the selection arguments.
+
+    Returns:
+        dict: {'forecasts': [...], 'errors': [...]}
+    """
+    entries, errors = prepare_forecast_batch(db, pairs=pairs, store_id=store_id, region=region)
+    forecasts = list(iter_demand_forecast_batch_ml(
+        ml_model, preprocessor, numerical_features, categorical_features,
+        entries, num_days=num_days, **kwargs
+    ))
+    return {"forecasts": forecasts, "errors": errors}
+
+
+# Define safety stock days (e.g., 7 days of forecasted demand)
+SAFETY_STOCK_DAYS = 7
+# Define target inventory days (e.g., maintain 30 days of stock after replenishment)
+TARGET_INVENTORY_DAYS = 30
+
+# Precomputed plans older than this are ignored and recomputed live
+REORDER_PLAN_MAX_AGE_HOURS = float(os.getenv('REORDER_PLAN_MAX_AGE_HOURS', '24'))
+
+def get_reorder_forecast_days(min_replenish_time):
+    """
+    Returns (lead_time_and_safety_days, total_days): the number of forecast days needed to cover
+    lead time + safety stock, and the single forecast horizon that covers every reorder calculation.
+    """
     # We need forecast for `min_replenish_time + SAFETY_STOCK_DAYS` days to calculate total demand until reorder point
-    # We'll use the ML-driven forecast.
     total_forecast_days_needed = min_replenish_time + SAFETY_STOCK_DAYS
-    
+
     # Ensure num_days is at least 1 for forecast function
     if total_forecast_days_needed <= 0:
-        total_forecast_days_needed = 1 
+        total_forecast_days_needed = 1
+
+    return total_forecast_days_needed, max(total_forecast_days_needed, TARGET_INVENTORY_DAYS)
+
+def compute_reorder_recommendation(store_id, product_id, inventory_record, product_details, daily_demand, order_date=None):
+    """
+    Calculates a reorder recommendation from an already computed daily demand forecast.
+    `daily_demand` must cover at least the horizon returned by get_reorder_forecast_days; since the
+    forecast is recursive and deterministic, its prefixes are the shorter forecasts the calculation uses.
+    """
+    current_stock = inventory_record.get('current_stock', 0)
+    # Default replenishment time to 7 days if not found in product details
+    min_replenish_time = product_details.get('min_replenish_time', 7)
+
+    total_forecast_days_needed, _ = get_reorder_forecast_days(min_replenish_time)
+
+    # 1. Demand forecast for lead time + safety stock days
+    forecast_for_lead_time_and_safety = daily_demand[:total_forecast_days_needed]
 
-    forecast_for_lead_time_and_safety = get_demand_forecast_data_ml(
-        db, ml_model, preprocessor, numerical_features, categorical_features, 
-        store_id, product_id, num_days=total_forecast_days_needed
-    )
-    
     # Calculate total forecasted demand over the period
-    total_forecasted_demand = sum([f['predicted_demand'] for f in forecast_for_lead_time_and_safety])
+    total_forecasted_demand = sum(forecast_for_lead_time_and_safety)
 
     # Calculate average daily forecasted demand over the period for safety stock calculation
     average_daily_forecasted_demand = total_forecasted_demand / total_forecast_days_needed if total_forecast_days_needed > 0 else inventory_record.get('daily_sales_simulation_base', 1)
@@ -695,16 +1034,12 @@ def get_reorder_recommendation(db, ml_model, preprocessor, numerical_features, c
 
     # Calculate Reorder Point: Demand during lead time + Safety Stock
     # For demand during lead time, use forecast specifically for lead time days
-    demand_during_lead_time = sum([f['predicted_demand'] for f in forecast_for_lead_time_and_safety[:min_replenish_time]])
+    demand_during_lead_time = sum(forecast_for_lead_time_and_safety[:min_replenish_time])
     reorder_point = max(0, round(demand_during_lead_time + safety_stock_units)) # Ensure non-negative
 
     # Suggested Order Quantity: Quantity to bring stock up to TARGET_INVENTORY_DAYS + Safety Stock
     # Calculate total demand for target inventory days
-    forecast_for_target_inventory = get_demand_forecast_data_ml(
-        db, ml_model, preprocessor, numerical_features, categorical_features, 
-        store_id, product_id, num_days=TARGET_INVENTORY_DAYS
-    )
-    total_forecasted_demand_target = sum([f['predicted_demand'] for f in forecast_for_target_inventory])
+    total_forecasted_demand_target = sum(daily_demand[:TARGET_INVENTORY_DAYS])
 
     target_inventory_level = total_forecasted_demand_target + safety_stock_units
     
@@ -715,7 +1050,8 @@ def get_reorder_recommendation(db, ml_model, preprocessor, numerical_features, c
         suggested_order_quantity = 0
 
     # Calculate Order Date and Delivery Date
-    order_date = datetime.date.today()
+    if order_date is None:
+        order_date = datetime.date.today()
     delivery_date = order_date + datetime.timedelta(days=min_replenish_time)
 
     # Determine if a reorder is currently needed
@@ -736,3 +1072,66 @@ def get_reorder_recommendation(db, ml_model, preprocessor, numerical_features, c
         "notes": "Recommendation based on ML demand forecast, lead time, and safety stock. Adjust parameters as needed."
     }
 
+def get_reorder_recommendation(db, ml_model, preprocessor, numerical_features, categorical_features, store_id, product_id, model_version=None):
+    """
+    Calculates reorder recommendations (quantity, order date, delivery date)
+    based on current stock, product lead time, and forecasted demand.
+    """
+    with stage_timer('db_fetch'):
+        inventory_record = db.inventory.find_one(
+            {'store_id': store_id, 'product_id': product_id}
+        )
+        product_details = get_catalog(db).get_product(product_id) if inventory_record else None
+    if not inventory_record:
+        raise ValueError(f"Inventory record not found for Product ID: {product_id} at Store ID: {store_id}.")
+    
+    if not product_details:
+        raise ValueError(f"Product details not found for Product ID: {product_id}.")
+
+    # A single ML forecast to the longest horizon covers both lead time + safety stock and target inventory days
+    _, forecast_days = get_reorder_forecast_days(product_details.get('min_replenish_time', 7))
+    forecast = get_demand_forecast_data_ml(
+        db, ml_model, preprocessor, numerical_features, categorical_features, 
+        store_id, product_id, num_days=forecast_days, model_version=model_version
+    )
+    daily_demand = [f['predicted_demand'] for f in forecast]
+
+    return compute_reorder_recommendation(store_id, product_id, inventory_record, product_details, daily_demand)
+
+def get_reorder_plan(db, store_id, product_id, max_age_hours=REORDER_PLAN_MAX_AGE_HOURS, model_version=None):
+    """
+    Returns the precomputed reorder recommendation written by the reorder planning job,
+    or None if there is no plan for this item or it is stale: planned on an earlier day or
+    older than `max_age_hours`, computed from an inventory document that has changed since
+    (a sale, receipt or batch updated its stock), or by another model than `model_version`.
+    """
+    plan = db.reorder_plans.find_one({'store_id': store_id, 'product_id': product_id})
+    if not plan:
+        return None
+
+    generated_at = plan.get('generated_at')
+    if plan.get('plan_date') != datetime.date.today().isoformat() or not isinstance(generated_at, datetime.datetime):
+        return None
+    if datetime.datetime.now() - generated_at > datetime.timedelta(hours=max_age_hours):
+        return None
+    if model_version is not None and plan.get('model_version') != model_version:
+        return None
+
+    inventory_record = db.inventory.find_one(
+        {'store_id': store_id, 'product_id': product_id},
+        {'current_stock': 1, 'last_updated': 1, '_id': 0}
+    )
+    if (
+        inventory_record is None
+        or 'inventory_last_updated' not in plan # Plans written before the snapshot was stored
+        or inventory_record.get('current_stock') != plan.get('inventory_current_stock')
+        or inventory_record.get('last_updated') != plan['inventory_last_updated']
+    ):
+        return None
+
+    recommendation = dict(plan['recommendation'])
+    recommendation['plan_run_id'] = plan.get('run_id')
+    recommendation['plan_generated_at'] = generated_at.strftime('%Y-%m-%d %H:%M:%S')
+    if plan.get('model_version'):
+        recommendation['model_version'] = plan['model_version']
+    return recommendation
@@ -0,0 +1,247 @@
+# backend/services/model_registry.py
+import datetime
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from model_loader import MODELS_DIR, bundle_fingerprint, load_model_bundle
+from services.feature_encoder import compile_feature_encoder, release_compiled_encoder
+from services.forecast_engine import forecast_series_lockstep
+from services.tree_inference import DEFAULT_INFERENCE_BACKEND, select_inference_backend
+
+# Encode forecast features without pandas/ColumnTransformer on the serving path
+COMPILED_FEATURE_ENCODER_ENABLED = os.getenv('COMPILED_FEATURE_ENCODER', 'true').lower() in ('1', 'true', 'yes')
+# 'background' serves requests while the model loads; 'sync' loads it before the app is returned
+# (set by gunicorn.conf.py with preload_app, so the model is loaded once in the master)
+MODEL_LOAD_MODE = os.getenv('MODEL_LOAD_MODE', 'background')
+# Poll ml_models/ for a retrained bundle every N seconds and hot-swap it (0 disables the watcher)
+MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv('MODEL_WATCH_INTERVAL_SECONDS', '0'))
+SMOKE_BATCH_SERIES = 16
+SMOKE_BATCH_DAYS = 7
+
+
+class ModelVersion:
+    """
+    One loaded model bundle. Never mutated after construction: a request takes the current
+    version once and uses it to the end, so a swap does not affect forecasts already running.
+    """
+
+    def __init__(self, bundle, ml_model):
+        self.version = bundle['model_version']
+        self.model_filename = bundle['model_filename']
+        self.ml_model = ml_model
+        self.preprocessor = bundle['preprocessor']
+        self.numerical_features = list(bundle['numerical_features'])
+        self.categorical_features = list(bundle['categorical_features'])
+        self.loaded_at = datetime.datetime.now()
+
+    def forecast_args(self):
+        """
+        The (ml_model, preprocessor, numerical_features, categorical_features) arguments of the forecast functions.
+        """
+        return self.ml_model, self.preprocessor, self.numerical_features, self.categorical_features
+
+
+def _smoke_series_rows(model_version, num_series=SMOKE_BATCH_SERIES, seed=0):
+    """
+    Synthetic series covering the categories the preprocessor was fitted on.
+    """
+    rng = np.random.default_rng(seed)
+    categories = {}
+    for name, transformer, columns in getattr(model_version.preprocessor, 'transformers_', []):
+        for col, values in zip(columns, getattr(transformer, 'categories_', [])):
+            categories[col] = list(values)
+
+    rows = []
+    for i in range(num_series):
+        row = {}
+        for col in model_version.numerical_features:
+            row[col] = float(rng.integers(0, 200))
+        for col in model_version.categorical_features:
+            values = categories.get(col)
+            row[col] = values[i % len(values)] if values else 'Unknown'
+        rows.append(row)
+    return rows
+
+
+def validate_model_version(model_version):
+    """
+    Runs a smoke batch through the new version before it is served: the raw predictions must be
+    finite, one per row, and the recursive lockstep forecast must run end to end.
+    Raises ValueError describing the first failed check.
+    """
+    series_rows = _smoke_series_rows(model_version)
+    frame = pd.DataFrame(series_rows).reindex(columns=model_version.numerical_features + model_version.categorical_features)
+    predictions = np.asarray(model_version.ml_model.predict(model_version.preprocessor.transform(frame)), dtype=np.float64)
+    if predictions.shape != (len(series_rows),):
+        raise ValueError(f"Smoke batch returned {predictions.shape} predictions for {len(series_rows)} rows.")
+    if not np.all(np.isfinite(predictions)):
+        raise ValueError("Smoke batch returned non-finite predictions.")
+
+    forecasts = forecast_series_lockstep(*model_version.forecast_args(), series_rows, SMOKE_BATCH_DAYS)
+    if len(forecasts) != len(series_rows) or any(len(f) != SMOKE_BATCH_DAYS for f in forecasts):
+        raise ValueError("Smoke batch forecast has the wrong shape.")
+
+
+class ModelRegistry:
+    """
+    Holds the model version served by this process and replaces it without downtime.
+
+    A new bundle is loaded next to the current one, validated on a smoke batch and then
+    published with a single reference assignment; until then (and if it fails) the current
+    version keeps serving. Loads are serialized, and a load of the bundle already served is
+    skipped.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, inference_backend=DEFAULT_INFERENCE_BACKEND):
+        self.models_dir = models_dir
+        self.inference_backend = inference_backend
+        self._current = None
+        self._load_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._loaded_fingerprint = None
+        self._rejected_fingerprint = None # Not retried by the watcher until the files change again
+        self.state = 'not_loaded' # not_loaded -> loading -> ready / failed / no_model
+        self.last_error = None
+        self.last_attempt_at = None
+        self.swaps = 0
+        self._watcher = None
+
+    def current(self):
+        """
+        The ModelVersion to serve, or None while no model has been loaded.
+        """
+        return self._current
+
+    def is_ready(self):
+        return self._current is not None
+
+    def load(self, force=False):
+        """
+        Loads, validates and publishes the bundle in the models directory.
+
+        Args:
+            force (bool): Reload even if the files on disk have not changed.
+
+        Returns:
+            dict: The registry status after the attempt.
+        """
+        with self._load_lock:
+            fingerprint = bundle_fingerprint(self.models_dir)
+            if not force and self._current is not None and fingerprint == self._loaded_fingerprint:
+                return self.status()
+
+            self.last_attempt_at = datetime.datetime.now()
+            if self._current is None:
+                self.state = 'loading'
+            started = time.perf_counter()
+            try:
+                bundle = load_model_bundle(self.models_dir)
+                if bundle is None:
+                    if self._current is None:
+                        self.state = 'no_model'
+                    self.last_error = "No best model file found in ml_models directory."
+                    print(f"{self.last_error} Forecasting and Reorder APIs will not function.")
+                    return self.status()
+
+                if self._current is not None and bundle['model_version'] == self._current.version:
+                    self._loaded_fingerprint = fingerprint # Files touched, contents unchanged
+                    return self.status()
+
+                candidate = ModelVersion(bundle, select_inference_backend(bundle['model'], self.inference_backend))
+                if COMPILED_FEATURE_ENCODER_ENABLED and compile_feature_encoder(candidate.preprocessor, candidate.numerical_features, candidate.categorical_features):
+                    print("Compiled feature encoder verified against the preprocessor and enabled.")
+                try:
+                    validate_model_version(candidate)
+                except Exception:
+                    release_compiled_encoder(candidate.preprocessor)
+                    raise
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._rejected_fingerprint = fingerprint
+                if self._current is None:
+                    self.state = 'failed'
+                    print(f"Error loading ML model components: {e}. Forecasting and Reorder APIs will not function.")
+                else:
+                    print(f"New model bundle rejected, still serving version {self._current.version}: {e}")
+                return self.status()
+
+            previous = self._current
+            self._current = candidate # Atomic swap: new requests get the new version from here on
+            self._loaded_fingerprint = fingerprint
+            self.state = 'ready'
+            self.last_error = None
+            if previous is not None:
+                self.swaps += 1
+                # In-flight forecasts keep their own reference; they fall back to preprocessor.transform
+                release_compiled_encoder(previous.preprocessor)
+                print(f"ML model swapped from version {previous.version} to {candidate.version} ({candidate.model_filename}).")
+            else:
+                print(f"ML model ({candidate.model_filename}, version {candidate.version}), Preprocessor, and Feature lists loaded in {time.perf_counter() - started:.1f}s.")
+            return self.status()
+
+    def ensure_loading(self):
+        """
+        Starts loading the bundle on a daemon thread unless a version is served or a load was
+        already started in this process. Requests that need the model get a 503 until it is
+        ready; everything else is served immediately.
+        """
+        if self._current is not None or self.state != 'not_loaded':
+            return
+        with self._start_lock:
+            if self.state != 'not_loaded':
+                return
+            self.state = 'loading'
+            threading.Thread(target=self.load, name='model-loader', daemon=True).start()
+
+    def start_watcher(self, interval_seconds=MODEL_WATCH_INTERVAL_SECONDS):
+        """
+        Polls the models directory and hot-swaps a changed bundle. Runs in every serving
+        process (an admin reload only reaches the worker that handled it). No-op if disabled.
+        """
+        if interval_seconds <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    fingerprint = bundle_fingerprint(self.models_dir)
+                    if fingerprint is not None and fingerprint not in (self._loaded_fingerprint, self._rejected_fingerprint):
+                        self.load()
+                except Exception as e:
+                    print(f"Model watcher error: {e}")
+
+        self._watcher = threading.Thread(target=watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def reset_after_fork(self):
+        # Threads do not survive fork(); the loaded version itself stays shared copy-on-write
+        self._load_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._watcher = None
+        if self._current is None and self.state == 'loading':
+            self.state = 'not_loaded' # The parent's loader thread is gone; load again in this process
+
+    def status(self):
+        current = self._current
+        return {
+            "ready": current is not None,
+            "state": self.state,
+            "model_version": current.version if current else None,
+            "model_filename": current.model_filename if current else None,
+            "loaded_at": current.loaded_at.strftime('%Y-%m-%d %H:%M:%S') if current else None,
+            "swaps": self.swaps,
+            "last_attempt_at": self.last_attempt_at.strftime('%Y-%m-%d %H:%M:%S') if self.last_attempt_at else None,
+            "last_error": self.last_error
+        }
+
+
+# The model served by this process
+MODEL_REGISTRY = ModelRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=MODEL_REGISTRY.reset_after_fork)
@@ -0,0 +1,102 @@
+# backend/services/query_plans.py
+from pymongo.errors import OperationFailure
+
+from services.inventory_service import _low_stock_candidates_filter, _sale_update
+
+# Placeholder values for databases without data; real IDs are used when available
+SAMPLE_STORE_ID = 'S001'
+SAMPLE_PRODUCT_ID = 'P0001'
+
+
+def _hot_path_queries(db):
+    """
+    The queries of the request path and batch jobs, as
+    (name, collection, explain command body) in the shape of the service code.
+    Product and store reads are served by the catalog cache and not listed.
+    """
+    sample = db.inventory.find_one({}, {'store_id': 1, 'product_id': 1}) or {}
+    store_id = sample.get('store_id', SAMPLE_STORE_ID)
+    product_id = sample.get('product_id', SAMPLE_PRODUCT_ID)
+    sku = {'store_id': store_id, 'product_id': product_id}
+
+    def find(collection, query_filter, sort=None, limit=None):
+        command = {'find': collection, 'filter': query_filter}
+        if sort:
+            command['sort'] = sort
+        if limit:
+            command['limit'] = limit
+        return command
+
+    return [
+        ('get_inventory_item', 'inventory', find('inventory', sku, limit=1)),
+        ('record_sale_transaction', 'inventory', {
+            'findAndModify': 'inventory', 'query': dict(sku, current_stock={'$gte': 1}), 'update': _sale_update(1, None)
+        }),
+        ('forecast inventory lookup', 'inventory', find('inventory', sku, sort={'last_updated': -1}, limit=1)),
+        ('sales netting read', 'inventory', find('inventory', {'store_id': {'$in': [store_id]}, 'product_id': {'$in': [product_id]}})),
+        ('low stock alerts', 'inventory', find('inventory', _low_stock_candidates_filter(7, 20), sort={'stock_cover_days': 1})),
+        ('low stock alerts (store)', 'inventory', find('inventory', _low_stock_candidates_filter(7, 20, store_filter_id=store_id), sort={'stock_cover_days': 1})),
+        ('overstocked alerts', 'inventory', find('inventory', {'stock_cover_days': {'$gt': 60}})),
+        ('overstocked alerts (store)', 'inventory', find('inventory', {'stock_cover_days': {'$gt': 60}, 'store_id': store_id})),
+        ('batch forecast inventory by store', 'inventory', find('inventory', {'store_id': {'$in': [store_id]}})),
+        ('reorder plan lookup', 'reorder_plans', find('reorder_plans', sku, limit=1)),
+        ('unfinished ingest jobs', 'ingest_jobs', find('ingest_jobs', {'status': {'$in': ['queued', 'running']}})),
+    ]
+
+
+def _winning_plan_stages(explain):
+    """
+    Yields every stage name of the winning plans found anywhere in an explain output
+    (find, findAndModify and each $cursor stage of an aggregation).
+    """
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == 'winningPlan':
+                yield from _plan_stages(value)
+            else:
+                yield from _winning_plan_stages(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from _winning_plan_stages(value)
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+def check_query_plans(db):
+    """
+    Runs every hot-path query under explain (queryPlanner verbosity) and reports the ones whose
+    winning plan contains a COLLSCAN. Needs the INDEX_SPECS indexes (ensure_indexes).
+
+    Returns:
+        list[dict]: One entry per query with its plan stages and whether it passed.
+    """
+    report = []
+    for name, collection_name, command in _hot_path_queries(db):
+        if collection_name not in db.list_collection_names():
+            # Explaining a query on a missing collection always yields an EOF plan
+            report.append({'query': name, 'collection': collection_name, 'stages': [], 'passed': False, 'error': 'collection does not exist'})
+            continue
+        try:
+            explain = db.command('explain', command, verbosity='queryPlanner')
+        except OperationFailure as e:
+            report.append({'query': name, 'collection': collection_name, 'stages': [], 'passed': False, 'error': str(e)})
+            continue
+        stages = list(dict.fromkeys(_winning_plan_stages(explain)))
+        report.append({'query': name, 'collection': collection_name, 'stages': stages, 'passed': 'COLLSCAN' not in stages})
+
+    for entry in report:
+        status = 'OK  ' if entry['passed'] else 'FAIL'
+        detail = entry.get('error') or ' > '.join(entry['stages'])
+        print(f"{status} {entry['query']:<36} {entry['collection']:<14} {detail}")
+    failed = [entry for entry in report if not entry['passed']]
+    print(f"\n{len(report) - len(failed)} of {len(report)} hot-path queries use an index.")
+    return report
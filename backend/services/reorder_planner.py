@@ -0,0 +1,213 @@
+# backend/services/reorder_planner.py
+import datetime
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pymongo
+
+from model_loader import MODELS_DIR, load_model_bundle
+from services.feature_encoder import compile_feature_encoder
+from services.catalog_cache import get_catalog
+from services.indexes import ensure_indexes
+from services.forecast_engine import forecast_series_lockstep
+from services.tree_inference import select_inference_backend
+from services.inventory_service import (
+    _build_forecast_series_row,
+    _resolve_forecast_pricing,
+    compute_reorder_recommendation,
+    get_reorder_forecast_days
+)
+
+REORDER_PLANS_COLLECTION = 'reorder_plans'
+
+# Number of SKUs forecast together by a worker; SKUs in a chunk share the same horizon
+DEFAULT_PLANNING_CHUNK_SIZE = 500
+PLAN_WRITE_BATCH_SIZE = 1000
+
+INVENTORY_PROJECTION = {
+    'store_id': 1, 'product_id': 1, 'current_stock': 1, 'last_sold_quantity': 1,
+    'last_updated': 1, 'daily_sales_simulation_base': 1
+}
+
+# Model bundle loaded once per worker process by _init_planning_worker
+_WORKER_BUNDLE = None
+
+def _init_planning_worker(models_dir):
+    """
+    Process pool initializer: loads the forecast model into the worker process.
+    """
+    global _WORKER_BUNDLE
+    _WORKER_BUNDLE = load_model_bundle(models_dir)
+    if _WORKER_BUNDLE:
+        _WORKER_BUNDLE['model'] = select_inference_backend(_WORKER_BUNDLE['model'])
+        compile_feature_encoder(
+            _WORKER_BUNDLE['preprocessor'],
+            _WORKER_BUNDLE['numerical_features'],
+            _WORKER_BUNDLE['categorical_features']
+        )
+
+def _plan_chunk(entries, forecast_days, order_date):
+    """
+    Computes reorder recommendations for a chunk of SKUs that share the same forecast horizon.
+    Runs in a worker process; all SKUs of the chunk are forecast together by the lockstep engine.
+
+    Returns:
+        tuple: (recommendations, errors, model_version); each recommendation is paired with
+        the inventory snapshot (current_stock, last_updated) it was computed from.
+    """
+    if _WORKER_BUNDLE is None:
+        raise ValueError("ML model or preprocessor not loaded in the planning worker.")
+
+    series_rows = []
+    for store_id, product_id, inventory_record, product_details, store_details, (avg_price, avg_discount, competitor_price) in entries:
+        series_rows.append(_build_forecast_series_row(
+            store_id, product_id, inventory_record, product_details, store_details,
+            avg_price, avg_discount, competitor_price=competitor_price
+        ))
+
+    daily_demand_per_series = forecast_series_lockstep(
+        _WORKER_BUNDLE['model'],
+        _WORKER_BUNDLE['preprocessor'],
+        _WORKER_BUNDLE['numerical_features'],
+        _WORKER_BUNDLE['categorical_features'],
+        series_rows, forecast_days, start_date=order_date
+    )
+
+    recommendations = []
+    errors = []
+    for (store_id, product_id, inventory_record, product_details, _, _), daily_demand in zip(entries, daily_demand_per_series):
+        try:
+            recommendation = compute_reorder_recommendation(
+                store_id, product_id, inventory_record, product_details, daily_demand, order_date=order_date
+            )
+            snapshot = {'current_stock': inventory_record.get('current_stock'), 'last_updated': inventory_record.get('last_updated')}
+            recommendations.append((recommendation, snapshot))
+        except Exception as e:
+            errors.append({"store_id": store_id, "product_id": product_id, "error": str(e)})
+    return recommendations, errors, _WORKER_BUNDLE['model_version']
+
+def ensure_reorder_plan_indexes(db):
+    """
+    Creates the index used by /inventory/reorder_recommendation to read a plan in a single lookup.
+    """
+    ensure_indexes(db, [REORDER_PLANS_COLLECTION])
+
+def _write_plans(db, recommendations, run_id, generated_at, plan_date, model_version=None):
+    """
+    Upserts one plan document per SKU, replacing the plan of any previous run. Each plan keeps
+    the inventory snapshot it was computed from, so get_reorder_plan can tell when stock moved since.
+    """
+    for i in range(0, len(recommendations), PLAN_WRITE_BATCH_SIZE):
+        batch = recommendations[i:i + PLAN_WRITE_BATCH_SIZE]
+        db[REORDER_PLANS_COLLECTION].bulk_write([
+            pymongo.ReplaceOne(
+                {'store_id': rec['store_id'], 'product_id': rec['product_id']},
+                {
+                    'store_id': rec['store_id'],
+                    'product_id': rec['product_id'],
+                    'run_id': run_id,
+                    'generated_at': generated_at,
+                    'plan_date': plan_date,
+                    'model_version': model_version,
+                    'inventory_current_stock': snapshot['current_stock'],
+                    'inventory_last_updated': snapshot['last_updated'],
+                    'recommendation': rec
+                },
+                upsert=True
+            ) for rec, snapshot in batch
+        ], ordered=False)
+
+def run_reorder_planning(db, models_dir=MODELS_DIR, processes=None, chunk_size=DEFAULT_PLANNING_CHUNK_SIZE):
+    """
+    Computes reorder recommendations for every inventory document and materializes them in the
+    `reorder_plans` collection, tagged with a run id and timestamp.
+
+    Each SKU is forecast once, to the longest horizon get_reorder_forecast_days needs for it.
+    SKUs are grouped by horizon into chunks that are forecast in lockstep by a pool of worker
+    processes, so the work is spread across CPU cores.
+
+    Args:
+        db: MongoDB database instance.
+        models_dir (str): Directory holding the saved model artifacts.
+        processes (int, optional): Worker processes (default: number of CPUs).
+        chunk_size (int): SKUs forecast together per worker task.
+
+    Returns:
+        dict: Summary of the run.
+    """
+    processes = processes or os.cpu_count() or 1
+    run_id = uuid.uuid4().hex
+    order_date = datetime.date.today()
+    started = time.perf_counter()
+
+    print(f"Starting reorder planning run {run_id} with {processes} worker processes...")
+    ensure_reorder_plan_indexes(db)
+
+    catalog = get_catalog(db)
+    all_products = catalog.all_products()
+    all_stores = catalog.all_stores()
+
+    planned = 0
+    errors = []
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_planning_worker, initargs=(models_dir,)) as executor:
+        pending = set()
+        buckets = {} # forecast horizon -> entries waiting to fill a chunk
+
+        def collect(done_futures):
+            nonlocal planned
+            for future in done_futures:
+                recommendations, chunk_errors, model_version = future.result()
+                _write_plans(db, recommendations, run_id, datetime.datetime.now(), order_date.isoformat(), model_version)
+                planned += len(recommendations)
+                errors.extend(chunk_errors)
+
+        def submit(forecast_days, entries):
+            # Bound the number of chunks held in memory while workers are busy
+            while len(pending) >= processes * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                pending.difference_update(done)
+                collect(done)
+            pending.add(executor.submit(_plan_chunk, entries, forecast_days, order_date))
+
+        for inventory_record in db.inventory.find({}, INVENTORY_PROJECTION):
+            store_id = inventory_record.get('store_id')
+            product_id = inventory_record.get('product_id')
+            product_details = all_products.get(product_id)
+            store_details = all_stores.get(store_id)
+            if not product_details:
+                errors.append({"store_id": store_id, "product_id": product_id, "error": f"Product details not found for Product ID: {product_id}."})
+                continue
+            if not store_details:
+                errors.append({"store_id": store_id, "product_id": product_id, "error": f"Store details not found for Store ID: {store_id}."})
+                continue
+
+            _, forecast_days = get_reorder_forecast_days(product_details.get('min_replenish_time', 7))
+            bucket = buckets.setdefault(forecast_days, [])
+            # Pricing defaults are resolved here: the catalog statistics live in this process
+            pricing = _resolve_forecast_pricing(product_details, catalog)
+            bucket.append((store_id, product_id, inventory_record, product_details, store_details, pricing))
+            if len(bucket) >= chunk_size:
+                submit(forecast_days, buckets.pop(forecast_days))
+
+        for forecast_days, entries in buckets.items():
+            submit(forecast_days, entries)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            pending.difference_update(done)
+            collect(done)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "run_id": run_id,
+        "plan_date": order_date.isoformat(),
+        "planned": planned,
+        "failed": len(errors),
+        "errors": errors[:100],
+        "elapsed_seconds": round(elapsed, 2)
+    }
+    print(f"Reorder planning run {run_id} complete: {planned} plans written, {len(errors)} failures in {elapsed:.1f}s.")
+    return summary
@@ -0,0 +1,213 @@
+# backend/services/tree_inference.py
+import os
+import numpy as np
+from scipy import sparse
+
+# 'native' calls the model's own predict(); 'compiled' uses CompiledTreeModel when it verifies
+DEFAULT_INFERENCE_BACKEND = os.getenv('ML_INFERENCE_BACKEND', 'native').lower()
+# Batches up to this many rows go to the compiled model, larger ones to the native predict(),
+# which is faster past a few dozen rows (see benchmarks/inference_latency.py)
+COMPILED_MAX_BATCH_ROWS = int(os.getenv('ML_COMPILED_MAX_BATCH_ROWS', '32'))
+
+# LightGBM missing value handling (see LightGBM's tree.h, NumericalDecision)
+MISSING_NONE = 0
+MISSING_ZERO = 1
+MISSING_NAN = 2
+MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+K_ZERO_THRESHOLD = 1e-35
+
+IDENTITY_OBJECTIVES = ('regression', 'regression_l1', 'huber', 'fair', 'quantile', 'mape')
+EXP_OBJECTIVES = ('poisson', 'gamma', 'tweedie')
+
+
+class CompiledTreeModel:
+    """
+    Flat NumPy export of a LightGBM regressor for low-latency prediction on small batches.
+
+    Every node of every tree is stored in parallel arrays (split feature, threshold,
+    children, default direction, missing type, leaf value). All (row, tree) pairs walk
+    together in vectorized steps, and pairs drop out as soon as they reach a leaf. Tree
+    outputs are summed in tree order, like LightGBM, so predictions match bit for bit.
+    It beats LightGBM's predict() only on small batches; see SmallBatchTreeModel.
+    """
+
+    def __init__(self, model_dump, n_features):
+        objective = (model_dump.get('objective') or 'regression').split()[0]
+        if objective in IDENTITY_OBJECTIVES:
+            self._output_transform = None
+        elif objective in EXP_OBJECTIVES:
+            self._output_transform = np.exp
+        else:
+            raise ValueError(f"Objective '{objective}' is not supported by the compiled backend.")
+        if model_dump.get('num_class', 1) != 1:
+            raise ValueError("Multi-class models are not supported by the compiled backend.")
+
+        self.n_features = n_features
+        self.average_output = bool(model_dump.get('average_output', False))
+
+        feature, threshold, left, right, default_left, missing_type, value = [], [], [], [], [], [], []
+        roots = []
+        max_depth = 0
+
+        def add_node(node, depth):
+            nonlocal max_depth
+            node_id = len(feature)
+            feature.append(0)
+            threshold.append(0.0)
+            left.append(node_id)
+            right.append(node_id)
+            default_left.append(False)
+            missing_type.append(MISSING_NONE)
+            value.append(0.0)
+
+            if 'leaf_value' in node or 'split_feature' not in node:
+                if 'leaf_coeff' in node:
+                    raise ValueError("Linear trees are not supported by the compiled backend.")
+                value[node_id] = float(node.get('leaf_value', 0.0))
+                max_depth = max(max_depth, depth)
+                return node_id
+
+            if node.get('decision_type', '<=') != '<=':
+                raise ValueError("Categorical splits are not supported by the compiled backend.")
+            feature[node_id] = int(node['split_feature'])
+            threshold[node_id] = float(node['threshold'])
+            default_left[node_id] = bool(node.get('default_left', True))
+            missing_type[node_id] = MISSING_TYPES[node.get('missing_type', 'None')]
+            left[node_id] = add_node(node['left_child'], depth + 1)
+            right[node_id] = add_node(node['right_child'], depth + 1)
+            return node_id
+
+        for tree in model_dump['tree_info']:
+            roots.append(add_node(tree['tree_structure'], 0))
+
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.missing_type = np.asarray(missing_type, dtype=np.int8)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.is_leaf = self.left == np.arange(len(self.left))
+        self.max_depth = max_depth
+        self.num_trees = len(roots)
+
+    @classmethod
+    def from_lightgbm(cls, model):
+        """
+        Builds the compiled model from a fitted `lightgbm.LGBMRegressor` or `lightgbm.Booster`.
+        """
+        booster = getattr(model, 'booster_', model)
+        if not hasattr(booster, 'dump_model'):
+            raise ValueError(f"{type(model).__name__} is not a LightGBM model.")
+        # dump_model(), like predict(), uses the best iteration when early stopping recorded one
+        return cls(booster.dump_model(), booster.num_feature())
+
+    def predict(self, X):
+        """
+        Predicts a batch of already preprocessed rows (dense array or scipy sparse matrix).
+        """
+        X = X.toarray() if sparse.issparse(X) else np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}.")
+
+        num_rows = X.shape[0]
+        # One (row, tree) pair per flat slot; only pairs that have not reached a leaf are walked
+        nodes = np.tile(self.roots, num_rows)
+        pair_rows = np.repeat(np.arange(num_rows), self.num_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+
+        while active.size:
+            active_nodes = nodes[active]
+            fval = X[pair_rows[active], self.feature[active_nodes]]
+            node_missing_type = self.missing_type[active_nodes]
+
+            is_nan = np.isnan(fval)
+            fval = np.where(is_nan & (node_missing_type != MISSING_NAN), 0.0, fval)
+            is_missing = ((node_missing_type == MISSING_ZERO) & (np.abs(fval) <= K_ZERO_THRESHOLD)) | \
+                         ((node_missing_type == MISSING_NAN) & is_nan)
+
+            go_left = np.where(is_missing, self.default_left[active_nodes], fval <= self.threshold[active_nodes])
+            active_nodes = np.where(go_left, self.left[active_nodes], self.right[active_nodes])
+            nodes[active] = active_nodes
+            active = active[~self.is_leaf[active_nodes]]
+
+        leaf_values = self.value[nodes].reshape(num_rows, self.num_trees)
+        # Accumulate tree by tree (not a pairwise np.sum) to reproduce LightGBM's rounding
+        output = np.zeros(num_rows, dtype=np.float64)
+        for tree in range(self.num_trees):
+            output += leaf_values[:, tree]
+
+        if self.average_output and self.num_trees:
+            output /= self.num_trees
+        if self._output_transform is not None:
+            output = self._output_transform(output)
+        return output
+
+    def smoke_batch(self, num_rows=256, seed=0):
+        """
+        Random rows whose values sit on, around and away from the split thresholds,
+        with zeros and NaNs mixed in, to exercise every branch of the traversal.
+        """
+        rng = np.random.default_rng(seed)
+        X = rng.normal(0.0, 50.0, (num_rows, self.n_features))
+        split_nodes = self.left != np.arange(len(self.left))
+        thresholds_by_feature = {}
+        for f, t in zip(self.feature[split_nodes], self.threshold[split_nodes]):
+            thresholds_by_feature.setdefault(int(f), []).append(t)
+        for f, thresholds in thresholds_by_feature.items():
+            picks = rng.choice(np.asarray(thresholds), num_rows)
+            X[:, f] = picks + rng.choice([-1e-9, 0.0, 0.0, 1e-9, -1.0, 1.0], num_rows)
+        X[rng.random(X.shape) < 0.3] = 0.0
+        X[rng.random(X.shape) < 0.02] = np.nan
+        return X
+
+
+class SmallBatchTreeModel:
+    """
+    Routes each predict() call by batch size: up to `max_rows` rows to the compiled model,
+    larger batches to the native model.
+    """
+
+    def __init__(self, model, compiled_model, max_rows=COMPILED_MAX_BATCH_ROWS):
+        self.model = model
+        self.compiled_model = compiled_model
+        self.max_rows = max_rows
+
+    def predict(self, X):
+        if X.shape[0] <= self.max_rows:
+            return self.compiled_model.predict(X)
+        return self.model.predict(X)
+
+
+def verify_compiled_model(compiled_model, model, num_rows=256):
+    """
+    Checks that the compiled model reproduces `model.predict` exactly on a smoke batch.
+    """
+    X = compiled_model.smoke_batch(num_rows)
+    expected = np.asarray(model.predict(X), dtype=np.float64)
+    return np.array_equal(expected, compiled_model.predict(X), equal_nan=True) and \
+        np.array_equal(np.asarray(model.predict(sparse.csr_matrix(np.nan_to_num(X))), dtype=np.float64),
+                       compiled_model.predict(sparse.csr_matrix(np.nan_to_num(X))))
+
+
+def select_inference_backend(model, backend=DEFAULT_INFERENCE_BACKEND):
+    """
+    Returns the object the forecasting code should call predict() on.
+    With backend 'compiled', LightGBM models are exported to a CompiledTreeModel that is
+    only used if it passes the parity check, and then only for batches of up to
+    COMPILED_MAX_BATCH_ROWS rows; anything else keeps the native model.
+    """
+    if backend != 'compiled':
+        return model
+    try:
+        compiled_model = CompiledTreeModel.from_lightgbm(model)
+        if not verify_compiled_model(compiled_model, model):
+            print("Compiled tree model does not match model.predict. Using the native model.")
+            return model
+    except Exception as e:
+        print(f"Could not compile the tree model: {e}. Using the native model.")
+        return model
+    print(f"Compiled tree inference enabled for batches of up to {COMPILED_MAX_BATCH_ROWS} rows "
+          f"({compiled_model.num_trees} trees, max depth {compiled_model.max_depth}).")
+    return SmallBatchTreeModel(model, compiled_model)
@@ -0,0 +1,58 @@
+# backend/tests/conftest.py
+import os
+import sys
+import warnings
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR) # Backend modules are imported as top-level modules
+
+
+@pytest.fixture(scope='session')
+def model_bundle():
+    """
+    The model bundle shipped in ml_models/ (skips the test when it is not there).
+    """
+    from model_loader import MODELS_DIR, load_model_bundle
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore') # Artifacts pickled with another scikit-learn version
+        bundle = load_model_bundle(MODELS_DIR)
+    if not bundle:
+        pytest.skip("No model bundle in ml_models/.")
+    return bundle
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "mongodb: needs a real MongoDB server (set MONGO_TEST_URI), skipped otherwise")
+
+
+@pytest.fixture
+def live_mongo_db():
+    """
+    A scratch database on the MongoDB server of MONGO_TEST_URI, dropped afterwards.
+    Tests relying on server features mongomock lacks (explain, change streams) use it.
+    """
+    uri = os.getenv('MONGO_TEST_URI')
+    if not uri:
+        pytest.skip("MONGO_TEST_URI is not set.")
+    import pymongo
+    client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=5000)
+    db = client['inventory_query_plan_test']
+    client.drop_database(db.name)
+    yield db
+    client.drop_database(db.name)
+    client.close()
+
+
+@pytest.fixture
+def mongo_db():
+    """
+    An empty in-memory database (mongomock) with a catalog cache of its own.
+    """
+    mongomock = pytest.importorskip('mongomock')
+    from services.catalog_cache import invalidate_catalog
+    db = mongomock.MongoClient().inventory_test
+    yield db
+    invalidate_catalog(db)
@@ -0,0 +1,20 @@
+# backend/tests/test_batch_validation.py
+import io
+
+from services.batch_validation import read_batch_csv, validate_batch_frame
+
+
+def test_quantities_are_truncated_like_int():
+    csv = b"store_id,product_id,quantity\nS001,P0001,2.5\nS001,P0002,0.5\nS001,P0003,abc\nS001,P0004,\nS001,P0005,-3\nS001,P0006,7\nS001,P0007,inf\n"
+    valid, errors = validate_batch_frame(read_batch_csv(io.BytesIO(csv)))
+
+    assert valid['row'].tolist() == [1, 6]
+    assert valid['product_id'].astype(str).tolist() == ['P0001', 'P0006']
+    assert valid['quantity'].tolist() == [2, 7]
+    assert [(e['row'], e['error']) for e in errors] == [
+        (2, "Quantity must be positive."),
+        (3, "Invalid quantity format."),
+        (4, "Invalid quantity format."),
+        (5, "Quantity must be positive."),
+        (7, "Invalid quantity format.")
+    ]
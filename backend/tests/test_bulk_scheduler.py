@@ -0,0 +1,32 @@
+# backend/tests/test_bulk_scheduler.py
+from types import SimpleNamespace
+
+from pymongo.errors import BulkWriteError
+
+import services.bulk_scheduler as bulk_scheduler
+from services.bulk_scheduler import BulkWriteScheduler
+
+
+class _PushbackOnceCollection:
+    """Rejects the first bulk_write of store S001 with a rate-limit error, accepts everything else."""
+
+    def __init__(self):
+        self.pushed_back = False
+
+    def bulk_write(self, requests, ordered=True):
+        if requests[0] == 'S001' and not self.pushed_back:
+            self.pushed_back = True
+            raise BulkWriteError({'writeErrors': [{'index': 0, 'code': 16500, 'errmsg': 'Request rate is large'}]})
+        return SimpleNamespace(bulk_api_result={'nMatched': len(requests), 'nModified': len(requests), 'nUpserted': 0})
+
+
+def test_partition_backs_off_without_holding_its_in_flight_slot(monkeypatch):
+    scheduler = BulkWriteScheduler(_PushbackOnceCollection(), max_workers=2)
+    in_flight_while_sleeping = []
+    monkeypatch.setattr(bulk_scheduler.time, 'sleep', lambda seconds: in_flight_while_sleeping.append(scheduler._in_flight))
+
+    outcomes, stats = scheduler.run([{'request': 'S001', 'partition': 'S001', 'index': 1}])
+
+    assert outcomes == {1: {'status': 'applied'}}
+    assert in_flight_while_sleeping == [0]
+    assert stats['retries'] == 1
@@ -0,0 +1,74 @@
+# backend/tests/test_catalog_cache.py
+import services.catalog_cache as catalog_cache
+
+
+def _seed(db):
+    db.products.insert_many([
+        {'product_id': 'P0001', 'category': 'Toys', 'price': 12.0, 'min_replenish_time': 4},
+        {'product_id': 'P0002', 'category': 'Toys', 'price': '18.0', 'discount': 10, 'min_replenish_time': 9}
+    ])
+    db.stores.insert_many([{'store_id': 'S001', 'region': 'North'}, {'store_id': 'S002', 'region': 'South'}])
+
+
+def test_cached_catalog_serves_lookups_from_memory(mongo_db):
+    _seed(mongo_db)
+    catalog = catalog_cache.get_catalog(mongo_db)
+    assert catalog.get_product('P0002')['discount'] == 10
+    mongo_db.products.delete_many({})
+    mongo_db.stores.delete_many({})
+
+    assert catalog.get_product('P0001')['price'] == 12.0
+    assert set(catalog.stores_in_region('North')) == {'S001'}
+    assert catalog.longest_min_replenish_time() == 9
+    assert catalog.pricing_defaults('Toys') == {'price': 15.0, 'discount': 10.0, 'competitor_price': None}
+
+
+def test_uncached_catalog_issues_point_queries(mongo_db, monkeypatch):
+    _seed(mongo_db)
+    monkeypatch.setattr(catalog_cache, 'CATALOG_CACHE_ENABLED', False)
+    catalog = catalog_cache._UncachedCatalog(mongo_db)
+    full_reads = []
+    monkeypatch.setattr(catalog_cache.CatalogCache, 'warm', lambda self: full_reads.append(self) or (0, 0))
+
+    assert catalog.get_product('P0001')['category'] == 'Toys'
+    assert catalog.get_store('S002')['region'] == 'South'
+    assert set(catalog.get_products(['P0001', 'P0003'])) == {'P0001'}
+    assert set(catalog.stores_in_region('South')) == {'S002'}
+    assert catalog.longest_min_replenish_time() == 9
+    assert full_reads == []
+
+    mongo_db.products.update_one({'product_id': 'P0001'}, {'$set': {'price': 30.0}})
+    assert catalog.get_product('P0001')['price'] == 30.0 # Nothing is cached
+
+
+def test_catalog_without_watcher_reloads_after_ttl(mongo_db, monkeypatch):
+    _seed(mongo_db)
+    monkeypatch.setattr(catalog_cache, 'CATALOG_CACHE_TTL_SECONDS', 60)
+    catalog = catalog_cache.get_catalog(mongo_db)
+    assert catalog.get_product('P0001')['price'] == 12.0
+    mongo_db.products.update_one({'product_id': 'P0001'}, {'$set': {'price': 30.0}})
+    assert catalog.get_product('P0001')['price'] == 12.0 # Within the TTL
+
+    catalog.loaded_at -= 60
+    version = catalog.version
+    assert catalog.get_product('P0001')['price'] == 30.0
+    assert catalog.version > version and catalog.mode == 'reload_on_read'
+
+
+def test_derived_values_are_computed_from_a_consistent_snapshot(mongo_db, monkeypatch):
+    _seed(mongo_db)
+    catalog = catalog_cache.get_catalog(mongo_db)
+    catalog.warm()
+    version = catalog.version
+    group_by = catalog_cache._group_by
+
+    def group_while_watcher_applies(docs, field, id_field):
+        # The watcher thread applies a change while the derived value is being computed
+        catalog._apply('stores', 'store_id', 'S003', {'store_id': 'S003', 'region': 'North'})
+        return group_by(docs, field, id_field)
+
+    monkeypatch.setattr(catalog_cache, '_group_by', group_while_watcher_applies)
+    assert set(catalog.stores_in_region('North')) == {'S001'} # Snapshot taken before the change
+    assert catalog.version == version + 1
+    monkeypatch.setattr(catalog_cache, '_group_by', group_by)
+    assert set(catalog.stores_in_region('North')) == {'S001', 'S003'} # Not cached under the new version
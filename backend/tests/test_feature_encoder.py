@@ -0,0 +1,94 @@
+# backend/tests/test_feature_encoder.py
+import datetime
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from services.feature_encoder import (
+    CALENDAR_FEATURES,
+    CompiledFeatureEncoder,
+    compile_feature_encoder,
+    get_calendar_features,
+    release_compiled_encoder
+)
+from services.forecast_engine import forecast_series_lockstep
+
+
+@pytest.fixture(scope='module')
+def encoder(model_bundle):
+    return CompiledFeatureEncoder(model_bundle['preprocessor'], model_bundle['numerical_features'], model_bundle['categorical_features'])
+
+
+def _dense(matrix):
+    return matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix)
+
+
+def _transform(model_bundle, columns, num_rows):
+    all_features = model_bundle['numerical_features'] + model_bundle['categorical_features']
+    frame = pd.DataFrame(columns, index=range(num_rows)).reindex(columns=all_features)
+    return model_bundle['preprocessor'].transform(frame)
+
+
+def test_compiles_for_shipped_preprocessor(model_bundle):
+    preprocessor = model_bundle['preprocessor']
+    compiled = compile_feature_encoder(preprocessor, model_bundle['numerical_features'], model_bundle['categorical_features'])
+    release_compiled_encoder(preprocessor)
+    assert compiled is not None
+
+
+def test_encode_matches_preprocessor_transform(model_bundle, encoder):
+    num_rows = 200
+    columns = encoder.smoke_columns(num_rows)
+    expected = _transform(model_bundle, columns, num_rows)
+    actual = encoder.encode(columns, num_rows)
+    assert sparse.issparse(actual) == sparse.issparse(expected)
+    assert np.array_equal(_dense(actual), _dense(expected))
+
+
+def test_calendar_lookup_matches_preprocessor_transform(model_bundle, encoder):
+    num_rows = 32
+    columns = {k: v for k, v in encoder.smoke_columns(num_rows).items() if k not in CALENDAR_FEATURES}
+    for offset in range(0, 400, 37):
+        forecast_date = datetime.date(2025, 1, 1) + datetime.timedelta(days=offset)
+        expected = _transform(model_bundle, dict(columns, **get_calendar_features(forecast_date)), num_rows)
+        actual = encoder.encode(columns, num_rows, forecast_date=forecast_date)
+        assert np.array_equal(_dense(actual), _dense(expected))
+
+
+def test_forecasts_match_pandas_path(model_bundle):
+    preprocessor = model_bundle['preprocessor']
+    args = (model_bundle['model'], preprocessor, model_bundle['numerical_features'], model_bundle['categorical_features'])
+    series_rows = [
+        {
+            'Store ID': f"S00{i % 5 + 1}", 'Product ID': f"P000{i % 9 + 1}", 'Category': ['Toys', 'Groceries', 'Unknown'][i % 3],
+            'Region': 'North', 'Inventory Level': 50 + i, 'Units Ordered': 0, 'Price': 10.0 + i, 'Discount': 5.0,
+            'Weather Condition': 'Clear', 'Holiday/Promotion': 'No', 'Competitor Pricing': 9.5 + i,
+            'Units Sold Lag1': i * 3, 'Inventory Level Lag1': 50 + i
+        }
+        for i in range(24)
+    ]
+    start_date = datetime.date(2025, 3, 1)
+
+    release_compiled_encoder(preprocessor)
+    expected = forecast_series_lockstep(*args, series_rows, 14, start_date=start_date)
+    assert compile_feature_encoder(preprocessor, model_bundle['numerical_features'], model_bundle['categorical_features']) is not None
+    try:
+        actual = forecast_series_lockstep(*args, series_rows, 14, start_date=start_date)
+    finally:
+        release_compiled_encoder(preprocessor)
+    assert actual == expected
+
+
+def test_released_encoder_is_garbage_collected(model_bundle):
+    preprocessor = model_bundle['preprocessor']
+    compiled = compile_feature_encoder(preprocessor, model_bundle['numerical_features'], model_bundle['categorical_features'])
+    compiled.encode(compiled.smoke_columns(4), 4, forecast_date=datetime.date(2025, 6, 1))
+    reference = weakref.ref(compiled)
+    release_compiled_encoder(preprocessor)
+    del compiled
+    gc.collect()
+    assert reference() is None
@@ -0,0 +1,57 @@
+# backend/tests/test_forecast_cache.py
+import datetime
+
+from services.forecast_cache import FORECAST_CACHE, ForecastCache
+from services.inventory_service import get_demand_forecast_data_ml
+
+
+def test_write_from_another_process_is_not_served_from_cache(mongo_db, model_bundle):
+    FORECAST_CACHE.clear()
+    mongo_db.products.insert_one({'product_id': 'P0001', 'category': 'Toys', 'price': 20.0, 'min_replenish_time': 5})
+    mongo_db.stores.insert_one({'store_id': 'S001', 'region': 'North'})
+    mongo_db.inventory.insert_one({
+        'store_id': 'S001', 'product_id': 'P0001', 'current_stock': 200, 'daily_sales_simulation_base': 6,
+        'last_sold_quantity': 9, 'last_updated': datetime.datetime(2025, 1, 1)
+    })
+    args = (model_bundle['model'], model_bundle['preprocessor'], model_bundle['numerical_features'], model_bundle['categorical_features'])
+
+    misses, hits = FORECAST_CACHE.misses, FORECAST_CACHE.hits
+
+    get_demand_forecast_data_ml(mongo_db, *args, 'S001', 'P0001', num_days=7, model_version='v1')
+    get_demand_forecast_data_ml(mongo_db, *args, 'S001', 'P0001', num_days=7, model_version='v1')
+    assert (FORECAST_CACHE.misses - misses, FORECAST_CACHE.hits - hits) == (1, 1)
+
+    # Written directly, as by another worker: this process's cache is not invalidated
+    mongo_db.inventory.update_one(
+        {'store_id': 'S001', 'product_id': 'P0001'},
+        {'$set': {'current_stock': 0, 'last_sold_quantity': 40, 'last_updated': datetime.datetime(2025, 1, 2)}}
+    )
+    get_demand_forecast_data_ml(mongo_db, *args, 'S001', 'P0001', num_days=7, model_version='v1')
+    assert FORECAST_CACHE.misses - misses == 2
+    FORECAST_CACHE.clear()
+
+
+def test_invalidation_keeps_no_per_sku_state():
+    cache = ForecastCache()
+    forecast = [{'day': 1}, {'day': 2}]
+    cache.get_or_compute('S001', 'P0001', 2, 'v1', {}, lambda num_days: forecast)
+    cache.invalidate_skus([('S001', f'P{i:04d}') for i in range(1000)])
+    assert cache.stats()['entries'] == 0
+    # Nothing is kept for the invalidated SKUs once they have no entries
+    assert all(not value for value in vars(cache).values() if isinstance(value, dict))
+
+
+def test_result_computed_across_an_invalidation_is_not_cached():
+    cache = ForecastCache()
+    calls = []
+
+    def compute(num_days):
+        calls.append(num_days)
+        if len(calls) == 1:
+            cache.invalidate_sku('S001', 'P0001') # A write lands while the forecast is computed
+        return [{'day': day} for day in range(num_days)]
+
+    assert len(cache.get_or_compute('S001', 'P0001', 3, 'v1', {}, compute)) == 3
+    cache.get_or_compute('S001', 'P0001', 3, 'v1', {}, compute)
+    assert calls == [3, 3]
+    assert cache._in_flight == {}
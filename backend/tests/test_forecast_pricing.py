@@ -0,0 +1,37 @@
+# backend/tests/test_forecast_pricing.py
+import datetime
+
+import pytest
+
+from services.forecast_cache import FORECAST_CACHE
+from services.inventory_service import get_demand_forecast_batch_ml, get_demand_forecast_data_ml
+
+
+@pytest.fixture
+def catalog_db(mongo_db):
+    FORECAST_CACHE.clear()
+    mongo_db.products.insert_many([
+        {'product_id': 'P0001', 'category': 'Toys', 'min_replenish_time': 5}, # No pricing: category averages
+        {'product_id': 'P0002', 'category': 'Toys', 'price': 40.0, 'discount': 10, 'competitor_price': 38.0, 'min_replenish_time': 7},
+        {'product_id': 'P0003', 'category': 'Groceries', 'price': 3.5, 'min_replenish_time': 3}
+    ])
+    mongo_db.stores.insert_one({'store_id': 'S001', 'region': 'North'})
+    mongo_db.inventory.insert_many([
+        {'store_id': 'S001', 'product_id': product_id, 'current_stock': 120, 'daily_sales_simulation_base': 6,
+         'last_sold_quantity': 9, 'last_updated': datetime.datetime(2025, 1, 1)}
+        for product_id in ('P0001', 'P0002', 'P0003')
+    ])
+    yield mongo_db
+    FORECAST_CACHE.clear()
+
+
+def test_batch_forecast_matches_single_forecast(catalog_db, model_bundle):
+    args = (model_bundle['model'], model_bundle['preprocessor'], model_bundle['numerical_features'], model_bundle['categorical_features'])
+    pairs = [{'store_id': 'S001', 'product_id': product_id} for product_id in ('P0001', 'P0002', 'P0003')]
+
+    batch = get_demand_forecast_batch_ml(catalog_db, *args, pairs=pairs, num_days=10)
+
+    assert batch['errors'] == []
+    for series in batch['forecasts']:
+        single = get_demand_forecast_data_ml(catalog_db, *args, series['store_id'], series['product_id'], num_days=10)
+        assert [row['predicted_demand'] for row in series['forecast']] == [row['predicted_demand'] for row in single]
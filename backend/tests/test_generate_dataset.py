@@ -0,0 +1,29 @@
+# backend/tests/test_generate_dataset.py
+import pandas as pd
+
+from data_prep import build_entity_tables
+from generate_dataset import OUTPUT_COLUMNS, generate_dataset
+
+
+def test_generated_dataset_round_trips_through_data_prep(tmp_path):
+    path = str(tmp_path / 'synthetic.csv.gz')
+    rows = generate_dataset(path, num_stores=2, num_products=3, num_days=4, seed=7, chunk_rows=5)
+    assert rows == 2 * 3 * 4
+
+    frame = pd.read_csv(path)
+    assert list(frame.columns) == OUTPUT_COLUMNS
+    assert (frame['Units Sold'] <= frame['Inventory Level']).all()
+
+    products, stores, inventory = build_entity_tables(path, chunk_rows=7)
+    assert sorted(products.index) == ['P0001', 'P0002', 'P0003']
+    assert sorted(stores.index) == ['S001', 'S002']
+    assert len(inventory) == 6
+    last_day = frame[frame['Date'] == frame['Date'].max()].set_index(['Store ID', 'Product ID'])
+    assert inventory['Inventory Level'].to_dict() == last_day['Inventory Level'].to_dict()
+
+
+def test_generated_dataset_is_deterministic_across_chunk_sizes(tmp_path):
+    first, second = str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')
+    generate_dataset(first, num_stores=2, num_products=3, num_days=3, seed=11, chunk_rows=4)
+    generate_dataset(second, num_stores=2, num_products=3, num_days=3, seed=11, chunk_rows=100)
+    pd.testing.assert_frame_equal(pd.read_csv(first), pd.read_csv(second))
@@ -0,0 +1,66 @@
+# backend/tests/test_low_stock_alerts.py
+import datetime
+
+import numpy as np
+import pytest
+
+import services.inventory_service as inventory_service
+from services.inventory_service import get_low_stock_alerts_data, get_low_stock_alerts_page
+
+
+@pytest.fixture
+def alerts_db(mongo_db):
+    rng = np.random.default_rng(3)
+    mongo_db.products.insert_many([
+        {'product_id': f"P{j:04d}", 'category': 'Toys', 'min_replenish_time': int(rng.integers(3, 21))}
+        for j in range(40)
+    ])
+    docs = []
+    for i in range(400):
+        daily = int(rng.integers(1, 8))
+        # Few distinct cover values, so many alerts tie on the rounded days
+        current_stock = int(rng.choice([0, 1, 2, 3, 5, 8, 13, 40, 200])) * daily // 2
+        docs.append({
+            'store_id': f"S{i % 4:03d}", 'product_id': f"P{i % 40:04d}", 'current_stock': current_stock,
+            'daily_sales_simulation_base': daily, 'stock_cover_days': current_stock / daily,
+            'last_updated': datetime.datetime(2025, 1, 1)
+        })
+    mongo_db.inventory.insert_many(docs)
+    return mongo_db
+
+
+def _walk_pages(db, limit, **filters):
+    alerts, cursor, pages = [], None, 0
+    while True:
+        page, cursor = get_low_stock_alerts_page(db, 7, limit=limit, cursor=cursor, **filters)
+        alerts.extend(page)
+        pages += 1
+        assert len(page) <= limit
+        if cursor is None:
+            return alerts, pages
+
+
+@pytest.mark.parametrize('filters', [{}, {'category': 'below_lead_time'}, {'store_filter_id': 'S002'}])
+def test_pages_match_the_full_list(alerts_db, filters):
+    expected = get_low_stock_alerts_data(alerts_db, 7, **filters)
+    paged, pages = _walk_pages(alerts_db, 17, **filters)
+    assert len(expected) > 17
+    assert paged == expected
+    assert pages == -(-len(expected) // 17)
+
+
+def test_first_page_stops_reading_early(alerts_db, monkeypatch):
+    categorised = []
+    original = inventory_service._categorise_low_stock
+
+    def counting_categorise(*args):
+        categorised.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(inventory_service, '_categorise_low_stock', counting_categorise)
+    get_low_stock_alerts_data(alerts_db, 7)
+    candidates = len(categorised)
+    categorised.clear()
+
+    get_low_stock_alerts_page(alerts_db, 7, limit=5)
+    assert 5 < len(categorised) < candidates / 4
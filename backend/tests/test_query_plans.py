@@ -0,0 +1,34 @@
+# backend/tests/test_query_plans.py
+import pytest
+
+from services.query_plans import _hot_path_queries, _winning_plan_stages, check_query_plans
+
+COLLSCAN_EXPLAIN = {
+    'queryPlanner': {'winningPlan': {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}}}
+}
+AGGREGATE_EXPLAIN = {
+    'stages': [{'$cursor': {'queryPlanner': {'winningPlan': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}}}}]
+}
+
+
+def test_winning_plan_stages_finds_collscan():
+    assert list(_winning_plan_stages(COLLSCAN_EXPLAIN)) == ['SORT', 'COLLSCAN']
+    assert list(_winning_plan_stages(AGGREGATE_EXPLAIN)) == ['FETCH', 'IXSCAN']
+
+
+@pytest.fixture
+def indexed_db(live_mongo_db):
+    from benchmarks.synthetic_db import build_synthetic_db
+    from services.indexes import ensure_indexes
+    build_synthetic_db(live_mongo_db, num_stores=3, num_products=50)
+    ensure_indexes(live_mongo_db)
+    live_mongo_db.ingest_jobs.insert_one({'_id': 'job', 'status': 'completed'})
+    return live_mongo_db
+
+
+@pytest.mark.mongodb
+def test_hot_path_queries_use_an_index(indexed_db):
+    report = check_query_plans(indexed_db)
+    assert len(report) == len(_hot_path_queries(indexed_db))
+    failures = {entry['query']: entry.get('error') or entry['stages'] for entry in report if not entry['passed']}
+    assert failures == {}
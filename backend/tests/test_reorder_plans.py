@@ -0,0 +1,49 @@
+# backend/tests/test_reorder_plans.py
+import datetime
+
+import pytest
+
+from services.inventory_service import get_reorder_plan
+
+LAST_UPDATED = datetime.datetime(2025, 1, 1, 12, 0)
+
+
+@pytest.fixture
+def planned_db(mongo_db):
+    mongo_db.inventory.insert_one({
+        'store_id': 'S001', 'product_id': 'P0001', 'current_stock': 40,
+        'daily_sales_simulation_base': 5, 'last_updated': LAST_UPDATED
+    })
+    # The document _write_plans upserts (mongomock does not support its bulk ReplaceOne)
+    mongo_db.reorder_plans.insert_one({
+        'store_id': 'S001',
+        'product_id': 'P0001',
+        'run_id': 'run-1',
+        'generated_at': datetime.datetime.now(),
+        'plan_date': datetime.date.today().isoformat(),
+        'model_version': 'v1',
+        'inventory_current_stock': 40,
+        'inventory_last_updated': LAST_UPDATED,
+        'recommendation': {'store_id': 'S001', 'product_id': 'P0001', 'current_stock': 40, 'suggested_order_quantity': 25}
+    })
+    return mongo_db
+
+
+def test_fresh_plan_is_served(planned_db):
+    plan = get_reorder_plan(planned_db, 'S001', 'P0001', model_version='v1')
+    assert plan['suggested_order_quantity'] == 25
+    assert plan['model_version'] == 'v1'
+
+
+def test_plan_is_stale_after_stock_change(planned_db):
+    planned_db.inventory.update_one(
+        {'store_id': 'S001', 'product_id': 'P0001'},
+        {'$set': {'current_stock': 39, 'last_updated': LAST_UPDATED + datetime.timedelta(minutes=5)}}
+    )
+    assert get_reorder_plan(planned_db, 'S001', 'P0001', model_version='v1') is None
+
+
+def test_plan_of_another_model_version_is_stale(planned_db):
+    assert get_reorder_plan(planned_db, 'S001', 'P0001', model_version='v2') is None
+    # Without a served model any version is accepted
+    assert get_reorder_plan(planned_db, 'S001', 'P0001') is not None
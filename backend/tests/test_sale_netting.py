@@ -0,0 +1,57 @@
+# backend/tests/test_sale_netting.py
+from collections import OrderedDict
+
+import pytest
+
+import services.inventory_service as inventory_service
+
+
+class _FailingSkuScheduler:
+    """
+    Stands in for BulkWriteScheduler (mongomock does not support pymongo's bulk UpdateOne):
+    every write is applied except the ones of FAILED_SKU.
+    """
+    FAILED_SKU = ('S001', 'P0002')
+
+    def __init__(self, collection):
+        self.matched_count = 0
+        self.runs = 0
+
+    def run(self, ops):
+        self.runs += 1
+        outcomes = {}
+        for op in ops:
+            if op['index'] == self.FAILED_SKU:
+                outcomes[op['index']] = {'status': 'failed', 'error': 'Write error'}
+            else:
+                outcomes[op['index']] = {'status': 'applied'}
+                self.matched_count += 1
+        stats = {'operations': len(ops), 'partitions': len({op['partition'] for op in ops}), 'batches': self.runs}
+        return outcomes, stats
+
+
+@pytest.fixture
+def fake_scheduler(monkeypatch):
+    monkeypatch.setattr(inventory_service, 'BulkWriteScheduler', _FailingSkuScheduler)
+
+
+def test_netting_does_not_mutate_callers_rows(mongo_db, fake_scheduler):
+    sku_rows = OrderedDict([
+        (('S001', 'P0001'), [(1, 2), (3, 1)]),
+        (('S001', 'P0002'), [(2, 4)]),
+        (('S002', 'P0001'), [(4, 1)])
+    ])
+    snapshot = OrderedDict((sku, list(rows)) for sku, rows in sku_rows.items())
+    # A failed write makes the netting read the documents back: the applied ones carry the batch id
+    mongo_db.inventory.insert_many([
+        {'store_id': store_id, 'product_id': product_id, 'current_stock': 10,
+         inventory_service.SALE_BATCH_IDS_FIELD: [] if (store_id, product_id) == _FailingSkuScheduler.FAILED_SKU else ['batch-1']}
+        for store_id, product_id in sku_rows
+    ])
+
+    results, stats = inventory_service._apply_netted_sales(mongo_db, sku_rows, 'batch-1', None)
+
+    assert sku_rows == snapshot
+    assert sorted((r['row'], r['status']) for r in results) == [(1, 'success'), (2, 'failed'), (3, 'success'), (4, 'success')]
+    assert stats['partitions'] == 2
+    assert stats['netting_rounds'] == 1
@@ -0,0 +1,43 @@
+# backend/tests/test_tree_inference.py
+import numpy as np
+import pytest
+from scipy import sparse
+
+from services.feature_encoder import CompiledFeatureEncoder
+from services.tree_inference import CompiledTreeModel, SmallBatchTreeModel, select_inference_backend
+
+
+@pytest.fixture(scope='module')
+def compiled_model(model_bundle):
+    return CompiledTreeModel.from_lightgbm(model_bundle['model'])
+
+
+def test_predict_matches_lightgbm_on_smoke_batch(model_bundle, compiled_model):
+    X = compiled_model.smoke_batch(2048, seed=7)
+    expected = np.asarray(model_bundle['model'].predict(X), dtype=np.float64)
+    assert np.array_equal(compiled_model.predict(X), expected, equal_nan=True)
+
+
+def test_predict_matches_lightgbm_on_encoded_features(model_bundle, compiled_model):
+    encoder = CompiledFeatureEncoder(model_bundle['preprocessor'], model_bundle['numerical_features'], model_bundle['categorical_features'])
+    X = encoder.encode(encoder.smoke_columns(512), 512)
+    assert sparse.issparse(X)
+    expected = np.asarray(model_bundle['model'].predict(X), dtype=np.float64)
+    assert np.array_equal(compiled_model.predict(X), expected)
+
+
+def test_compiled_backend_is_selected_for_shipped_model(model_bundle):
+    selected = select_inference_backend(model_bundle['model'], backend='compiled')
+    assert isinstance(selected, SmallBatchTreeModel)
+    assert isinstance(selected.compiled_model, CompiledTreeModel)
+
+
+def test_small_batch_model_routes_by_batch_size(model_bundle, compiled_model, monkeypatch):
+    router = SmallBatchTreeModel(model_bundle['model'], compiled_model, max_rows=4)
+    calls = []
+    monkeypatch.setattr(compiled_model, 'predict', lambda X: calls.append(('compiled', X.shape[0])) or np.zeros(X.shape[0]))
+    X = compiled_model.smoke_batch(10, seed=3)
+    router.predict(X[:4])
+    expected = np.asarray(model_bundle['model'].predict(X), dtype=np.float64)
+    assert np.array_equal(router.predict(X), expected, equal_nan=True)
+    assert calls == [('compiled', 4)]
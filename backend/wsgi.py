@@ -0,0 +1,5 @@
+# backend/wsgi.py
+# Production entry point: `gunicorn -c gunicorn.conf.py wsgi:app` (run from the backend/ directory)
+from app import create_app
+
+app = create_app()